@@ -0,0 +1,180 @@
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+RESULTS_VERSION = 1
+
+# Interval of the RSS sampler thread; short enough to catch native (GDAL, numpy) peaks
+RSS_SAMPLE_SECONDS = 0.005
+
+# Relative slowdown reported as a regression by compare_results
+REGRESSION_THRESHOLD = 0.10
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes (0 where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+class RSSSampler:
+    """Peak resident memory while a block runs, sampled from a background thread.
+
+    tracemalloc only sees allocations made through Python's allocators
+    (including numpy); sampling RSS also catches GDAL and other native
+    buffers.
+    """
+
+    def __init__(self, interval: float = RSS_SAMPLE_SECONDS):
+        self.interval = interval
+        self.baseline = 0
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        self.baseline = self.peak = current_rss()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+    @property
+    def peak_delta(self) -> int:
+        return self.peak - self.baseline
+
+def measure(run: Callable[[], object], repeat: int = 3, warmup: int = 1, memory: bool = True) -> Dict:
+    """Time run() repeat times after warmup calls, then profile one more call's memory.
+
+    Timing calls are made without tracemalloc, whose per-allocation hooks
+    would slow pure-Python paths several-fold; peak RSS is sampled during
+    them. The memory call records the peak traced Python/numpy allocation.
+    """
+    for _ in range(warmup):
+        run()
+
+    seconds = []
+    with RSSSampler() as rss:
+        for _ in range(repeat):
+            gc.collect()
+            start = time.perf_counter()
+            run()
+            seconds.append(time.perf_counter() - start)
+
+    result = {
+        'repeat': repeat,
+        'seconds': seconds,
+        'seconds_min': min(seconds),
+        'seconds_median': statistics.median(seconds),
+        'peak_rss_delta_bytes': rss.peak_delta
+    }
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run()
+            result['peak_traced_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+def git_revision(path: str) -> Dict:
+    """Commit and dirty flag of the checkout containing path (empty outside git)"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=path, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=path,
+                                capture_output=True, text=True, check=True).stdout
+        return {'commit': commit, 'dirty': bool(status.strip())}
+    except (OSError, subprocess.CalledProcessError):
+        return {}
+
+def environment(path: str) -> Dict:
+    """Machine, library versions and git revision, so results are comparable across runs"""
+    versions = {}
+    for module in ('numpy', 'pandas', 'pyarrow', 'shapely', 'geopandas', 'rasterio'):
+        try:
+            versions[module] = __import__(module).__version__
+        except ImportError:
+            versions[module] = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'libraries': versions,
+        'git': git_revision(path)
+    }
+
+def save_results(path: str, results: List[Dict], env: Dict, settings: Optional[Dict] = None) -> str:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    document = {
+        'version': RESULTS_VERSION,
+        'created': datetime.now().isoformat(),
+        'environment': env,
+        'settings': settings or {},
+        'results': results
+    }
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump(document, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+    return path
+
+def load_results(path: str) -> Dict:
+    with open(path, 'r') as f:
+        document = json.load(f)
+    if document.get('version') != RESULTS_VERSION:
+        raise ValueError(f"Unsupported benchmark results version in {path}: {document.get('version')}")
+    return document
+
+def compare_results(baseline: Dict, current: Dict, threshold: float = REGRESSION_THRESHOLD) -> List[Dict]:
+    """Per (benchmark, size) ratio of current to baseline minimum time and peak memory.
+
+    Minimum times are compared because they are the least affected by
+    other load on the machine. Rows slower than 1 + threshold are flagged.
+    """
+    before = {(r['benchmark'], r['size']): r for r in baseline['results'] if 'seconds_min' in r}
+    rows = []
+    for result in current['results']:
+        reference = before.get((result['benchmark'], result['size']))
+        if reference is None or 'seconds_min' not in result:
+            continue
+        time_ratio = result['seconds_min'] / reference['seconds_min']
+        row = {
+            'benchmark': result['benchmark'],
+            'size': result['size'],
+            'baseline_seconds': reference['seconds_min'],
+            'current_seconds': result['seconds_min'],
+            'time_ratio': time_ratio,
+            'regression': time_ratio > 1 + threshold
+        }
+        if reference.get('peak_traced_bytes') and result.get('peak_traced_bytes') is not None:
+            row['memory_ratio'] = result['peak_traced_bytes'] / reference['peak_traced_bytes']
+        rows.append(row)
+    return rows
+
+def format_bytes(value: Optional[int]) -> str:
+    if value is None:
+        return '-'
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if abs(value) < 1024 or unit == 'GiB':
+            return f"{value:.0f} {unit}" if unit == 'B' else f"{value:.1f} {unit}"
+        value /= 1024
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the MRV data processing hot paths on synthetic data
+
+Run from the data-processing directory:
+    python -m benchmarks.run_benchmarks run --suite carbon --farm-sizes 10k,100k
+    python -m benchmarks.run_benchmarks compare baseline.json current.json
+    python -m benchmarks.run_benchmarks generate registry --rows 10M --output farms.parquet
+"""
+
+import argparse
+import fnmatch
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+from benchmarks.harness import (REGRESSION_THRESHOLD, compare_results, environment, format_bytes, load_results,
+                                measure, save_results)
+from benchmarks.suites import BENCHMARKS, SUITES, get_benchmark
+
+DATA_PROCESSING_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SIZE_SUFFIXES = {'k': 1000, 'm': 1000000}
+
+# Option overriding the sizes of each suite
+SIZE_OPTIONS = {'carbon': 'farm_sizes', 'ndvi': 'raster_sizes', 'spatial': 'boundary_sizes'}
+
+def parse_size(value: str) -> int:
+    """Row or pixel count, with an optional k/M suffix (10k, 1M)"""
+    value = value.strip().lower()
+    if value and value[-1] in SIZE_SUFFIXES:
+        return int(float(value[:-1]) * SIZE_SUFFIXES[value[-1]])
+    return int(value)
+
+def parse_sizes(value: str) -> List[int]:
+    return [parse_size(size) for size in value.split(',') if size.strip()]
+
+def run_case(name: str, size: int, settings: Dict) -> Dict:
+    """Set up and measure one benchmark at one size (in a fresh process unless --in-process)"""
+    benchmark = get_benchmark(name)
+    context = benchmark.setup(size, settings)
+    result = measure(lambda: benchmark.run(context), repeat=settings['repeat'], warmup=settings['warmup'],
+                     memory=settings['memory'])
+    operations = benchmark.operations(size)
+    result.update({
+        'benchmark': name,
+        'size': size,
+        'unit': benchmark.unit,
+        'operations': operations,
+        'throughput_per_second': operations / result['seconds_min'] if result['seconds_min'] else None
+    })
+    return result
+
+def selected_cases(args) -> List[tuple]:
+    suites = args.suite.split(',') if args.suite else SUITES
+    cases = []
+    for benchmark in BENCHMARKS:
+        if benchmark.suite not in suites:
+            continue
+        if args.benchmark and not any(fnmatch.fnmatch(benchmark.name, pattern) for pattern in args.benchmark):
+            continue
+        for size in getattr(args, SIZE_OPTIONS[benchmark.suite]) or benchmark.default_sizes:
+            if benchmark.max_size is None or size <= benchmark.max_size:
+                cases.append((benchmark.name, size))
+    return cases
+
+def print_result(result: Dict):
+    throughput = result.get('throughput_per_second')
+    print(f"{result['benchmark']:<36} {result['size']:>10,} "
+          f"{result['seconds_min']:>9.3f}s {result['seconds_median']:>9.3f}s "
+          f"{throughput:>14,.0f} {result['unit']}/s "
+          f"{format_bytes(result.get('peak_traced_bytes')):>11} {format_bytes(result['peak_rss_delta_bytes']):>11}")
+
+def print_comparison(rows: List[Dict], threshold: float) -> bool:
+    """Print a comparison table; returns True if any benchmark regressed"""
+    print(f"{'benchmark':<36} {'size':>10} {'baseline':>10} {'current':>10} {'time':>8} {'memory':>8}")
+    for row in rows:
+        memory = f"{row['memory_ratio']:.2f}x" if 'memory_ratio' in row else '-'
+        flag = '  REGRESSION' if row['regression'] else ''
+        print(f"{row['benchmark']:<36} {row['size']:>10,} {row['baseline_seconds']:>9.3f}s "
+              f"{row['current_seconds']:>9.3f}s {row['time_ratio']:>7.2f}x {memory:>8}{flag}")
+    regressions = [row for row in rows if row['regression']]
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) more than {threshold:.0%} slower than the baseline")
+    return bool(regressions)
+
+def run_benchmarks(args):
+    """Run the selected benchmarks and write machine-readable results"""
+    cases = selected_cases(args)
+    if not cases:
+        print("No benchmarks selected")
+        return None
+
+    settings = {
+        'data_dir': os.path.abspath(args.data_dir),
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'warmup': args.warmup,
+        'memory': not args.no_memory,
+        'workers': args.workers
+    }
+    os.makedirs(settings['data_dir'], exist_ok=True)
+    env = environment(DATA_PROCESSING_DIR)
+    output_path = args.output or os.path.join(
+        'output', 'benchmarks', f"benchmark_{env['git'].get('commit', 'local')}.json")
+
+    print(f"{'benchmark':<36} {'size':>10} {'min':>10} {'median':>10} {'throughput':>22} "
+          f"{'peak traced':>11} {'peak RSS':>11}")
+    results = []
+    for name, size in cases:
+        try:
+            if args.in_process:
+                result = run_case(name, size, settings)
+            else:
+                # A fresh interpreter per case keeps memory peaks and warm caches from leaking between cases
+                with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+                    result = pool.submit(run_case, name, size, settings).result()
+        except Exception as e:
+            print(f"{name:<36} {size:>10,}  failed: {e}")
+            results.append({'benchmark': name, 'size': size, 'error': str(e)})
+            continue
+        print_result(result)
+        results.append(result)
+        # Save as we go, so a long run that is interrupted keeps what it measured
+        save_results(output_path, results, env, settings)
+
+    print(f"Benchmark results: {output_path}")
+    if args.compare:
+        rows = compare_results(load_results(args.compare), load_results(output_path), args.threshold)
+        if print_comparison(rows, args.threshold) and args.fail_on_regression:
+            sys.exit(1)
+    return output_path
+
+def compare_benchmark_files(args):
+    rows = compare_results(load_results(args.baseline), load_results(args.current), args.threshold)
+    if print_comparison(rows, args.threshold) and args.fail_on_regression:
+        sys.exit(1)
+    return rows
+
+def generate_data(args):
+    """Write a synthetic registry, band pair or boundary layer for use outside the benchmarks"""
+    from benchmarks.synthetic import DEFAULT_REGION, write_boundaries, write_farm_registry, write_synthetic_bands
+
+    if args.kind == 'registry':
+        path = write_farm_registry(args.output, parse_size(args.rows), seed=args.seed)
+        print(f"Synthetic registry with {parse_size(args.rows):,} farms: {path}")
+    elif args.kind == 'bands':
+        red_path, nir_path, bounds = write_synthetic_bands(args.output, parse_size(args.width), seed=args.seed)
+        print(f"Synthetic bands: {red_path}, {nir_path} (bounds {bounds})")
+    else:
+        bounds = tuple(float(value) for value in args.bounds.split(',')) if args.bounds else DEFAULT_REGION
+        path = write_boundaries(args.output, parse_size(args.count), bounds=bounds, seed=args.seed)
+        print(f"Synthetic boundaries with {parse_size(args.count):,} farms: {path}")
+
+def main():
+    parser = argparse.ArgumentParser(description='MRV Solutions Data Processing benchmarks')
+    subparsers = parser.add_subparsers(dest='command', help='Command to execute')
+
+    run_parser = subparsers.add_parser('run', help='Time and memory-profile hot paths across sizes')
+    run_parser.add_argument('--suite', help=f"Comma-separated suites ({', '.join(SUITES)}); defaults to all")
+    run_parser.add_argument('--benchmark', action='append',
+                            help='Benchmark name or glob, e.g. "carbon.batch_*" (repeatable)')
+    run_parser.add_argument('--farm-sizes', type=parse_sizes, help='Registry rows for carbon benchmarks, e.g. 10k,1M')
+    run_parser.add_argument('--raster-sizes', type=parse_sizes, help='Raster side in pixels for NDVI benchmarks')
+    run_parser.add_argument('--boundary-sizes', type=parse_sizes, help='Boundaries for spatial benchmarks')
+    run_parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case')
+    run_parser.add_argument('--warmup', type=int, default=1, help='Untimed runs before timing')
+    run_parser.add_argument('--no-memory', action='store_true', help='Skip the tracemalloc run')
+    run_parser.add_argument('--workers', type=int, default=1, help='Worker processes for the sharded benchmark')
+    run_parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic data')
+    run_parser.add_argument('--data-dir', default='./output/benchmarks/data',
+                            help='Synthetic inputs, generated once and reused between runs')
+    run_parser.add_argument('--output', help='Results JSON (defaults to output/benchmarks/benchmark_<commit>.json)')
+    run_parser.add_argument('--in-process', action='store_true',
+                            help='Run every case in this process (for debugging or external profilers)')
+    run_parser.add_argument('--compare', help='Baseline results JSON to compare against')
+    run_parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                            help='Slowdown reported as a regression (0.10 = 10%%)')
+    run_parser.add_argument('--fail-on-regression', action='store_true', help='Exit with status 1 on regressions')
+
+    compare_parser = subparsers.add_parser('compare', help='Compare two benchmark results files')
+    compare_parser.add_argument('baseline', help='Baseline results JSON')
+    compare_parser.add_argument('current', help='Current results JSON')
+    compare_parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                                help='Slowdown reported as a regression (0.10 = 10%%)')
+    compare_parser.add_argument('--fail-on-regression', action='store_true', help='Exit with status 1 on regressions')
+
+    generate_parser = subparsers.add_parser('generate', help='Write synthetic input data')
+    generate_parser.add_argument('kind', choices=['registry', 'bands', 'boundaries'])
+    generate_parser.add_argument('--output', required=True,
+                                 help='CSV/Parquet file (registry), directory (bands) or vector file (boundaries)')
+    generate_parser.add_argument('--rows', default='10k', help='Registry rows, e.g. 10M')
+    generate_parser.add_argument('--width', default='4096', help='Raster side in pixels')
+    generate_parser.add_argument('--count', default='10k', help='Boundaries')
+    generate_parser.add_argument('--bounds', help='WEST,SOUTH,EAST,NORTH for boundaries, e.g. the bounds of generated bands')
+    generate_parser.add_argument('--seed', type=int, default=0, help='Random seed')
+
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        run_benchmarks(args)
+    elif args.command == 'compare':
+        compare_benchmark_files(args)
+    elif args.command == 'generate':
+        generate_data(args)
+    else:
+        parser.print_help()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+import contextlib
+import io
+import os
+import shutil
+from argparse import Namespace
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.synthetic import DEFAULT_REGION, synthetic_boundaries, write_farm_registry, write_synthetic_bands
+
+# Calculation date pinned for every carbon benchmark, so runs are comparable
+BENCHMARK_AS_OF = '2025-01-01'
+
+# The per-farm CarbonModel loop is far slower than the batch paths; larger sizes are skipped
+PER_FARM_MAX_ROWS = 100000
+
+# Rows per chunk for the sharded batch benchmark
+SHARDED_CHUNK_ROWS = 100000
+
+# Radius queries per spatial benchmark run
+RADIUS_QUERIES = 100
+RADIUS_KM = 5.0
+
+class Benchmark:
+    """One hot path measured across sizes.
+
+    setup(size, settings) builds the inputs (not timed) and returns a
+    context; run(context) is the timed call. operations(size) is the number
+    of items one run processes, used for throughput.
+    """
+
+    def __init__(self, name: str, unit: str, setup: Callable, run: Callable, default_sizes: List[int],
+                 max_size: Optional[int] = None, operations: Optional[Callable[[int], int]] = None):
+        self.name = name
+        self.suite = name.split('.')[0]
+        self.unit = unit
+        self.setup = setup
+        self.run = run
+        self.default_sizes = default_sizes
+        self.max_size = max_size
+        self.operations = operations or (lambda size: size)
+
+def cached(path: str, build: Callable[[str], object]) -> str:
+    """Build a synthetic input once per data directory; later runs (and commits) reuse the same file"""
+    if not os.path.exists(path):
+        tmp_path = f"{path}.tmp{os.path.splitext(path)[1]}"
+        build(tmp_path)
+        os.replace(tmp_path, path)
+    return path
+
+def registry_path(size: int, settings: Dict) -> str:
+    path = os.path.join(settings['data_dir'], f"registry_{size}_{settings['seed']}.csv")
+    return cached(path, lambda tmp_path: write_farm_registry(tmp_path, size, seed=settings['seed']))
+
+def work_dir(name: str, size: int, settings: Dict) -> str:
+    path = os.path.join(settings['data_dir'], 'work', f"{name}_{size}")
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+    return path
+
+# Carbon calculation
+
+def setup_farm_records(size: int, settings: Dict) -> Dict:
+    import pandas as pd
+    from carbon_calculation.carbon_model import CarbonModel
+
+    records = pd.read_csv(registry_path(size, settings)).to_dict('records')
+    models = {model_type: CarbonModel(model_type, as_of=BENCHMARK_AS_OF) for model_type in ('agroforestry', 'rice')}
+    return {'records': records, 'models': models}
+
+def run_calculate_credits(context: Dict):
+    """Validate and calculate farm by farm, as `main.py carbon` does for one farm"""
+    for farm_data in context['records']:
+        model = context['models'][farm_data['crop_type']]
+        if not model.validate_farm_data(farm_data):
+            model.calculate_credits(farm_data)
+
+def setup_farm_frame(size: int, settings: Dict) -> Dict:
+    import pandas as pd
+    from carbon_calculation.batch_engine import BatchCarbonModel
+
+    return {'df': pd.read_csv(registry_path(size, settings)), 'engine': BatchCarbonModel(as_of=BENCHMARK_AS_OF)}
+
+def run_batch_engine(context: Dict):
+    context['engine'].process_frame(context['df'])
+
+def batch_args(input_file: str, output_dir: str, **overrides) -> Namespace:
+    """Arguments of `main.py batch` with the CLI defaults"""
+    args = Namespace(input_file=input_file, output_dir=output_dir, format='csv', report_dataset=None, workers=1,
+                     chunk_size=None, as_of=BENCHMARK_AS_OF, cache_dir=None, state_db=None, delta=False,
+                     export_results=False)
+    for key, value in overrides.items():
+        setattr(args, key, value)
+    return args
+
+def setup_process_batch(size: int, settings: Dict) -> Dict:
+    output_dir = work_dir('process_batch_farms', size, settings)
+    return {'args': batch_args(registry_path(size, settings), output_dir)}
+
+def setup_process_batch_sharded(size: int, settings: Dict) -> Dict:
+    output_dir = work_dir('process_batch_farms_sharded', size, settings)
+    return {'args': batch_args(registry_path(size, settings), output_dir, workers=settings['workers'],
+                               chunk_size=SHARDED_CHUNK_ROWS)}
+
+def run_process_batch(context: Dict):
+    """End to end `main.py batch`, from reading the CSV to writing batch_results"""
+    from main import process_batch_farms
+
+    args = context['args']
+    # The sharded runner would resume from the previous run's checkpoint
+    shutil.rmtree(args.output_dir, ignore_errors=True)
+    os.makedirs(args.output_dir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        if process_batch_farms(args) is None:
+            raise RuntimeError(f"process_batch_farms failed for {args.input_file}")
+
+# NDVI
+
+def setup_bands(size: int, settings: Dict) -> Dict:
+    band_dir = os.path.join(settings['data_dir'], f"bands_{size}_{settings['seed']}")
+    if not (os.path.exists(os.path.join(band_dir, 'red.tif')) and os.path.exists(os.path.join(band_dir, 'nir.tif'))):
+        write_synthetic_bands(band_dir, size, seed=settings['seed'])
+    return {
+        'red_band': os.path.join(band_dir, 'red.tif'),
+        'nir_band': os.path.join(band_dir, 'nir.tif'),
+        'output_dir': work_dir('ndvi', size, settings)
+    }
+
+def run_calculate_ndvi(context: Dict):
+    from satellite.ndvi_calculator import NDVICalculator
+
+    if NDVICalculator(context['red_band'], context['nir_band']).calculate_ndvi() is None:
+        raise RuntimeError(f"calculate_ndvi failed for {context['red_band']}")
+
+def run_process_scene(context: Dict):
+    """Statistics, preview and a tiled GeoTIFF with overviews in one pass over the bands"""
+    from satellite.ndvi_calculator import NDVICalculator
+
+    calculator = NDVICalculator(context['red_band'], context['nir_band'])
+    calculator.process_scene(os.path.join(context['output_dir'], 'ndvi.tif'))
+
+# Farm boundaries
+
+def setup_boundaries(size: int, settings: Dict) -> Dict:
+    import shapely
+    from geospatial.farm_boundary import FarmBoundaryProcessor
+
+    processor = FarmBoundaryProcessor()
+    processor.gdf = synthetic_boundaries(size, seed=settings['seed'])
+    processor.build_index()
+
+    rng = np.random.default_rng(settings['seed'])
+    west, south, east, north = DEFAULT_REGION
+    centers = shapely.points(rng.uniform(west, east, RADIUS_QUERIES), rng.uniform(south, north, RADIUS_QUERIES))
+    return {'processor': processor, 'centers': list(centers)}
+
+def run_find_farms_within_radius(context: Dict):
+    for center in context['centers']:
+        context['processor'].find_farms_within_radius(center, RADIUS_KM)
+
+def run_find_farms_within_radii(context: Dict):
+    context['processor'].find_farms_within_radii(context['centers'], RADIUS_KM)
+
+def run_calculate_areas(context: Dict):
+    from geospatial.area import AreaCache
+
+    # A fresh cache each run, or every run after the first would be all hits
+    context['processor'].area_cache = AreaCache()
+    context['processor'].calculate_areas()
+
+FARM_SIZES = [10000, 100000, 1000000]
+RASTER_SIZES = [1024, 4096]
+BOUNDARY_SIZES = [1000, 10000, 100000]
+
+BENCHMARKS = [
+    Benchmark('carbon.calculate_credits', 'farms', setup_farm_records, run_calculate_credits, FARM_SIZES,
+              max_size=PER_FARM_MAX_ROWS),
+    Benchmark('carbon.batch_engine', 'farms', setup_farm_frame, run_batch_engine, FARM_SIZES),
+    Benchmark('carbon.process_batch_farms', 'farms', setup_process_batch, run_process_batch, FARM_SIZES),
+    Benchmark('carbon.process_batch_farms_sharded', 'farms', setup_process_batch_sharded, run_process_batch,
+              FARM_SIZES),
+    Benchmark('ndvi.calculate_ndvi', 'pixels', setup_bands, run_calculate_ndvi, RASTER_SIZES,
+              operations=lambda size: size * size),
+    Benchmark('ndvi.process_scene', 'pixels', setup_bands, run_process_scene, RASTER_SIZES,
+              operations=lambda size: size * size),
+    Benchmark('spatial.find_farms_within_radius', 'queries', setup_boundaries, run_find_farms_within_radius,
+              BOUNDARY_SIZES, operations=lambda size: RADIUS_QUERIES),
+    Benchmark('spatial.find_farms_within_radii', 'queries', setup_boundaries, run_find_farms_within_radii,
+              BOUNDARY_SIZES, operations=lambda size: RADIUS_QUERIES),
+    Benchmark('spatial.calculate_areas', 'farms', setup_boundaries, run_calculate_areas, BOUNDARY_SIZES),
+]
+
+SUITES = sorted({benchmark.suite for benchmark in BENCHMARKS})
+
+def get_benchmark(name: str) -> Benchmark:
+    for benchmark in BENCHMARKS:
+        if benchmark.name == name:
+            return benchmark
+    raise KeyError(f"Unknown benchmark: {name}")
@@ -0,0 +1,164 @@
+import numpy as np
+import pandas as pd
+import os
+from typing import Iterator, Optional, Tuple
+
+from carbon_calculation.carbon_model import CarbonModel
+from carbon_calculation.columnar import is_parquet, typed_farms, write_parquet_chunks
+
+RICE_PRACTICES = list(CarbonModel('rice').parameters['practice_factors'])
+
+# Share of rice farms and of rows deliberately failing validation
+RICE_SHARE = 0.4
+INVALID_SHARE = 0.01
+
+ESTABLISHMENT_RANGE = ('2010-01-01', '2024-12-31')
+
+# Rows generated per chunk when writing registries
+REGISTRY_CHUNK_ROWS = 1000000
+
+# South Indian farmland, (west, south, east, north) in degrees
+DEFAULT_REGION = (76.0, 10.0, 78.0, 12.0)
+
+# Ground resolution of synthetic bands (~10 m, like Sentinel-2 red/NIR) and their write block
+PIXEL_DEGREES = 0.0001
+RASTER_BLOCK_SIZE = 256
+
+METERS_PER_DEGREE = 111320.0
+
+def farm_ids(ids: np.ndarray) -> list:
+    return [f"farm_{i:08d}" for i in ids.tolist()]
+
+def synthetic_farms(rows: int, seed: int = 0, start_id: int = 0, rice_share: float = RICE_SHARE,
+                    invalid_share: float = INVALID_SHARE) -> pd.DataFrame:
+    """Farm registry rows in the sample_farms.csv layout, plus rice practices.
+
+    Agroforestry and rice farms are mixed at rice_share; rice farms get a
+    random subset of practices. About invalid_share of the rows have a
+    zero area or a malformed date so validation paths are exercised too.
+    """
+    rng = np.random.default_rng([seed, start_id])
+    ids = np.arange(start_id, start_id + rows)
+    is_rice = rng.random(rows) < rice_share
+
+    area = np.round(rng.lognormal(mean=1.2, sigma=0.6, size=rows), 2)
+    trees = np.where(is_rice, 0, np.round(area * rng.uniform(10, 60, rows))).astype(np.int64)
+    first, last = (np.datetime64(date, 'D') for date in ESTABLISHMENT_RANGE)
+    dates = (first + rng.integers(0, (last - first).astype(int), rows)).astype(str).astype(object)
+
+    # Practice subsets as bit masks over RICE_PRACTICES; each combination is joined once
+    masks = np.where(is_rice, rng.integers(0, 2 ** len(RICE_PRACTICES), rows), 0)
+    combinations = np.array([';'.join(p for bit, p in enumerate(RICE_PRACTICES) if mask >> bit & 1) or None
+                             for mask in range(2 ** len(RICE_PRACTICES))], dtype=object)
+
+    invalid = np.flatnonzero(rng.random(rows) < invalid_share)
+    area[invalid[::2]] = 0.0
+    dates[invalid[1::2]] = 'not-a-date'
+
+    return pd.DataFrame({
+        'farm_id': farm_ids(ids),
+        'name': [f"Synthetic Farm {i}" for i in ids.tolist()],
+        'area_ha': area,
+        'crop_type': np.where(is_rice, 'rice', 'agroforestry'),
+        'tree_count': trees,
+        'soil_organic_carbon': np.round(rng.uniform(0.8, 2.5, rows), 2),
+        'establishment_date': dates,
+        'practices': combinations[masks]
+    })
+
+def iter_synthetic_farms(rows: int, seed: int = 0, chunk_rows: int = REGISTRY_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """synthetic_farms in chunks, so registries of millions of rows are generated in bounded memory"""
+    for start in range(0, rows, chunk_rows):
+        yield synthetic_farms(min(chunk_rows, rows - start), seed=seed, start_id=start)
+
+def write_farm_registry(path: str, rows: int, seed: int = 0, chunk_rows: int = REGISTRY_CHUNK_ROWS) -> str:
+    """Write a synthetic registry as CSV or (typed) Parquet, chosen by the file extension"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    chunks = iter_synthetic_farms(rows, seed, chunk_rows)
+    if is_parquet(path):
+        write_parquet_chunks((typed_farms(chunk) for chunk in chunks), path)
+    else:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+    return path
+
+def vegetation_field(rows: np.ndarray, cols: np.ndarray, seed: int) -> np.ndarray:
+    """Smooth NDVI-like field in [-0.2, 0.9] from a few random plane waves (continuous across blocks)"""
+    rng = np.random.default_rng(seed)
+    field = np.zeros((len(rows), len(cols)), dtype=np.float32)
+    for _ in range(6):
+        ky, kx = rng.uniform(-1, 1, 2) * 2 * np.pi / rng.uniform(200, 2000)
+        phase = rng.uniform(0, 2 * np.pi)
+        field += np.sin(ky * rows[:, None] + kx * cols[None, :] + phase).astype(np.float32)
+    return 0.35 + 0.55 * field / 6
+
+def write_synthetic_bands(output_dir: str, width: int, height: Optional[int] = None, seed: int = 0,
+                          origin: Tuple[float, float] = DEFAULT_REGION[:2]) -> Tuple[str, str, Tuple]:
+    """Write red and NIR GeoTIFFs (uint16 reflectance x 10000, tiled) with a smooth vegetation pattern.
+
+    Returns (red_path, nir_path, bounds); bounds is (west, south, east, north)
+    in EPSG:4326, for generating boundaries over the scene. Bands are
+    written block by block, so any raster size fits in memory.
+    """
+    import rasterio
+    from rasterio.transform import from_origin
+
+    height = height or width
+    west, south = origin
+    north = south + height * PIXEL_DEGREES
+    profile = {
+        'driver': 'GTiff', 'width': width, 'height': height, 'count': 1, 'dtype': 'uint16',
+        'crs': 'EPSG:4326', 'transform': from_origin(west, north, PIXEL_DEGREES, PIXEL_DEGREES),
+        'tiled': True, 'blockxsize': RASTER_BLOCK_SIZE, 'blockysize': RASTER_BLOCK_SIZE, 'compress': 'deflate'
+    }
+
+    os.makedirs(output_dir, exist_ok=True)
+    red_path = os.path.join(output_dir, 'red.tif')
+    nir_path = os.path.join(output_dir, 'nir.tif')
+    rng = np.random.default_rng([seed, width, height])
+    with rasterio.open(red_path, 'w', **profile) as red_dst, rasterio.open(nir_path, 'w', **profile) as nir_dst:
+        for _, window in red_dst.block_windows(1):
+            rows = np.arange(window.row_off, window.row_off + window.height)
+            cols = np.arange(window.col_off, window.col_off + window.width)
+            ndvi = vegetation_field(rows, cols, seed)
+            ndvi += rng.normal(0, 0.03, ndvi.shape).astype(np.float32)
+            nir = rng.uniform(0.25, 0.45, ndvi.shape).astype(np.float32)
+            red = nir * (1 - ndvi) / (1 + ndvi)
+            red_dst.write(np.clip(red * 10000, 0, 10000).astype(np.uint16), 1, window=window)
+            nir_dst.write(np.clip(nir * 10000, 0, 10000).astype(np.uint16), 1, window=window)
+    return red_path, nir_path, (west, south, west + width * PIXEL_DEGREES, north)
+
+def synthetic_boundaries(count: int, bounds: Tuple = DEFAULT_REGION, seed: int = 0, vertices: int = 12):
+    """Random farm polygons (EPSG:4326 GeoDataFrame) with farm_id and crop_type.
+
+    Each farm is a star-shaped polygon of log-normally distributed area
+    (median ~3 ha) around a uniformly placed centre, so polygons are
+    always valid but irregular; neighbouring farms may overlap.
+    """
+    import geopandas as gpd
+    import shapely
+
+    rng = np.random.default_rng([seed, count])
+    west, south, east, north = bounds
+    lon = rng.uniform(west, east, count)
+    lat = rng.uniform(south, north, count)
+    radius = np.sqrt(rng.lognormal(mean=np.log(3e4), sigma=0.7, size=count) / np.pi)
+
+    # Jittered but increasing angles keep every gap below pi, so rings never self-intersect
+    angles = (np.arange(vertices) + rng.uniform(0, 0.8, (count, vertices))) * (2 * np.pi / vertices)
+    radial = radius[:, None] * rng.uniform(0.6, 1.2, (count, vertices))
+    x = lon[:, None] + radial * np.cos(angles) / (METERS_PER_DEGREE * np.cos(np.radians(lat))[:, None])
+    y = lat[:, None] + radial * np.sin(angles) / METERS_PER_DEGREE
+    rings = np.stack([x, y], axis=-1)
+    rings = np.concatenate([rings, rings[:, :1]], axis=1)
+
+    return gpd.GeoDataFrame({
+        'farm_id': farm_ids(np.arange(count)),
+        'crop_type': np.where(rng.random(count) < RICE_SHARE, 'rice', 'agroforestry')
+    }, geometry=shapely.polygons(rings), crs='EPSG:4326')
+
+def write_boundaries(path: str, count: int, bounds: Tuple = DEFAULT_REGION, seed: int = 0) -> str:
+    """Write synthetic_boundaries to any format geopandas can write (GeoPackage recommended for large layers)"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    synthetic_boundaries(count, bounds, seed).to_file(path)
+    return path
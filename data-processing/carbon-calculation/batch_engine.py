@@ -0,0 +1,204 @@
+import pandas as pd
+import numpy as np
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+
+from carbon_calculation.carbon_model import CarbonModel, parse_as_of, parse_practices
+from instrumentation.metrics import metrics
+
+MODEL_TYPES = ('agroforestry', 'rice')
+REQUIRED_FIELDS = ['area_ha', 'establishment_date', 'crop_type']
+BATCH_RESULT_COLUMNS = ['farm_id', 'crop_type', 'area_ha', 'calculated_credits', 'calculation_date']
+
+# calculation_results fields of CarbonModel verification reports, in report order
+REPORT_RESULT_FIELDS = {
+    'agroforestry': ['tree_carbon', 'soil_carbon', 'baseline_emissions', 'total_credits', 'credits_per_year'],
+    'rice': ['baseline_emissions', 'project_emissions', 'emission_reduction', 'total_credits', 'practice_factor']
+}
+
+class BatchCarbonModel:
+    """Column-wise counterpart of CarbonModel that works on a whole DataFrame of farms.
+
+    Validation and credit formulas mirror CarbonModel.validate_farm_data and
+    CarbonModel.calculate_credits, so results match the per-row model to
+    floating-point tolerance.
+    """
+
+    def __init__(self, as_of=None):
+        self.as_of = parse_as_of(as_of)
+        self.parameters = {model_type: CarbonModel(model_type=model_type).parameters
+                           for model_type in MODEL_TYPES}
+
+    def current_date(self) -> datetime:
+        """Date calculations are made at: the pinned as-of date, or now"""
+        return self.as_of or datetime.now()
+
+    def parse_dates(self, df: pd.DataFrame) -> pd.Series:
+        """Parse establishment dates, leaving NaT for missing or malformed values"""
+        if 'establishment_date' not in df.columns:
+            return pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]')
+        return pd.to_datetime(df['establishment_date'], format='%Y-%m-%d', errors='coerce')
+
+    def model_types(self, df: pd.DataFrame) -> pd.Series:
+        """Lower-cased model type per row, defaulting to agroforestry like the CLI"""
+        if 'crop_type' not in df.columns:
+            return pd.Series('agroforestry', index=df.index)
+        return df['crop_type'].astype('string').str.lower()
+
+    def tree_counts(self, df: pd.DataFrame) -> np.ndarray:
+        """Trees per row; a blank or missing tree_count means no trees, as CarbonModel's default"""
+        if 'tree_count' not in df.columns:
+            return np.zeros(len(df))
+        return pd.to_numeric(df['tree_count'], errors='coerce').fillna(0).to_numpy(dtype=float)
+
+    def practice_factors(self, df: pd.DataFrame) -> np.ndarray:
+        """Multiplicative rice practice factor per row"""
+        if 'practices' not in df.columns:
+            return np.ones(len(df))
+
+        factors = self.parameters['rice']['practice_factors']
+        practices = df['practices'].fillna('')
+
+        # Registries reuse a handful of practice combinations, so compute each once
+        try:
+            codes, uniques = pd.factorize(practices)
+        except TypeError:
+            # List-valued cells are unhashable; fall back to their joined form
+            codes, uniques = pd.factorize(practices.map(lambda value: ';'.join(parse_practices(value))))
+        unique_factors = np.ones(len(uniques))
+        for i, combination in enumerate(uniques):
+            for practice in parse_practices(combination):
+                unique_factors[i] *= factors.get(practice, 1.0)
+        return unique_factors[codes]
+
+    def validation_masks(self, df: pd.DataFrame, current_date: Optional[datetime] = None) -> pd.DataFrame:
+        """Boolean mask per validation error (one column per message)"""
+        current_date = current_date or self.current_date()
+        masks = {}
+
+        for field in REQUIRED_FIELDS:
+            if field not in df.columns:
+                masks[f"Missing required field: {field}"] = np.ones(len(df), dtype=bool)
+            elif field == 'crop_type':
+                masks[f"Missing required field: {field}"] = df[field].isna().to_numpy()
+
+        if 'establishment_date' in df.columns:
+            establishment_date = self.parse_dates(df)
+            masks["Establishment date cannot be in the future"] = (establishment_date > current_date).to_numpy()
+            masks["Invalid establishment date format. Use YYYY-MM-DD"] = establishment_date.isna().to_numpy()
+
+        if 'area_ha' in df.columns:
+            area = pd.to_numeric(df['area_ha'], errors='coerce').to_numpy(dtype=float)
+            masks["Farm area must be greater than 0"] = area <= 0
+        else:
+            masks["Farm area must be greater than 0"] = np.ones(len(df), dtype=bool)
+
+        model_types = self.model_types(df)
+        masks["Unknown model type"] = (model_types.notna() & ~model_types.isin(MODEL_TYPES)).to_numpy(dtype=bool)
+
+        return pd.DataFrame(masks, index=df.index)
+
+    def validate_frame(self, df: pd.DataFrame, current_date: Optional[datetime] = None) -> pd.Series:
+        """Validate every row, returning a Series of error lists (empty when valid)"""
+        with metrics().stage('carbon.validate', items=len(df)):
+            masks = self.validation_masks(df, current_date)
+            errors = pd.Series([[] for _ in range(len(df))], index=df.index, dtype=object)
+
+            invalid = np.flatnonzero(masks.to_numpy().any(axis=1))
+            if len(invalid):
+                messages = np.array(masks.columns)
+                mask_values = masks.to_numpy()
+                errors.iloc[invalid] = [list(messages[mask_values[i]]) for i in invalid]
+        return errors
+
+    def calculate_frame(self, df: pd.DataFrame, current_date: Optional[datetime] = None) -> pd.DataFrame:
+        """Calculate credit components for every row; invalid rows yield NaN"""
+        start = time.perf_counter()
+        current_date = current_date or self.current_date()
+        establishment_date = self.parse_dates(df)
+        project_age = (current_date - establishment_date).dt.days.to_numpy(dtype=float) / 365.25
+
+        area = pd.to_numeric(df['area_ha'], errors='coerce').to_numpy(dtype=float)
+        model_types = self.model_types(df).fillna('').to_numpy(dtype=object)
+        is_agroforestry = model_types == 'agroforestry'
+        is_rice = model_types == 'rice'
+
+        results = pd.DataFrame(index=df.index)
+        results['model_type'] = model_types
+        results['project_age'] = project_age
+
+        # Agroforestry: tree sequestration + soil carbon + avoided baseline emissions
+        agro = self.parameters['agroforestry']
+        tree_count = self.tree_counts(df)
+        maturity_factor = np.minimum(project_age / agro['maturity_age'], 1.0)
+        tree_carbon = tree_count * agro['tree_growth_rate'] * project_age * maturity_factor
+        soil_carbon = agro['soil_carbon_accumulation'] * area * np.minimum(project_age, agro['lifespan'])
+        agro_baseline = agro['baseline_emissions'] * area * project_age
+        agro_total = tree_carbon + soil_carbon + agro_baseline
+
+        # Rice: baseline emissions reduced by the product of practice factors
+        rice = self.parameters['rice']
+        practice_factor = self.practice_factors(df)
+        rice_baseline = rice['baseline_emissions'] * area * project_age
+        project_emissions = rice_baseline * practice_factor
+        emission_reduction = rice_baseline - project_emissions
+
+        results['tree_carbon'] = np.where(is_agroforestry, tree_carbon, np.nan)
+        results['soil_carbon'] = np.where(is_agroforestry, soil_carbon, np.nan)
+        results['baseline_emissions'] = np.where(is_agroforestry, agro_baseline,
+                                                 np.where(is_rice, rice_baseline, np.nan))
+        results['project_emissions'] = np.where(is_rice, project_emissions, np.nan)
+        results['emission_reduction'] = np.where(is_rice, emission_reduction, np.nan)
+        results['practice_factor'] = np.where(is_rice, practice_factor, np.nan)
+        results['total_credits'] = np.where(is_agroforestry, agro_total,
+                                            np.where(is_rice, emission_reduction, np.nan))
+        results['credits_per_year'] = np.where(is_agroforestry,
+                                               agro_total / np.maximum(project_age, 1), np.nan)
+        results['calculation_date'] = current_date.isoformat()
+        metrics().add_stage('carbon.calculate', time.perf_counter() - start, len(df), 0, start)
+        return results
+
+    def process_frame(self, df: pd.DataFrame,
+                      current_date: Optional[datetime] = None) -> Tuple[pd.DataFrame, pd.Series]:
+        """Validate and calculate a batch, returning rows in the batch_results schema and per-row errors"""
+        current_date = current_date or self.current_date()
+        errors = self.validate_frame(df, current_date)
+        is_valid = errors.map(len) == 0
+        valid = df[is_valid]
+        metrics().count_many({'farms.processed': len(df), 'farms.invalid': len(df) - len(valid)})
+        if len(valid) < len(df):
+            metrics().count_many({f"validation_failures.{error}": int(count)
+                                  for error, count in errors[~is_valid].explode().value_counts().items()})
+
+        calculation = self.calculate_frame(valid, current_date)
+        results = pd.DataFrame({
+            'farm_id': valid['farm_id'] if 'farm_id' in valid.columns else 'unknown',
+            'crop_type': valid['crop_type'],
+            'area_ha': valid['area_ha'],
+            'calculated_credits': calculation['total_credits'],
+            'calculation_date': calculation['calculation_date'],
+        }, index=valid.index, columns=BATCH_RESULT_COLUMNS)
+        return results.reset_index(drop=True), errors
+
+    def report_frame(self, df: pd.DataFrame, current_date: Optional[datetime] = None) -> pd.DataFrame:
+        """Verification report fields for every farm, one row each.
+
+        Mirrors CarbonModel.generate_verification_report: farms with
+        validation errors keep them, are left 'pending' and have no results.
+        """
+        current_date = current_date or self.current_date()
+        errors = self.validate_frame(df, current_date)
+        valid = (errors.map(len) == 0).to_numpy()
+        calculation = self.calculate_frame(df[valid], current_date).reindex(df.index)
+
+        reports = pd.DataFrame({
+            'farm_id': df['farm_id'].astype(str).to_numpy() if 'farm_id' in df.columns else 'unknown',
+            'calculation_date': pd.Timestamp(current_date),
+            'model_type': self.model_types(df).fillna('unknown').to_numpy(dtype=object),
+            'verification_status': np.where(valid, 'ready_for_verification', 'pending'),
+            'validation_errors': errors.to_numpy()
+        })
+        for field in dict.fromkeys(sum(REPORT_RESULT_FIELDS.values(), [])):
+            reports[field] = calculation[field].to_numpy(dtype=float)
+        return reports
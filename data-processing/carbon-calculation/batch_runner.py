@@ -0,0 +1,192 @@
+import pandas as pd
+import json
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from carbon_calculation.batch_engine import BatchCarbonModel, BATCH_RESULT_COLUMNS
+from carbon_calculation.carbon_model import parse_as_of
+from carbon_calculation.columnar import iter_farm_chunks
+from carbon_calculation.result_cache import ResultCache
+from instrumentation.metrics import metrics, start_run, timed_iter
+
+_engine = None
+
+def _get_engine() -> BatchCarbonModel:
+    """One engine per process instead of one per chunk"""
+    global _engine
+    if _engine is None:
+        _engine = BatchCarbonModel()
+    return _engine
+
+def _init_worker():
+    """Pool initializer: build the engine and measure this worker's own run"""
+    _get_engine()
+    # Forked workers inherit the parent's run; measure their own and send it back per chunk
+    start_run('batch-worker')
+
+def process_chunk(chunk: pd.DataFrame, calculation_date: datetime) -> Tuple[pd.DataFrame, int]:
+    """Validate and calculate one chunk, returning its results and the number of skipped farms"""
+    results, errors = _get_engine().process_frame(chunk, calculation_date)
+    return results, int((errors.map(len) > 0).sum())
+
+def process_chunk_in_worker(chunk: pd.DataFrame, calculation_date: datetime) -> Tuple[pd.DataFrame, int, Dict]:
+    """process_chunk in a pool worker, also returning the metrics it recorded"""
+    results, skipped = process_chunk(chunk, calculation_date)
+    return results, skipped, metrics().drain()
+
+class ShardedBatchRunner:
+    """Stream a farm CSV or Parquet file in chunks through a process pool, appending each chunk's results when done.
+
+    Chunks are written in input order so the output is identical for any worker
+    count. After every chunk the output offset is recorded in a checkpoint file;
+    an interrupted run truncates the output back to that offset and resumes with
+    the next chunk.
+
+    With a pinned as-of date and a ResultCache, each chunk's results are cached
+    under a key of its content, so unchanged chunks are not recomputed.
+    """
+
+    def __init__(self, input_file: str, output_path: str, workers: int = 1,
+                 chunk_size: int = 50000, checkpoint_path: Optional[str] = None,
+                 as_of=None, cache: Optional[ResultCache] = None):
+        self.input_file = input_file
+        self.output_path = output_path
+        self.workers = max(1, workers)
+        self.chunk_size = chunk_size
+        self.checkpoint_path = checkpoint_path or f"{output_path}.checkpoint.json"
+        self.as_of = parse_as_of(as_of)
+        self.cache = cache if self.as_of is not None else None
+        self.parameters = BatchCarbonModel().parameters
+
+    def input_signature(self) -> Dict:
+        """Identify the input so a checkpoint is only reused for the same file"""
+        stat = os.stat(self.input_file)
+        return {
+            'input_file': os.path.abspath(self.input_file),
+            'input_size': stat.st_size,
+            'input_mtime': stat.st_mtime,
+            'chunk_size': self.chunk_size,
+            'as_of': self.as_of.isoformat() if self.as_of else None
+        }
+
+    def load_checkpoint(self) -> Optional[Dict]:
+        """Return the saved checkpoint if it belongs to this input and output"""
+        if not os.path.exists(self.checkpoint_path) or not os.path.exists(self.output_path):
+            return None
+        try:
+            with open(self.checkpoint_path, 'r') as f:
+                checkpoint = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if checkpoint.get('signature') != self.input_signature():
+            return None
+        return checkpoint
+
+    def save_checkpoint(self, checkpoint: Dict):
+        """Atomically replace the checkpoint file"""
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def start(self) -> Dict:
+        """Resume from a valid checkpoint or start a fresh output file"""
+        checkpoint = self.load_checkpoint()
+        if checkpoint is not None:
+            with open(self.output_path, 'r+') as f:
+                f.truncate(checkpoint['output_offset'])
+            print(f"Resuming after {checkpoint['completed_chunks']} completed chunks")
+            return checkpoint
+
+        with open(self.output_path, 'w') as f:
+            pd.DataFrame(columns=BATCH_RESULT_COLUMNS).to_csv(f, index=False)
+            offset = f.tell()
+
+        checkpoint = {
+            'signature': self.input_signature(),
+            'calculation_date': (self.as_of or datetime.now()).isoformat(),
+            'completed_chunks': 0,
+            'output_offset': offset,
+            'farms_loaded': 0,
+            'farms_skipped': 0,
+            'total_credits': 0.0
+        }
+        self.save_checkpoint(checkpoint)
+        return checkpoint
+
+    def append_results(self, checkpoint: Dict, results: pd.DataFrame, loaded: int, skipped: int):
+        """Append one finished chunk and record it in the checkpoint"""
+        with metrics().stage('batch.write', items=len(results)) as stage, open(self.output_path, 'a') as f:
+            results.to_csv(f, header=False, index=False)
+            f.flush()
+            os.fsync(f.fileno())
+            stage.bytes = f.tell() - checkpoint['output_offset']
+            checkpoint['output_offset'] = f.tell()
+
+        checkpoint['completed_chunks'] += 1
+        checkpoint['farms_loaded'] += loaded
+        checkpoint['farms_skipped'] += skipped
+        checkpoint['total_credits'] += float(results['calculated_credits'].sum())
+        self.save_checkpoint(checkpoint)
+
+    def cached_chunk(self, chunk: pd.DataFrame) -> Tuple[Optional[str], Optional[Future]]:
+        """Look a chunk up in the result cache.
+
+        Returns the key to store the result under on a miss (None when caching
+        is off or on a hit) and a completed future on a hit.
+        """
+        if self.cache is None:
+            return None, None
+        key = self.cache.frame_key(chunk, self.parameters, self.as_of)
+        results = self.cache.get_frame(key)
+        if results is None:
+            return key, None
+        future = Future()
+        future.set_result((results, len(chunk) - len(results), None))
+        return None, future
+
+    def collect(self, checkpoint: Dict, pending: deque):
+        """Wait for the oldest in-flight chunk, cache it and append it"""
+        loaded, key, future = pending.popleft()
+        results, skipped, worker_metrics = future.result()
+        metrics().merge(worker_metrics)
+        if key is not None:
+            self.cache.put_frame(key, results)
+        self.append_results(checkpoint, results, loaded, skipped)
+
+    def run(self) -> Dict:
+        """Process every remaining chunk and return the run summary"""
+        checkpoint = self.start()
+        calculation_date = datetime.fromisoformat(checkpoint['calculation_date'])
+        done_rows = checkpoint['completed_chunks'] * self.chunk_size
+
+        chunks = timed_iter(iter_farm_chunks(self.input_file, self.chunk_size, skip_rows=done_rows), 'batch.read')
+
+        pending = deque()
+        if self.workers == 1:
+            for chunk in chunks:
+                key, future = self.cached_chunk(chunk)
+                if future is None:
+                    future = Future()
+                    future.set_result((*process_chunk(chunk, calculation_date), None))
+                pending.append((len(chunk), key, future))
+                self.collect(checkpoint, pending)
+        else:
+            # Keep a bounded window of chunks in flight and write them back in order
+            max_pending = self.workers * 2
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker) as pool:
+                for chunk in chunks:
+                    key, future = self.cached_chunk(chunk)
+                    if future is None:
+                        future = pool.submit(process_chunk_in_worker, chunk, calculation_date)
+                    pending.append((len(chunk), key, future))
+                    if len(pending) >= max_pending:
+                        self.collect(checkpoint, pending)
+                while pending:
+                    self.collect(checkpoint, pending)
+
+        os.remove(self.checkpoint_path)
+        return checkpoint
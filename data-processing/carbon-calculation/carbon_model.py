@@ -2,13 +2,41 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import json
+import re
 from typing import Dict, List, Optional
 
+from instrumentation.metrics import metrics
+
+PRACTICE_SEPARATORS = re.compile(r'[;,|]')
+
+def parse_practices(practices) -> List[str]:
+    """Normalize a practices value (list or delimited string) to a list of names"""
+    if practices is None:
+        return []
+    if isinstance(practices, str):
+        return [p.strip() for p in PRACTICE_SEPARATORS.split(practices) if p.strip()]
+    if isinstance(practices, float) and np.isnan(practices):
+        return []
+    return [str(p).strip() for p in practices if str(p).strip()]
+
+def parse_as_of(as_of) -> Optional[datetime]:
+    """Normalize an as-of date (YYYY-MM-DD string, date or datetime)"""
+    if as_of is None or isinstance(as_of, datetime):
+        return as_of
+    if isinstance(as_of, str):
+        return datetime.strptime(as_of, '%Y-%m-%d')
+    return datetime(as_of.year, as_of.month, as_of.day)
+
 class CarbonModel:
-    def __init__(self, model_type='agroforestry'):
+    def __init__(self, model_type='agroforestry', as_of=None):
         self.model_type = model_type
+        self.as_of = parse_as_of(as_of)
         self.parameters = self.load_parameters()
         
+    def current_date(self) -> datetime:
+        """Date calculations are made at: the pinned as-of date, or now"""
+        return self.as_of or datetime.now()
+        
     def load_parameters(self):
         """Load model parameters based on type"""
         if self.model_type == 'agroforestry':
@@ -39,7 +67,7 @@ class CarbonModel:
         area = farm_data['area_ha']
         tree_count = farm_data.get('tree_count', 0)
         establishment_date = datetime.strptime(farm_data['establishment_date'], '%Y-%m-%d')
-        current_date = datetime.now()
+        current_date = self.current_date()
         
         # Calculate project age in years
         project_age = (current_date - establishment_date).days / 365.25
@@ -74,9 +102,9 @@ class CarbonModel:
     def calculate_rice_credits(self, farm_data: Dict) -> Dict:
         """Calculate carbon credits for rice cultivation"""
         area = farm_data['area_ha']
-        practices = farm_data.get('practices', [])
+        practices = parse_practices(farm_data.get('practices', []))
         establishment_date = datetime.strptime(farm_data['establishment_date'], '%Y-%m-%d')
-        current_date = datetime.now()
+        current_date = self.current_date()
         project_age = (current_date - establishment_date).days / 365.25
         
         # Calculate practice factor
@@ -101,15 +129,24 @@ class CarbonModel:
         
     def calculate_credits(self, farm_data: Dict) -> Dict:
         """Calculate carbon credits based on farm type"""
-        if self.model_type == 'agroforestry':
-            return self.calculate_agroforestry_credits(farm_data)
-        elif self.model_type == 'rice':
-            return self.calculate_rice_credits(farm_data)
-        else:
-            raise ValueError(f"Unsupported model type: {self.model_type}")
+        with metrics().stage('carbon.calculate', items=1):
+            if self.model_type == 'agroforestry':
+                return self.calculate_agroforestry_credits(farm_data)
+            elif self.model_type == 'rice':
+                return self.calculate_rice_credits(farm_data)
+            else:
+                raise ValueError(f"Unsupported model type: {self.model_type}")
             
     def validate_farm_data(self, farm_data: Dict) -> List[str]:
-        """Validate farm data for carbon calculation"""
+        """Validate farm data for carbon calculation, counting failures by reason"""
+        with metrics().stage('carbon.validate', items=1):
+            errors = self.validation_errors(farm_data)
+        if errors:
+            metrics().count_many({f"validation_failures.{error}": 1 for error in errors})
+        return errors
+        
+    def validation_errors(self, farm_data: Dict) -> List[str]:
+        """Validation error messages for a farm (empty when valid)"""
         errors = []
         
         required_fields = ['area_ha', 'establishment_date', 'crop_type']
@@ -120,7 +157,7 @@ class CarbonModel:
         if 'establishment_date' in farm_data:
             try:
                 establishment_date = datetime.strptime(farm_data['establishment_date'], '%Y-%m-%d')
-                if establishment_date > datetime.now():
+                if establishment_date > self.current_date():
                     errors.append("Establishment date cannot be in the future")
             except ValueError:
                 errors.append("Invalid establishment date format. Use YYYY-MM-DD")
@@ -130,13 +167,14 @@ class CarbonModel:
             
         return errors
         
-    def generate_verification_report(self, farm_data: Dict, calculation_results: Dict) -> Dict:
+    def generate_verification_report(self, farm_data: Dict, calculation_results: Dict,
+                                     uncertainty: Optional[Dict] = None) -> Dict:
         """Generate a verification report for carbon credits"""
-        validation_errors = self.validate_farm_data(farm_data)
+        validation_errors = self.validation_errors(farm_data)
         
         report = {
             'farm_id': farm_data.get('farm_id', 'unknown'),
-            'calculation_date': datetime.now().isoformat(),
+            'calculation_date': self.current_date().isoformat(),
             'model_type': self.model_type,
             'validation_errors': validation_errors,
             'calculation_results': calculation_results,
@@ -144,7 +182,24 @@ class CarbonModel:
             'recommendations': []
         }
         
+        if uncertainty:
+            report['uncertainty'] = uncertainty
+            
         if not validation_errors:
             report['verification_status'] = 'ready_for_verification'
             
-        return report
\ No newline at end of file
+        return report
+    
+    def generate_portfolio_report(self, portfolio_uncertainty: Dict) -> Dict:
+        """Generate a verification report for the summed credits of a farm portfolio"""
+        farm_count = portfolio_uncertainty.get('farm_count', 0)
+        
+        return {
+            'farm_id': 'portfolio',
+            'calculation_date': self.current_date().isoformat(),
+            'farm_count': farm_count,
+            'calculation_results': {'total_credits': portfolio_uncertainty.get('point_estimate', 0.0)},
+            'uncertainty': portfolio_uncertainty,
+            'verification_status': 'ready_for_verification' if farm_count else 'pending',
+            'recommendations': []
+        }
@@ -0,0 +1,309 @@
+import pandas as pd
+import numpy as np
+import json
+import os
+import shutil
+import uuid
+from typing import Dict, Iterator, List, Optional
+
+from carbon_calculation.batch_engine import REPORT_RESULT_FIELDS
+from carbon_calculation.carbon_model import parse_practices
+from instrumentation.metrics import metrics
+
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+
+# Hive partitions of the verification report dataset
+REPORT_PARTITIONS = ['report_date', 'model_type']
+
+def is_parquet(path: str) -> bool:
+    """Parquet file or dataset directory (anything else is read as CSV)"""
+    return path.lower().endswith(PARQUET_EXTENSIONS) or os.path.isdir(path)
+
+def typed_farms(df: pd.DataFrame) -> pd.DataFrame:
+    """Farm registry columns as typed values: dates, categorical crop_type and practices lists"""
+    df = df.copy()
+    if 'farm_id' in df.columns:
+        df['farm_id'] = df['farm_id'].astype('string')
+    if 'crop_type' in df.columns:
+        df['crop_type'] = df['crop_type'].astype('category')
+    if 'establishment_date' in df.columns:
+        df['establishment_date'] = pd.to_datetime(df['establishment_date'], format='%Y-%m-%d', errors='coerce')
+    if 'practices' in df.columns:
+        df['practices'] = df['practices'].map(parse_practices)
+    return df
+
+def text_farms(df: pd.DataFrame) -> pd.DataFrame:
+    """Inverse of typed_farms: the CSV text form, so typed and CSV inputs hash alike"""
+    df = df.copy()
+    if 'crop_type' in df.columns and isinstance(df['crop_type'].dtype, pd.CategoricalDtype):
+        df['crop_type'] = df['crop_type'].astype(object)
+    if 'establishment_date' in df.columns and pd.api.types.is_datetime64_any_dtype(df['establishment_date']):
+        df['establishment_date'] = df['establishment_date'].dt.strftime('%Y-%m-%d')
+    if 'practices' in df.columns and df['practices'].map(lambda value: not isinstance(value, (str, float))).any():
+        df['practices'] = df['practices'].map(lambda value: ';'.join(parse_practices(value)) or np.nan)
+    return df
+
+# Integral values below this are written without a decimal point in canonical text
+MAX_EXACT_INTEGER = 2 ** 53
+
+# Text that canonical_text reads as a number ('150', '2.50', '1e3')
+NUMBER_PATTERN = r'\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?\s*'
+
+def canonical_text(values: pd.Series) -> pd.Series:
+    """One text form per value whatever the column's dtype: 150, 150.0 and '150' all become '150', missing is ''"""
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        numbers = values.astype(float).to_numpy()
+        text = None
+    else:
+        text = values.astype('string')
+        is_number_text = text.str.fullmatch(NUMBER_PATTERN).fillna(False).to_numpy(dtype=bool)
+        numbers = np.full(len(values), np.nan)
+        numbers[is_number_text] = pd.to_numeric(text[is_number_text]).astype(float).to_numpy()
+
+    is_number = ~np.isnan(numbers)
+    with np.errstate(invalid='ignore'):
+        integral = is_number & (numbers == np.floor(numbers)) & (np.abs(numbers) < MAX_EXACT_INTEGER)
+    fractional = is_number & ~integral
+
+    canonical = np.full(len(values), '', dtype=object)
+    if text is not None:
+        is_text = ~is_number & text.notna().to_numpy()
+        canonical[is_text] = text[is_text].to_numpy(dtype=object)
+    canonical[integral] = numbers[integral].astype(np.int64).astype(str)
+    canonical[fractional] = [repr(number) for number in numbers[fractional].tolist()]
+    return pd.Series(canonical, index=values.index)
+
+def canonical_farms(df: pd.DataFrame) -> pd.DataFrame:
+    """Farm rows as canonical text, for hashing.
+
+    pandas infers each CSV chunk's dtypes separately (one blank cell turns an
+    integer column into float64), and Parquet inputs arrive typed, so
+    hashing raw columns would tell identical values apart.
+    """
+    df = text_farms(df)
+    if 'establishment_date' in df.columns:
+        # typed_farms stores a malformed date as NaT, so CSV text is hashed the same way
+        dates = pd.to_datetime(df['establishment_date'], format='%Y-%m-%d', errors='coerce')
+        df['establishment_date'] = dates.dt.strftime('%Y-%m-%d')
+    return pd.DataFrame({column: canonical_text(df[column]) for column in df.columns}, index=df.index)
+
+def typed_results(df: pd.DataFrame) -> pd.DataFrame:
+    """Batch results with categorical crop_type and timestamp calculation_date"""
+    df = df.copy()
+    df['crop_type'] = df['crop_type'].astype('category')
+    df['calculation_date'] = pd.to_datetime(df['calculation_date'])
+    return df
+
+def read_farms(path: str) -> pd.DataFrame:
+    """Read a farm registry from Parquet (typed) or CSV"""
+    if is_parquet(path):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+def write_parquet(df: pd.DataFrame, path: str):
+    """Write a typed DataFrame as a single Parquet file"""
+    write_parquet_chunks([df], path)
+    return path
+
+def iter_farm_chunks(path: str, chunk_size: int, skip_rows: int = 0) -> Iterator[pd.DataFrame]:
+    """Farm chunks of exactly chunk_size rows (the last may be shorter) from CSV or Parquet.
+
+    Parquet batches are re-cut at chunk_size so chunk boundaries do not depend
+    on the file's row groups, which keeps chunk-level checkpoints and caches
+    valid across both formats.
+    """
+    if not is_parquet(path):
+        yield from pd.read_csv(path, chunksize=chunk_size, skiprows=range(1, skip_rows + 1))
+        return
+
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    buffered = []
+    buffered_rows = 0
+    for batch in ds.dataset(path, format='parquet').to_batches(batch_size=chunk_size):
+        if skip_rows:
+            dropped = min(skip_rows, batch.num_rows)
+            batch = batch.slice(dropped)
+            skip_rows -= dropped
+        if batch.num_rows == 0:
+            continue
+        buffered.append(batch)
+        buffered_rows += batch.num_rows
+        while buffered_rows >= chunk_size:
+            table = pa.Table.from_batches(buffered)
+            yield table.slice(0, chunk_size).to_pandas()
+            rest = table.slice(chunk_size)
+            buffered = rest.to_batches()
+            buffered_rows = rest.num_rows
+    if buffered_rows:
+        yield pa.Table.from_batches(buffered).to_pandas()
+
+def arrow_table(df: pd.DataFrame):
+    """Arrow table of a typed frame with stable types, so chunks share one schema"""
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    fixed = {
+        'farm_id': pa.string(),
+        'crop_type': pa.dictionary(pa.int32(), pa.string()),
+        'practices': pa.list_(pa.string()),
+        'validation_errors': pa.list_(pa.string())
+    }
+    schema = table.schema
+    for name, field_type in fixed.items():
+        if name in schema.names:
+            schema = schema.set(schema.get_field_index(name), pa.field(name, field_type))
+    return table.cast(schema)
+
+def write_parquet_chunks(frames, path: str) -> int:
+    """Stream DataFrame chunks into one Parquet file; returns the rows written"""
+    import pyarrow.parquet as pq
+
+    writer = None
+    rows = 0
+    try:
+        for frame in frames:
+            table = arrow_table(frame)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            elif len(frame) == 0:
+                continue
+            else:
+                table = table.cast(writer.schema)
+            writer.write_table(table)
+            rows += len(frame)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+def csv_to_parquet(csv_path: str, parquet_path: str, convert=typed_results, chunk_size: int = 200000) -> int:
+    """Stream a CSV into one Parquet file, typing each chunk with convert"""
+    return write_parquet_chunks((convert(chunk) for chunk in pd.read_csv(csv_path, chunksize=chunk_size)),
+                                parquet_path)
+
+def report_record(report: Dict) -> Dict:
+    """Flatten a CarbonModel verification report into one report dataset row"""
+    results = report.get('calculation_results', {})
+    record = {
+        'farm_id': str(report['farm_id']),
+        'calculation_date': pd.Timestamp(report['calculation_date']),
+        'model_type': report['model_type'],
+        'verification_status': report['verification_status'],
+        'validation_errors': list(report['validation_errors'])
+    }
+    for field in dict.fromkeys(sum(REPORT_RESULT_FIELDS.values(), [])):
+        record[field] = results.get(field, np.nan)
+    record['uncertainty'] = json.dumps(report['uncertainty']) if report.get('uncertainty') else None
+    return record
+
+def report_json(row: Dict) -> Dict:
+    """Rebuild the CarbonModel verification report of one report dataset row"""
+    calculation_date = pd.Timestamp(row['calculation_date']).isoformat()
+    validation_errors = list(row['validation_errors']) if row['validation_errors'] is not None else []
+    results = {}
+    if not validation_errors:
+        for field in REPORT_RESULT_FIELDS.get(row['model_type'], []):
+            results[field] = float(row[field])
+        results['model_type'] = row['model_type']
+        results['calculation_date'] = calculation_date
+
+    report = {
+        'farm_id': row['farm_id'],
+        'calculation_date': calculation_date,
+        'model_type': row['model_type'],
+        'validation_errors': validation_errors,
+        'calculation_results': results,
+        'verification_status': row['verification_status'],
+        'recommendations': []
+    }
+    if isinstance(row.get('uncertainty'), str):
+        report['uncertainty'] = json.loads(row['uncertainty'])
+    return report
+
+class ReportDataset:
+    """Verification reports as a Parquet dataset partitioned by report date and model type.
+
+    Replaces one JSON file per farm: a batch writes one file per partition
+    and chunk, and reports are turned back into the JSON format on demand.
+    """
+
+    def __init__(self, dataset_dir: str):
+        self.dataset_dir = dataset_dir
+
+    def partitioning(self):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        return ds.partitioning(pa.schema([(name, pa.string()) for name in REPORT_PARTITIONS]), flavor='hive')
+
+    def date_path(self, report_date: str) -> str:
+        return os.path.join(self.dataset_dir, f"report_date={report_date}")
+
+    def write(self, reports: pd.DataFrame) -> int:
+        """Append report rows (report_frame or report_record columns); returns the rows written"""
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        if reports.empty:
+            return 0
+        with metrics().stage('report.write', items=len(reports)):
+            reports = reports.copy()
+            reports['report_date'] = pd.to_datetime(reports['calculation_date']).dt.strftime('%Y-%m-%d')
+            reports['model_type'] = reports['model_type'].fillna('unknown').astype(str)
+            reports['validation_errors'] = reports['validation_errors'].map(list)
+            # Part file names are random, so the write time decides which of a farm's reports is latest
+            reports['written_at'] = pd.Timestamp.now(tz='UTC')
+            if 'uncertainty' not in reports.columns:
+                reports['uncertainty'] = None
+
+            table = arrow_table(reports)
+            table = table.cast(table.schema.set(table.schema.get_field_index('uncertainty'),
+                                                pa.field('uncertainty', pa.string())))
+            ds.write_dataset(table, self.dataset_dir, format='parquet', partitioning=self.partitioning(),
+                             basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+                             existing_data_behavior='overwrite_or_ignore')
+        return len(reports)
+
+    def replace(self, frames, report_date: str) -> int:
+        """Replace every report of report_date with the given report frames.
+
+        The frames are written to a hidden staging dataset (readers skip
+        dot-prefixed directories) and swapped in only once all of them are
+        written, so a failed run leaves the previous reports in place.
+        """
+        staging = ReportDataset(os.path.join(self.dataset_dir, f".staging-{uuid.uuid4().hex}"))
+        os.makedirs(staging.dataset_dir)
+        try:
+            written = sum(staging.write(frame) for frame in frames)
+            replaced = os.path.join(staging.dataset_dir, 'replaced')
+            if os.path.isdir(self.date_path(report_date)):
+                os.replace(self.date_path(report_date), replaced)
+            if os.path.isdir(staging.date_path(report_date)):
+                os.replace(staging.date_path(report_date), self.date_path(report_date))
+        finally:
+            shutil.rmtree(staging.dataset_dir, ignore_errors=True)
+        return written
+
+    def read(self, farm_ids: Optional[List[str]] = None, report_date: Optional[str] = None) -> pd.DataFrame:
+        """Report rows, optionally filtered by farm and date, latest date and write last"""
+        import pyarrow.dataset as ds
+
+        if not os.path.isdir(self.dataset_dir):
+            return pd.DataFrame()
+        dataset = ds.dataset(self.dataset_dir, format='parquet', partitioning=self.partitioning())
+        condition = None
+        if farm_ids is not None:
+            condition = ds.field('farm_id').isin([str(farm_id) for farm_id in farm_ids])
+        if report_date is not None:
+            date_condition = ds.field('report_date') == report_date
+            condition = date_condition if condition is None else condition & date_condition
+        reports = dataset.to_table(filter=condition).to_pandas()
+        order = [column for column in ['report_date', 'farm_id', 'written_at'] if column in reports.columns]
+        return reports.sort_values(order, kind='stable').reset_index(drop=True)
+
+    def json_reports(self, farm_ids: Optional[List[str]] = None, report_date: Optional[str] = None) -> Dict[str, Dict]:
+        """Latest JSON report per farm (within report_date if given)"""
+        reports = self.read(farm_ids, report_date)
+        latest = reports.drop_duplicates('farm_id', keep='last')
+        return {row['farm_id']: report_json(row) for row in latest.to_dict('records')}
@@ -0,0 +1,164 @@
+import pandas as pd
+import numpy as np
+from typing import Iterator, Optional, Tuple
+
+from carbon_calculation.batch_engine import BatchCarbonModel
+from carbon_calculation.columnar import iter_farm_chunks
+
+PERIODS_PER_YEAR = {'annual': 1, 'monthly': 12}
+
+class CreditProjection:
+    """Cumulative credit curves for many farms over their project lifespan.
+
+    Evaluates the CarbonModel formulas on a farms x periods grid of project
+    ages in one broadcasted pass. Periods are either relative to each farm's
+    establishment date (project year/month 1..N) or a shared calendar grid of
+    period end dates.
+    """
+
+    def __init__(self, frequency: str = 'annual', horizon_years: Optional[int] = None,
+                 calendar: bool = False, start=None, as_of=None):
+        if frequency not in PERIODS_PER_YEAR:
+            raise ValueError(f"Unknown frequency: {frequency}")
+        self.engine = BatchCarbonModel(as_of=as_of)
+        self.frequency = frequency
+        self.horizon_years = horizon_years or self.engine.parameters['agroforestry']['lifespan']
+        self.calendar = calendar
+        self.start = pd.Timestamp(start) if start is not None else None
+
+    def relative_ages(self) -> np.ndarray:
+        """Project age in years at the end of each relative period"""
+        per_year = PERIODS_PER_YEAR[self.frequency]
+        return np.arange(1, self.horizon_years * per_year + 1) / per_year
+
+    def calendar_periods(self, establishment_date: pd.Series) -> pd.DatetimeIndex:
+        """Period end dates from the grid start (or earliest farm) to the end of the latest lifespan"""
+        start = self.start if self.start is not None else establishment_date.min()
+        end = establishment_date.max() + pd.DateOffset(years=self.horizon_years)
+        offset = pd.offsets.YearEnd() if self.frequency == 'annual' else pd.offsets.MonthEnd()
+        return pd.date_range(start, end + offset, freq=offset)
+
+    def ages(self, establishment_date: pd.Series, periods: Optional[pd.DatetimeIndex]) -> np.ndarray:
+        """Project ages as a (periods,) vector or, on a calendar grid, a farms x periods matrix"""
+        if not self.calendar:
+            return self.relative_ages()
+        days = (periods.values[None, :] - establishment_date.values[:, None]) // np.timedelta64(1, 'D')
+        return np.clip(days / 365.25, 0, self.horizon_years)
+
+    def cumulative_credits(self, df: pd.DataFrame, ages: np.ndarray) -> np.ndarray:
+        """Cumulative credits (farms x periods) for valid farms in df"""
+        agro = self.engine.parameters['agroforestry']
+        rice = self.engine.parameters['rice']
+
+        area = pd.to_numeric(df['area_ha'], errors='coerce').to_numpy(dtype=float)[:, None]
+        tree_count = self.engine.tree_counts(df)[:, None]
+        model_types = self.engine.model_types(df).fillna('').to_numpy(dtype=object)
+        is_agroforestry = (model_types == 'agroforestry')[:, None]
+
+        ages = np.atleast_2d(ages)
+        maturity_factor = np.minimum(ages / agro['maturity_age'], 1.0)
+        agro_total = (tree_count * agro['tree_growth_rate'] * ages * maturity_factor
+                      + agro['soil_carbon_accumulation'] * area * np.minimum(ages, agro['lifespan'])
+                      + agro['baseline_emissions'] * area * ages)
+
+        reduction = 1.0 - self.engine.practice_factors(df)[:, None]
+        rice_total = rice['baseline_emissions'] * area * ages * reduction
+
+        return np.where(is_agroforestry, agro_total, rice_total)
+
+    def file_periods(self, input_file: str, chunk_size: int = 10000) -> Optional[pd.DatetimeIndex]:
+        """Calendar grid spanning every valid farm in a file, so all its chunks share one period axis"""
+        first, last = None, None
+        for chunk in iter_farm_chunks(input_file, chunk_size):
+            errors = self.engine.validate_frame(chunk)
+            establishment_date = self.engine.parse_dates(chunk[(errors.map(len) == 0).to_numpy()])
+            if establishment_date.empty:
+                continue
+            first = establishment_date.min() if first is None else min(first, establishment_date.min())
+            last = establishment_date.max() if last is None else max(last, establishment_date.max())
+        if first is None:
+            return None
+        return self.calendar_periods(pd.Series([first, last]))
+
+    def project(self, df: pd.DataFrame,
+                periods: Optional[pd.DatetimeIndex] = None) -> Tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+        """Project all valid farms in df.
+
+        Returns the projected farms (farm_id, crop_type, establishment_date),
+        the period axis (project ages, or period end dates on a calendar grid)
+        and the farms x periods cumulative credit array. On a calendar grid,
+        periods defaults to the grid spanning df's own farms.
+        """
+        errors = self.engine.validate_frame(df)
+        valid = df[(errors.map(len) == 0).to_numpy()]
+        establishment_date = self.engine.parse_dates(valid)
+        if valid.empty:
+            empty = pd.DataFrame(columns=['farm_id', 'crop_type', 'establishment_date'])
+            return empty, np.array([]), np.zeros((0, 0))
+
+        if self.calendar and periods is None:
+            periods = self.calendar_periods(establishment_date)
+        ages = self.ages(establishment_date, periods)
+        cumulative = self.cumulative_credits(valid, ages)
+
+        farms = pd.DataFrame({
+            'farm_id': valid['farm_id'].to_numpy() if 'farm_id' in valid.columns else 'unknown',
+            'crop_type': valid['crop_type'].to_numpy(),
+            'establishment_date': establishment_date.to_numpy()
+        })
+        axis = periods.to_numpy() if self.calendar else ages
+        return farms, axis, cumulative
+
+    def iter_chunks(self, input_file: str, chunk_size: int = 10000) -> Iterator[Tuple[pd.DataFrame, np.ndarray, np.ndarray]]:
+        """Project a farm CSV or Parquet file chunk by chunk to bound memory"""
+        periods = self.file_periods(input_file, chunk_size) if self.calendar else None
+        for chunk in iter_farm_chunks(input_file, chunk_size):
+            yield self.project(chunk, periods)
+
+def period_credits(cumulative: np.ndarray) -> np.ndarray:
+    """Credits earned within each period from a cumulative curve"""
+    return np.diff(cumulative, axis=1, prepend=0.0)
+
+def projection_table(farms: pd.DataFrame, axis: np.ndarray, cumulative: np.ndarray,
+                     calendar: bool = False) -> pd.DataFrame:
+    """Long (farm, period) table of a projection"""
+    n_farms, n_periods = cumulative.shape
+    # Registries may repeat a farm_id; factorize so repeated ids share one category
+    farm_codes, farm_ids = pd.factorize(farms['farm_id'].astype(str))
+    crop_types = pd.Categorical(farms['crop_type'].astype(str))
+    table = pd.DataFrame({
+        'farm_id': pd.Categorical.from_codes(np.repeat(farm_codes, n_periods), categories=farm_ids),
+        'crop_type': pd.Categorical.from_codes(np.repeat(crop_types.codes, n_periods), dtype=crop_types.dtype)
+    })
+    if calendar:
+        table['period_end'] = np.tile(axis, n_farms)
+    else:
+        table['period'] = np.tile(np.arange(1, n_periods + 1, dtype=np.int32), n_farms)
+        table['project_age'] = np.tile(axis, n_farms)
+    table['cumulative_credits'] = cumulative.ravel()
+    table['period_credits'] = period_credits(cumulative).ravel()
+    return table
+
+def export_projection(chunks, output_path: str, calendar: bool = False) -> int:
+    """Stream projection chunks into a single Parquet file; returns the number of farms written"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    farms_written = 0
+    try:
+        for farms, axis, cumulative in chunks:
+            if len(farms) == 0:
+                continue
+            table = pa.Table.from_pandas(projection_table(farms, axis, cumulative, calendar),
+                                         preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(output_path, table.schema)
+            else:
+                table = table.cast(writer.schema)
+            writer.write_table(table)
+            farms_written += len(farms)
+    finally:
+        if writer is not None:
+            writer.close()
+    return farms_written
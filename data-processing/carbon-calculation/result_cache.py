@@ -0,0 +1,90 @@
+import pandas as pd
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional
+
+from carbon_calculation.columnar import canonical_farms
+from instrumentation.metrics import metrics
+
+# Bump when a formula or the key derivation changes so stale entries stop matching
+CACHE_VERSION = 1
+
+def content_key(*parts: Any) -> str:
+    """SHA-256 over a canonical JSON encoding of the given parts"""
+    payload = json.dumps([CACHE_VERSION, *parts], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def frame_digest(df: pd.DataFrame) -> str:
+    """Content hash of a DataFrame's columns and values (index ignored; values hashed as canonical text)"""
+    df = canonical_farms(df)
+    digest = hashlib.sha256()
+    digest.update(json.dumps([str(c) for c in df.columns]).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+class ResultCache:
+    """Content-addressed on-disk store for calculation results.
+
+    Keys are derived from the farm inputs, the model parameters and the as-of
+    date, so an entry can only be reused for an identical calculation.
+    Entries are JSON and Parquet, never pickles: the directory may be shared,
+    and loading a pickle written by someone else would run their code.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, key: str, extension: str) -> str:
+        """Shard entries by key prefix to keep directories small"""
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{extension}")
+
+    def farm_key(self, farm_data: Dict, parameters: Dict, as_of) -> str:
+        """Key for a single farm calculation"""
+        return content_key('farm', farm_data, parameters, as_of)
+
+    def frame_key(self, df: pd.DataFrame, parameters: Dict, as_of) -> str:
+        """Key for a batch of farms"""
+        return content_key('frame', frame_digest(df), parameters, as_of)
+
+    def get_json(self, key: str) -> Optional[Dict]:
+        path = self.path(key, 'json')
+        if not os.path.exists(path):
+            self.misses += 1
+            metrics().count('result_cache.misses')
+            return None
+        with open(path, 'r') as f:
+            self.hits += 1
+            metrics().count('result_cache.hits')
+            return json.load(f)
+
+    def put_json(self, key: str, value: Dict):
+        path = self.path(key, 'json')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(value, f)
+        os.replace(tmp_path, path)
+
+    def get_frame(self, key: str) -> Optional[pd.DataFrame]:
+        path = self.path(key, 'parquet')
+        if not os.path.exists(path):
+            self.misses += 1
+            metrics().count('result_cache.misses')
+            return None
+        self.hits += 1
+        metrics().count('result_cache.hits')
+        with metrics().stage('result_cache.read', nbytes=os.path.getsize(path)) as stage:
+            df = pd.read_parquet(path)
+            stage.items = len(df)
+        return df
+
+    def put_frame(self, key: str, df: pd.DataFrame):
+        path = self.path(key, 'parquet')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
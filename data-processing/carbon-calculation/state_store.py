@@ -0,0 +1,188 @@
+import pandas as pd
+import numpy as np
+import sqlite3
+from typing import Dict, Optional
+
+from carbon_calculation.batch_engine import BatchCarbonModel, BATCH_RESULT_COLUMNS
+from carbon_calculation.columnar import canonical_farms, is_parquet, text_farms, typed_results, write_parquet_chunks
+from carbon_calculation.result_cache import content_key
+
+# Bump when row_hashes changes, so existing stores are rebuilt instead of reporting every farm changed
+STATE_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS farm_state (
+    farm_id TEXT PRIMARY KEY,
+    input_hash TEXT NOT NULL,
+    crop_type TEXT,
+    area_ha REAL,
+    calculated_credits REAL,
+    calculation_date TEXT,
+    valid INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def row_hashes(df: pd.DataFrame) -> pd.Series:
+    """Per-row content hash of the farm inputs, independent of column order and dtypes"""
+    inputs = df.drop(columns=['operation'], errors='ignore')
+    inputs = canonical_farms(inputs[sorted(inputs.columns)])
+    hashes = pd.util.hash_pandas_object(inputs, index=False).to_numpy()
+    return pd.Series([f"{h:016x}" for h in hashes], index=df.index)
+
+class FarmStateStore:
+    """SQLite store of per-farm input hashes and last results for incremental batch runs.
+
+    Each run only recalculates farms whose inputs were added or changed and
+    drops deleted ones; the portfolio total is adjusted by the difference
+    instead of being summed over the whole registry.
+    """
+
+    def __init__(self, db_path: str, as_of):
+        self.db_path = db_path
+        self.engine = BatchCarbonModel(as_of=as_of)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def fingerprint(self) -> str:
+        """Identifies the model parameters and as-of date the stored results belong to"""
+        return content_key('state', STATE_VERSION, self.engine.parameters, self.engine.as_of)
+
+    def get_meta(self, key: str, default=None) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key: str, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def totals(self) -> Dict:
+        """Aggregate totals maintained across incremental runs"""
+        return {
+            'farm_count': int(self.get_meta('farm_count', 0)),
+            'total_credits': float(self.get_meta('total_credits', 0.0))
+        }
+
+    def stored_as_of(self) -> Optional[str]:
+        """As-of date (YYYY-MM-DD) of the stored results, if any"""
+        return self.get_meta('as_of')
+
+    def reset_if_stale(self) -> bool:
+        """Drop all state when the parameters or as-of date changed; returns True if reset.
+
+        Credits grow with project age, so results are only reusable for the
+        as-of date they were calculated at: incremental runs are meant to
+        share one reporting-period date, and a new date recalculates every farm.
+        """
+        if self.get_meta('fingerprint') == self.fingerprint():
+            return False
+        with self.conn:
+            self.conn.execute("DELETE FROM farm_state")
+            self.conn.execute("DELETE FROM meta")
+            self.set_meta('fingerprint', self.fingerprint())
+            self.set_meta('as_of', self.engine.as_of.strftime('%Y-%m-%d'))
+        return True
+
+    def stored_state(self, farm_ids: Optional[pd.Series] = None) -> pd.DataFrame:
+        """Stored hash and credits, for all farms or only the given ids"""
+        query = "SELECT farm_id, input_hash, calculated_credits, valid FROM farm_state"
+        if farm_ids is None:
+            return pd.read_sql_query(query, self.conn)
+
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS lookup_ids (farm_id TEXT PRIMARY KEY)")
+        self.conn.execute("DELETE FROM lookup_ids")
+        self.conn.executemany("INSERT OR IGNORE INTO lookup_ids VALUES (?)", ((i,) for i in farm_ids))
+        return pd.read_sql_query(f"{query} JOIN lookup_ids USING (farm_id)", self.conn)
+
+    def apply_snapshot(self, snapshot: pd.DataFrame) -> pd.DataFrame:
+        """Bring the store in line with a full registry snapshot; farms missing from it are deleted"""
+        snapshot = self._prepare(snapshot)
+        stored = self.stored_state()
+        presence = stored[['farm_id']].merge(snapshot[['farm_id']], on='farm_id', how='left', indicator=True)
+        deleted_ids = presence.loc[presence['_merge'] == 'left_only', 'farm_id']
+        return self._apply(snapshot, stored, deleted_ids)
+
+    def apply_delta(self, delta: pd.DataFrame) -> pd.DataFrame:
+        """Apply a change log: rows are upserts unless their 'operation' column is 'delete'"""
+        delta = self._prepare(delta)
+        if 'operation' in delta.columns:
+            is_delete = delta['operation'].astype(str).str.lower() == 'delete'
+        else:
+            is_delete = pd.Series(False, index=delta.index)
+
+        stored = self.stored_state(delta['farm_id'])
+        deleted_ids = delta.loc[is_delete, 'farm_id']
+        return self._apply(delta[~is_delete].drop(columns=['operation'], errors='ignore'), stored, deleted_ids)
+
+    def export_results(self, output_path: str):
+        """Write the stored valid results in the batch_results schema (Parquet if output_path says so)"""
+        query = f"SELECT {', '.join(BATCH_RESULT_COLUMNS)} FROM farm_state WHERE valid = 1 ORDER BY farm_id"
+        if is_parquet(output_path):
+            chunks = pd.read_sql_query(query, self.conn, chunksize=100000)
+            if write_parquet_chunks((typed_results(chunk) for chunk in chunks), output_path) == 0:
+                write_parquet_chunks([typed_results(pd.DataFrame(columns=BATCH_RESULT_COLUMNS))], output_path)
+            return
+        first = True
+        for chunk in pd.read_sql_query(query, self.conn, chunksize=100000):
+            chunk.to_csv(output_path, mode='w' if first else 'a', header=first, index=False)
+            first = False
+        if first:
+            pd.DataFrame(columns=BATCH_RESULT_COLUMNS).to_csv(output_path, index=False)
+
+    def _prepare(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Key rows by string farm_id (last occurrence wins) and attach input hashes"""
+        df = text_farms(df)
+        df['farm_id'] = df['farm_id'].astype(str)
+        df = df.drop_duplicates('farm_id', keep='last')
+        df['input_hash'] = row_hashes(df)
+        return df
+
+    def _apply(self, upserts: pd.DataFrame, stored: pd.DataFrame, deleted_ids: pd.Series) -> pd.DataFrame:
+        """Recalculate added/changed farms, delete removed ones and update the totals"""
+        merged = upserts[['farm_id', 'input_hash']].merge(
+            stored, on='farm_id', how='left', suffixes=('', '_stored'))
+        is_new = merged['input_hash_stored'].isna().to_numpy()
+        is_dirty = is_new | (merged['input_hash'] != merged['input_hash_stored']).to_numpy()
+        dirty = upserts[is_dirty]
+        change = np.where(is_new, 'added', 'changed')[is_dirty]
+
+        deleted = stored.merge(pd.DataFrame({'farm_id': deleted_ids}), on='farm_id', how='inner')
+        deleted_ids = deleted['farm_id']
+        replaced = pd.concat([merged[is_dirty & ~is_new], deleted])
+        old_credits = replaced.loc[replaced['valid'] == 1, 'calculated_credits'].sum()
+        old_count = int((replaced['valid'] == 1).sum())
+
+        inputs = dirty.drop(columns=['input_hash'])
+        errors = self.engine.validate_frame(inputs)
+        valid = (errors.map(len) == 0).to_numpy()
+        calculation = self.engine.calculate_frame(inputs[valid])
+
+        state = pd.DataFrame({
+            'farm_id': dirty['farm_id'],
+            'input_hash': dirty['input_hash'],
+            'crop_type': dirty['crop_type'] if 'crop_type' in dirty.columns else None,
+            'area_ha': pd.to_numeric(dirty['area_ha'], errors='coerce') if 'area_ha' in dirty.columns else np.nan,
+            'calculated_credits': calculation['total_credits'].reindex(dirty.index),
+            'calculation_date': calculation['calculation_date'].reindex(dirty.index),
+            'valid': valid.astype(int)
+        })
+
+        new_credits = state.loc[valid, 'calculated_credits'].sum()
+        totals = self.totals()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO farm_state VALUES (?, ?, ?, ?, ?, ?, ?)",
+                state.astype(object).where(state.notna(), None).itertuples(index=False, name=None))
+            self.conn.executemany("DELETE FROM farm_state WHERE farm_id = ?", ((i,) for i in deleted_ids))
+            self.set_meta('farm_count', totals['farm_count'] - old_count + int(valid.sum()))
+            self.set_meta('total_credits', totals['total_credits'] - old_credits + new_credits)
+
+        changes = state[BATCH_RESULT_COLUMNS].assign(change=change)
+        changes.loc[~valid, 'change'] = 'invalid'
+        deletions = pd.DataFrame({'farm_id': deleted_ids.to_numpy(), 'change': 'deleted'})
+        return pd.concat([changes, deletions], ignore_index=True)
@@ -0,0 +1,242 @@
+import pandas as pd
+import numpy as np
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from carbon_calculation.batch_engine import BatchCarbonModel
+from carbon_calculation.carbon_model import parse_as_of, parse_practices
+from carbon_calculation.columnar import iter_farm_chunks
+
+# Illustrative spreads around the CarbonModel point values; projects should
+# supply their own distributions from the applicable methodology.
+DEFAULT_DISTRIBUTIONS = {
+    'agroforestry': {
+        'tree_growth_rate': {'distribution': 'normal', 'cv': 0.15},
+        'soil_carbon_accumulation': {'distribution': 'normal', 'cv': 0.25},
+        'baseline_emissions': {'distribution': 'normal', 'cv': 0.10}
+    },
+    'rice': {
+        'baseline_emissions': {'distribution': 'normal', 'cv': 0.15},
+        'practice_factors': {'distribution': 'uniform', 'spread': 0.10}
+    }
+}
+
+DEFAULT_PERCENTILES = [5, 50, 95]
+
+# Upper bound on farms x draws values held per array while simulating
+MAX_BLOCK_VALUES = 2_000_000
+
+def load_distributions(path: Optional[str]) -> Dict:
+    """Load parameter distributions from JSON, falling back to the defaults"""
+    if path is None:
+        return DEFAULT_DISTRIBUTIONS
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def draw_parameter(spec: Dict, point: float, rng: np.random.Generator, draws: int) -> np.ndarray:
+    """Draw one parameter from its distribution spec, centred on the model point value"""
+    distribution = spec.get('distribution', 'fixed')
+    mean = spec.get('mean', point)
+
+    if distribution == 'fixed':
+        values = np.full(draws, float(mean))
+    elif distribution == 'normal':
+        sd = spec.get('sd', spec.get('cv', 0.0) * mean)
+        values = rng.normal(mean, sd, draws)
+    elif distribution == 'lognormal':
+        sigma = np.sqrt(np.log1p(spec.get('cv', 0.0) ** 2))
+        values = rng.lognormal(np.log(mean) - sigma ** 2 / 2, sigma, draws)
+    elif distribution == 'uniform':
+        spread = spec.get('spread', 0.0)
+        values = rng.uniform(spec.get('low', mean * (1 - spread)), spec.get('high', mean * (1 + spread)), draws)
+    elif distribution == 'triangular':
+        values = rng.triangular(spec['low'], spec.get('mode', mean), spec['high'], draws)
+    else:
+        raise ValueError(f"Unknown distribution: {distribution}")
+
+    # Rates, emissions and factors are non-negative
+    return np.maximum(values, 0.0)
+
+def sample_parameters(parameters: Dict, distributions: Dict, draws: int, seed: int) -> Dict:
+    """Draw every uncertain parameter once per draw.
+
+    Draws are shared by all farms (parameter uncertainty is systematic), so
+    farm results for the same draw can be summed into a portfolio total.
+    """
+    rng = np.random.default_rng(seed)
+    samples = {}
+    for model_type in sorted(parameters):
+        model_parameters = parameters[model_type]
+        specs = distributions.get(model_type, {})
+        sampled = {}
+        for name in sorted(model_parameters):
+            point = model_parameters[name]
+            if name == 'practice_factors':
+                spec = specs.get(name, {})
+                sampled[name] = {}
+                for practice in sorted(point):
+                    practice_spec = spec.get(practice, spec) if 'distribution' not in spec else spec
+                    sampled[name][practice] = np.minimum(
+                        draw_parameter(practice_spec, point[practice], rng, draws), 1.0)
+            elif name in specs:
+                sampled[name] = draw_parameter(specs[name], point, rng, draws)
+            else:
+                sampled[name] = np.full(draws, float(point))
+        samples[model_type] = sampled
+    return samples
+
+def simulate_block(engine: BatchCarbonModel, df: pd.DataFrame, calculation: pd.DataFrame,
+                   samples: Dict) -> np.ndarray:
+    """Credits for every (farm, draw) pair of a block of valid farms"""
+    agro = engine.parameters['agroforestry']
+    agro_draws = samples['agroforestry']
+    rice_draws = samples['rice']
+
+    age = calculation['project_age'].to_numpy()[:, None]
+    area = pd.to_numeric(df['area_ha'], errors='coerce').to_numpy(dtype=float)[:, None]
+    tree_count = engine.tree_counts(df)[:, None]
+    is_agroforestry = (calculation['model_type'].to_numpy() == 'agroforestry')[:, None]
+
+    maturity_factor = np.minimum(age / agro['maturity_age'], 1.0)
+    agro_total = (tree_count * age * maturity_factor * agro_draws['tree_growth_rate']
+                  + area * np.minimum(age, agro['lifespan']) * agro_draws['soil_carbon_accumulation']
+                  + area * age * agro_draws['baseline_emissions'])
+
+    # Product of the practice factor draws for each distinct practice combination
+    if 'practices' in df.columns:
+        practices = df['practices'].fillna('').map(lambda value: ';'.join(parse_practices(value)))
+        codes, combinations = pd.factorize(practices)
+    else:
+        codes, combinations = np.zeros(len(df), dtype=int), ['']
+    draws = len(rice_draws['baseline_emissions'])
+    combination_factors = np.ones((len(combinations), draws))
+    for i, combination in enumerate(combinations):
+        for practice in parse_practices(combination):
+            if practice in rice_draws['practice_factors']:
+                combination_factors[i] *= rice_draws['practice_factors'][practice]
+    rice_total = area * age * rice_draws['baseline_emissions'] * (1.0 - combination_factors[codes])
+
+    return np.where(is_agroforestry, agro_total, rice_total)
+
+def simulate_chunk(df: pd.DataFrame, samples: Dict, percentiles: List[float],
+                   as_of=None) -> Tuple[pd.DataFrame, np.ndarray]:
+    """Per-farm summary and per-draw credit sum for one chunk of farms"""
+    engine = BatchCarbonModel(as_of=as_of)
+    errors = engine.validate_frame(df)
+    valid = df[(errors.map(len) == 0).to_numpy()]
+
+    draws = len(samples['rice']['baseline_emissions'])
+    draw_totals = np.zeros(draws)
+    summaries = []
+    block_rows = max(1, MAX_BLOCK_VALUES // draws)
+    for start in range(0, len(valid), block_rows):
+        block = valid.iloc[start:start + block_rows]
+        calculation = engine.calculate_frame(block)
+        credits = simulate_block(engine, block, calculation, samples)
+        draw_totals += credits.sum(axis=0)
+
+        summary = pd.DataFrame({
+            'farm_id': block['farm_id'].to_numpy() if 'farm_id' in block.columns else 'unknown',
+            'crop_type': block['crop_type'].to_numpy(),
+            'point_estimate': calculation['total_credits'].to_numpy(),
+            'mean': credits.mean(axis=1),
+            'std': credits.std(axis=1)
+        })
+        for q, values in zip(percentiles, np.percentile(credits, percentiles, axis=1)):
+            summary[f"p{q:g}"] = values
+        summaries.append(summary)
+
+    if summaries:
+        return pd.concat(summaries, ignore_index=True), draw_totals
+    return pd.DataFrame(), draw_totals
+
+class UncertaintyEngine:
+    """Monte Carlo confidence intervals for carbon credit estimates.
+
+    Parameter values are drawn once per run from a fixed seed and shared by
+    all farms, so results are reproducible and independent of how farms are
+    chunked across worker processes.
+    """
+
+    def __init__(self, distributions: Optional[Dict] = None, draws: int = 1000, seed: int = 42,
+                 percentiles: Optional[List[float]] = None, as_of=None):
+        self.as_of = parse_as_of(as_of)
+        self.draws = draws
+        self.seed = seed
+        self.percentiles = percentiles or DEFAULT_PERCENTILES
+        self.distributions = distributions or DEFAULT_DISTRIBUTIONS
+        self.samples = sample_parameters(BatchCarbonModel().parameters, self.distributions, draws, seed)
+
+    def simulate(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, np.ndarray]:
+        """Simulate a DataFrame of farms in-process"""
+        return simulate_chunk(df, self.samples, self.percentiles, self.as_of)
+
+    def farm_uncertainty(self, farm_data: Dict) -> Dict:
+        """Percentile summary for a single farm, for inclusion in its verification report"""
+        summary, _ = self.simulate(pd.DataFrame([farm_data]))
+        if summary.empty:
+            return {}
+        row = summary.iloc[0]
+        return {
+            'draws': self.draws,
+            'seed': self.seed,
+            'mean': float(row['mean']),
+            'std': float(row['std']),
+            'percentiles': {f"p{q:g}": float(row[f"p{q:g}"]) for q in self.percentiles}
+        }
+
+    def portfolio_summary(self, draw_totals: np.ndarray, point_total: float, farm_count: int) -> Dict:
+        """Percentiles of the summed portfolio credits across draws"""
+        return {
+            'farm_count': farm_count,
+            'draws': self.draws,
+            'seed': self.seed,
+            'point_estimate': float(point_total),
+            'mean': float(draw_totals.mean()),
+            'std': float(draw_totals.std()),
+            'percentiles': {f"p{q:g}": float(v) for q, v in
+                            zip(self.percentiles, np.percentile(draw_totals, self.percentiles))}
+        }
+
+    def run_file(self, input_file: str, output_path: str, workers: int = 1,
+                 chunk_size: int = 20000) -> Dict:
+        """Simulate a farm CSV or Parquet file chunk by chunk across a process pool.
+
+        Per-farm summaries are appended to output_path in input order; returns
+        the portfolio summary.
+        """
+        draw_totals = np.zeros(self.draws)
+        point_total = 0.0
+        farm_count = 0
+        first = True
+
+        def write(summary: pd.DataFrame, totals: np.ndarray):
+            nonlocal draw_totals, point_total, farm_count, first
+            draw_totals += totals
+            if summary.empty:
+                return
+            point_total += summary['point_estimate'].sum()
+            farm_count += len(summary)
+            summary.to_csv(output_path, mode='w' if first else 'a', header=first, index=False)
+            first = False
+
+        chunks = iter_farm_chunks(input_file, chunk_size)
+        if workers <= 1:
+            for chunk in chunks:
+                write(*self.simulate(chunk))
+        else:
+            pending = deque()
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for chunk in chunks:
+                    pending.append(pool.submit(simulate_chunk, chunk, self.samples, self.percentiles, self.as_of))
+                    if len(pending) >= workers * 2:
+                        write(*pending.popleft().result())
+                while pending:
+                    write(*pending.popleft().result())
+
+        if first:
+            pd.DataFrame(columns=['farm_id', 'crop_type', 'point_estimate', 'mean', 'std']).to_csv(
+                output_path, index=False)
+        return self.portfolio_summary(draw_totals, point_total, farm_count)
@@ -0,0 +1,256 @@
+import pandas as pd
+import json
+import math
+import os
+import queue
+import socketserver
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+from carbon_calculation.batch_engine import BatchCarbonModel, MODEL_TYPES, REQUIRED_FIELDS
+from carbon_calculation.carbon_model import CarbonModel, parse_as_of
+from carbon_calculation.columnar import report_json
+from carbon_calculation.worker_client import parse_address
+
+# A batch is closed after MAX_BATCH jobs or MAX_WAIT_SECONDS after its first job
+MAX_BATCH = 512
+MAX_WAIT_SECONDS = 0.005
+
+# Smaller batches go through warm per-farm CarbonModel instances instead of pandas
+VECTORIZE_MIN_BATCH = 8
+
+# How long a closing connection waits for its outstanding responses
+DRAIN_TIMEOUT_SECONDS = 60.0
+
+Job = Tuple[Dict, Callable[[Dict], None]]
+
+def is_number(value) -> bool:
+    """A finite int or float (bools and numeric strings are not)"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+def vectorizable(farm_data: Dict) -> bool:
+    """Whether report_frame computes exactly what CarbonModel does for this farm.
+
+    The frame path coerces columns (numeric strings, nulls, epoch integers),
+    where CarbonModel rejects the value or fails; such farms, and farms
+    missing a required key, are calculated one by one instead.
+    """
+    if not all(field in farm_data for field in REQUIRED_FIELDS):
+        return False
+    if not is_number(farm_data['area_ha']):
+        return False
+    if 'tree_count' in farm_data and not is_number(farm_data['tree_count']):
+        return False
+    if not isinstance(farm_data['establishment_date'], str) or not isinstance(farm_data['crop_type'], str):
+        return False
+    return isinstance(farm_data.get('practices'), (str, list, type(None)))
+
+def finite_response(response: Dict) -> Dict:
+    """The response, or an error if it holds NaN or Infinity (which are not JSON)"""
+    try:
+        json.dumps(response, allow_nan=False)
+    except ValueError:
+        return {'status': 'error', 'error': "Calculation produced a non-finite value"}
+    return response
+
+class JobHandler(socketserver.StreamRequestHandler):
+    """Read newline-delimited JSON jobs from one connection and write responses as batches finish"""
+
+    def handle(self):
+        lock = threading.Condition()
+        outstanding = 0
+
+        def reply(response: Dict):
+            nonlocal outstanding
+            data = (json.dumps(response) + '\n').encode('utf-8')
+            with lock:
+                try:
+                    self.wfile.write(data)
+                    self.wfile.flush()
+                except (OSError, ValueError):
+                    pass
+                outstanding -= 1
+                lock.notify_all()
+
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            with lock:
+                outstanding += 1
+            try:
+                job = json.loads(line)
+            except ValueError as e:
+                reply({'id': None, 'status': 'error', 'error': f"Invalid JSON: {e}"})
+                continue
+            if not isinstance(job, dict):
+                reply({'id': None, 'status': 'error', 'error': "A job must be a JSON object"})
+                continue
+            self.server.worker.submit(job, reply)
+
+        # The client may half-close after sending; answer everything it sent first
+        with lock:
+            lock.wait_for(lambda: outstanding == 0, timeout=DRAIN_TIMEOUT_SECONDS)
+
+# Pending connections the listening socket holds (socketserver's default is 5)
+REQUEST_QUEUE_SIZE = 128
+
+class UnixJobServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = REQUEST_QUEUE_SIZE
+
+class TCPJobServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = REQUEST_QUEUE_SIZE
+
+class CalculationWorker:
+    """Long-lived carbon calculation service on a local socket.
+
+    Keeps the engine and CarbonModel instances warm across requests.
+    Connection threads queue jobs; one batching thread closes a batch after
+    max_batch jobs or max_wait seconds, whichever comes first, and
+    calculates it in one vectorized BatchCarbonModel call (small batches use
+    the per-farm CarbonModel). Reports are identical to `main.py carbon`.
+    """
+
+    def __init__(self, address: str, as_of=None, max_batch: int = MAX_BATCH,
+                 max_wait: float = MAX_WAIT_SECONDS):
+        self.address = parse_address(address)
+        self.as_of = parse_as_of(as_of)
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.engine = BatchCarbonModel(as_of=self.as_of)
+        self.models = {}
+        self.jobs = queue.Queue()
+        self.server = None
+        self.stats = {'jobs': 0, 'batches': 0, 'vectorized_batches': 0}
+
+    def submit(self, job: Dict, reply: Callable[[Dict], None]):
+        self.jobs.put((job, reply))
+
+    def next_batch(self) -> List[Job]:
+        """Block for one job, then gather more until the batch is full or its wait expires"""
+        batch = [self.jobs.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.jobs.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def model(self, model_type: str, as_of) -> CarbonModel:
+        key = (model_type, as_of)
+        if key not in self.models:
+            self.models[key] = CarbonModel(model_type=model_type, as_of=as_of)
+        return self.models[key]
+
+    def calculate_one(self, farm_data: Dict, as_of) -> Dict:
+        """Response for one farm through a warm CarbonModel, as `main.py carbon` computes it"""
+        try:
+            model = self.model(str(farm_data.get('crop_type', 'agroforestry')).lower(), as_of)
+            validation_errors = model.validate_farm_data(farm_data)
+            if validation_errors:
+                return {'status': 'invalid', 'validation_errors': validation_errors}
+            results = model.calculate_credits(farm_data)
+            return {'status': 'ok', 'report': model.generate_verification_report(farm_data, results)}
+        except Exception as e:
+            return {'status': 'error', 'error': str(e)}
+
+    def calculate_frame(self, farms: List[Dict], as_of) -> List[Dict]:
+        """Responses for many farms from one vectorized report_frame call"""
+        # A farm's response must not depend on the batch it lands in
+        responses = [None] * len(farms)
+        complete = []
+        for i, farm_data in enumerate(farms):
+            if vectorizable(farm_data):
+                complete.append(i)
+            else:
+                responses[i] = self.calculate_one(farm_data, as_of)
+        if not complete:
+            return responses
+
+        df = pd.DataFrame([farms[i] for i in complete])
+        df['farm_id'] = [farms[i].get('farm_id', 'unknown') for i in complete]
+        engine = self.engine if as_of == self.as_of else BatchCarbonModel(as_of=as_of)
+        reports = engine.report_frame(df, engine.current_date())
+
+        for i, row in zip(complete, reports.to_dict('records')):
+            crop_type = str(farms[i]['crop_type']).lower()
+            if crop_type not in MODEL_TYPES:
+                responses[i] = {'status': 'error', 'error': f"Unknown model type: {crop_type}"}
+            elif len(row['validation_errors']):
+                responses[i] = {'status': 'invalid', 'validation_errors': list(row['validation_errors'])}
+            else:
+                report = report_json(row)
+                report['farm_id'] = farms[i].get('farm_id', 'unknown')
+                responses[i] = {'status': 'ok', 'report': report}
+        return responses
+
+    def process_batch(self, batch: List[Job]):
+        """Calculate a batch grouped by as-of date and send every job its response"""
+        groups = {}
+        for job, reply in batch:
+            if not isinstance(job.get('farm_data') or {}, dict):
+                reply({'id': job.get('id'), 'status': 'error', 'error': "farm_data must be a JSON object"})
+                continue
+            try:
+                as_of = parse_as_of(job.get('as_of')) or self.as_of
+            except (TypeError, ValueError) as e:
+                reply({'id': job.get('id'), 'status': 'error', 'error': str(e)})
+                continue
+            groups.setdefault(as_of, []).append((job, reply))
+
+        for as_of, jobs in groups.items():
+            farms = [job.get('farm_data') or {} for job, _ in jobs]
+            try:
+                if len(jobs) >= VECTORIZE_MIN_BATCH:
+                    responses = self.calculate_frame(farms, as_of)
+                    self.stats['vectorized_batches'] += 1
+                else:
+                    responses = [self.calculate_one(farm_data, as_of) for farm_data in farms]
+            except Exception as e:
+                responses = [{'status': 'error', 'error': str(e)}] * len(jobs)
+
+            for (job, reply), response in zip(jobs, responses):
+                reply({'id': job.get('id'), **finite_response(response)})
+        self.stats['jobs'] += len(batch)
+        self.stats['batches'] += 1
+
+    def run_batches(self):
+        while True:
+            batch = self.next_batch()
+            jobs = [(job, reply) for job, reply in batch if job is not None]
+            if jobs:
+                self.process_batch(jobs)
+            if len(jobs) < len(batch):
+                return
+
+    def serve_forever(self):
+        """Accept connections until shutdown() (or Ctrl-C)"""
+        if isinstance(self.address, tuple):
+            self.server = TCPJobServer(self.address, JobHandler)
+        else:
+            if os.path.exists(self.address):
+                os.remove(self.address)
+            self.server = UnixJobServer(self.address, JobHandler)
+        self.server.worker = self
+
+        batcher = threading.Thread(target=self.run_batches, daemon=True)
+        batcher.start()
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            self.jobs.put((None, None))
+            batcher.join()
+            if not isinstance(self.address, tuple) and os.path.exists(self.address):
+                os.remove(self.address)
+
+    def shutdown(self):
+        if self.server is not None:
+            self.server.shutdown()
@@ -0,0 +1,71 @@
+import json
+import socket
+from typing import Dict, Iterable, List, Optional, Union
+
+# Standard library only: the CLI imports this to talk to a running worker
+# without loading pandas.
+
+DEFAULT_TIMEOUT = 30.0
+
+# Jobs sent ahead of their responses on one connection
+MAX_IN_FLIGHT = 256
+
+def parse_address(address: str) -> Union[str, tuple]:
+    """'host:port' or ':port' for TCP, anything else is a Unix socket path"""
+    host, separator, port = address.rpartition(':')
+    if separator and port.isdigit():
+        return (host or '127.0.0.1', int(port))
+    return address
+
+class WorkerClient:
+    """Send farm calculation jobs to a CalculationWorker over its socket.
+
+    Jobs and responses are newline-delimited JSON objects. A response has
+    the job's id and a status: 'ok' with the verification report, 'invalid'
+    with validation_errors, or 'error' with a message.
+    """
+
+    def __init__(self, address: str, timeout: float = DEFAULT_TIMEOUT):
+        target = parse_address(address)
+        family = socket.AF_INET if isinstance(target, tuple) else socket.AF_UNIX
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(target)
+        self.reader = self.sock.makefile('r', encoding='utf-8')
+        self.next_id = 0
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def calculate_many(self, farms: Iterable[Dict], as_of: Optional[str] = None) -> List[Dict]:
+        """Responses for many farms, pipelined so the worker can batch them"""
+        farms = list(farms)
+        responses = []
+        for start in range(0, len(farms), MAX_IN_FLIGHT):
+            window = farms[start:start + MAX_IN_FLIGHT]
+            ids = list(range(self.next_id, self.next_id + len(window)))
+            self.next_id += len(window)
+            lines = [json.dumps({'id': job_id, 'farm_data': farm_data, 'as_of': as_of})
+                     for job_id, farm_data in zip(ids, window)]
+            self.sock.sendall(('\n'.join(lines) + '\n').encode('utf-8'))
+
+            received = {}
+            while len(received) < len(ids):
+                line = self.reader.readline()
+                if not line:
+                    raise ConnectionError("Worker closed the connection")
+                response = json.loads(line)
+                received[response.get('id')] = response
+            responses.extend(received[job_id] for job_id in ids)
+        return responses
+
+    def calculate(self, farm_data: Dict, as_of: Optional[str] = None) -> Dict:
+        """Response for a single farm"""
+        return self.calculate_many([farm_data], as_of)[0]
@@ -0,0 +1,99 @@
+import geopandas as gpd
+import shapely
+import numpy as np
+import pandas as pd
+import hashlib
+
+from instrumentation.metrics import metrics
+
+# Radius of the sphere with the same surface area as the WGS84 ellipsoid
+AUTHALIC_RADIUS = 6371007.181
+WGS84_ECCENTRICITY_SQ = 0.0066943799901413165
+
+def authalic_q(sin_latitude):
+    """Snyder's q for WGS84, proportional to the area between the equator and a latitude"""
+    e2 = WGS84_ECCENTRICITY_SQ
+    e = np.sqrt(e2)
+    return (1 - e2) * (sin_latitude / (1 - e2 * sin_latitude ** 2)
+                       - np.log((1 - e * sin_latitude) / (1 + e * sin_latitude)) / (2 * e))
+
+# q at the pole, which maps to an authalic latitude of 90 degrees
+AUTHALIC_Q_POLE = authalic_q(1.0)
+
+def authalic_latitude(latitude):
+    """Authalic latitude (radians) of WGS84 geodetic latitude (radians)"""
+    return np.arcsin(np.clip(authalic_q(np.sin(latitude)) / AUTHALIC_Q_POLE, -1.0, 1.0))
+
+def equal_area_hectares(geometries):
+    """Areas in hectares of an array of lon/lat (WGS84) geometries.
+
+    Every coordinate is mapped to the authalic sphere, which preserves area,
+    and projected with a Lambert azimuthal equal-area projection centred on
+    its own geometry, so each farm is measured where distortion of shape is
+    smallest. For boundaries up to 0.1 degree across, areas are within 1e-6
+    of WGS84 geodesic areas. All geometries are handled in one vectorized pass.
+    """
+    geometries = np.asarray(geometries, dtype=object)
+    areas = np.zeros(len(geometries))
+    present = ~(shapely.is_missing(geometries) | shapely.is_empty(geometries))
+    if not present.any():
+        return areas
+    geometries = geometries[present]
+
+    coordinates, index = shapely.get_coordinates(geometries, return_index=True)
+    bounds = shapely.bounds(geometries)
+    lon0 = np.radians((bounds[:, 0] + bounds[:, 2]) / 2)[index]
+    lat0 = authalic_latitude(np.radians((bounds[:, 1] + bounds[:, 3]) / 2))[index]
+
+    dlon = np.radians(coordinates[:, 0]) - lon0
+    lat = authalic_latitude(np.radians(coordinates[:, 1]))
+    cos_lat, sin_lat = np.cos(lat), np.sin(lat)
+    cos_lat0, sin_lat0 = np.cos(lat0), np.sin(lat0)
+    cos_dlon = np.cos(dlon)
+
+    k = np.sqrt(2 / (1 + sin_lat0 * sin_lat + cos_lat0 * cos_lat * cos_dlon))
+    projected = np.column_stack([
+        AUTHALIC_RADIUS * k * cos_lat * np.sin(dlon),
+        AUTHALIC_RADIUS * k * (cos_lat0 * sin_lat - sin_lat0 * cos_lat * cos_dlon)
+    ])
+
+    areas[present] = shapely.area(shapely.set_coordinates(geometries.copy(), projected)) / 10000
+    return areas
+
+class AreaCache:
+    """Equal-area hectares memoized by geometry hash.
+
+    Keys are a digest of each geometry's WKB together with its CRS, so
+    unchanged boundaries are never re-measured across calls.
+    """
+
+    def __init__(self):
+        self.areas = {}
+        self.hits = 0
+        self.misses = 0
+
+    def keys(self, geometries: gpd.GeoSeries):
+        crs = (geometries.crs.to_string() if geometries.crs is not None else '').encode()
+        return [hashlib.blake2b(crs + wkb, digest_size=16).digest() if wkb is not None else None
+                for wkb in shapely.to_wkb(geometries.values)]
+
+    def hectares(self, geometries: gpd.GeoSeries) -> pd.Series:
+        """Area in hectares of every geometry, measuring only those not seen before.
+
+        Missing and empty geometries have zero area, as in equal_area_hectares.
+        """
+        keys = self.keys(geometries)
+        missing = [i for i, key in enumerate(keys) if key is not None and key not in self.areas]
+        if missing:
+            with metrics().stage('boundary.area', items=len(missing)):
+                pending = geometries.iloc[missing]
+                if pending.crs is not None and not pending.crs.equals('EPSG:4326'):
+                    pending = pending.to_crs('EPSG:4326')
+                for i, area in zip(missing, equal_area_hectares(pending.values)):
+                    self.areas[keys[i]] = float(area)
+        hits = sum(key is not None for key in keys) - len(missing)
+        self.misses += len(missing)
+        self.hits += hits
+        metrics().count_many({'area_cache.hits': hits, 'area_cache.misses': len(missing)})
+        return pd.Series([self.areas[key] if key is not None else 0.0 for key in keys],
+                         index=geometries.index, name='area_ha')
@@ -1,12 +1,26 @@
 import geopandas as gpd
+import shapely
+from shapely import STRtree
 from shapely.geometry import Polygon, Point
+import numpy as np
 import pandas as pd
 import json
 
+from geospatial.area import AreaCache, equal_area_hectares
+from geospatial.web_tiles import WebTileExporter
+from instrumentation.metrics import file_size, metrics
+
+# Projected CRS used for radius and distance queries
+DISTANCE_CRS = 'EPSG:3857'
+
 class FarmBoundaryProcessor:
     def __init__(self, boundary_file=None):
         self.boundary_file = boundary_file
         self.gdf = None
+        self.tree = None
+        self._indexed_gdf = None
+        self._projected_tree = None
+        self.area_cache = AreaCache()
         
         if boundary_file:
             self.load_boundary_file()
@@ -14,11 +28,34 @@ class FarmBoundaryProcessor:
     def load_boundary_file(self):
         """Load boundary file (GeoJSON, Shapefile, etc.)"""
         try:
-            self.gdf = gpd.read_file(self.boundary_file)
+            with metrics().stage('boundary.load', nbytes=file_size(self.boundary_file)) as stage:
+                self.gdf = gpd.read_file(self.boundary_file)
+                stage.items = len(self.gdf)
+            self.build_index()
             print(f"Loaded {len(self.gdf)} boundaries")
         except Exception as e:
             print(f"Error loading boundary file: {e}")
             
+    def build_index(self):
+        """Build the STRtree over the current boundaries (rebuilt automatically if self.gdf is replaced)"""
+        with metrics().stage('boundary.index', items=len(self.gdf)):
+            self.tree = STRtree(self.gdf.geometry.values)
+        self._indexed_gdf = self.gdf
+        self._projected_tree = None
+        
+    def ensure_index(self):
+        if self.tree is None or self._indexed_gdf is not self.gdf:
+            self.build_index()
+            
+    def projected_index(self):
+        """Boundaries in DISTANCE_CRS and their STRtree, built on first use"""
+        self.ensure_index()
+        if self._projected_tree is None:
+            with metrics().stage('boundary.projected_index', items=len(self.gdf)):
+                projected = self.gdf.geometry.to_crs(DISTANCE_CRS).values
+                self._projected_tree = (projected, STRtree(projected))
+        return self._projected_tree
+            
     def create_from_coordinates(self, coordinates, farm_id, properties=None):
         """Create farm boundary from coordinates"""
         polygon = Polygon(coordinates)
@@ -38,36 +75,131 @@ class FarmBoundaryProcessor:
         return gdf
         
     def calculate_area(self, geometry):
-        """Calculate area in hectares"""
-        # Convert to equal area projection for accurate area calculation
-        geometry_aea = geometry.to_crs(epsg=3857)
-        area_sq_m = geometry_aea.area
-        area_ha = area_sq_m / 10000
-        return area_ha
+        """Calculate area in hectares (shapely geometries are taken as EPSG:4326)"""
+        if isinstance(geometry, gpd.GeoDataFrame):
+            geometry = geometry.geometry
+        if isinstance(geometry, gpd.GeoSeries):
+            return self.area_cache.hectares(geometry)
+        
+        return float(self.area_cache.hectares(gpd.GeoSeries([geometry], crs="EPSG:4326")).iloc[0])
+        
+    def calculate_areas(self):
+        """Equal-area hectares for every loaded boundary"""
+        if self.gdf is None:
+            return None
+        return self.area_cache.hectares(self.gdf.geometry)
+        
+    def boundaries_from_coordinates(self, farms, properties=None):
+        """Build one boundary layer from many farms' coordinate lists.
+        
+        farms maps farm_id to a list of (lon, lat) pairs (or is a sequence of
+        (farm_id, coordinates) pairs). Rings are assembled with shapely in a
+        single call; properties, if given, is a DataFrame with one row per
+        farm in the same order.
+        """
+        items = list(farms.items()) if isinstance(farms, dict) else list(farms)
+        farm_ids = [farm_id for farm_id, _ in items]
+        rings = [np.asarray(coordinates, dtype=float).reshape(-1, 2) for _, coordinates in items]
+        
+        coordinates = np.concatenate(rings) if rings else np.zeros((0, 2))
+        ring_index = np.repeat(np.arange(len(rings)), [len(ring) for ring in rings])
+        polygons = shapely.polygons(shapely.linearrings(coordinates, indices=ring_index))
+        
+        gdf = gpd.GeoDataFrame(
+            properties.reset_index(drop=True) if properties is not None else None,
+            geometry=polygons,
+            crs="EPSG:4326"
+        )
+        gdf.insert(0, 'farm_id', farm_ids)
+        gdf['area_ha'] = self.area_cache.hectares(gdf.geometry).to_numpy()
+        return gdf
         
     def find_farms_within_radius(self, center_point, radius_km):
         """Find farms within a given radius"""
         if self.gdf is None:
             return None
             
-        # Create buffer around center point
-        center_gdf = gpd.GeoDataFrame(
-            [{'name': 'center'}],
-            geometry=[center_point],
-            crs="EPSG:4326"
-        )
+        return self.find_farms_within_radii([center_point], [radius_km])[0]
         
-        # Convert to projected CRS for accurate distance calculation
-        center_proj = center_gdf.to_crs(epsg=3857)
-        buffer = center_proj.buffer(radius_km * 1000)  # Convert km to meters
+    def find_farms_within_radii(self, center_points, radii_km):
+        """Find farms within a radius of each center point, one GeoDataFrame per query"""
+        if self.gdf is None:
+            return None
+        self.ensure_index()
+        
+        with metrics().stage('boundary.radius_query', items=len(center_points)):
+            radii_km = np.broadcast_to(np.asarray(radii_km, dtype=float), (len(center_points),))
+        
+            # Buffer every center in a projected CRS for accurate distances, then convert back
+            centers = gpd.GeoSeries(list(center_points), crs="EPSG:4326")
+            buffers = centers.to_crs(DISTANCE_CRS).buffer(radii_km * 1000)
+            buffers_geo = buffers.to_crs(self.gdf.crs or "EPSG:4326")
         
-        # Convert back to geographic CRS
-        buffer_geo = buffer.to_crs(epsg=4326)
+            # Find intersecting farms through the index; farm order follows self.gdf
+            query_index, farm_index = self.tree.query(buffers_geo.values, predicate='intersects')
+            order = np.lexsort((farm_index, query_index))
+            query_index, farm_index = query_index[order], farm_index[order]
+            bounds = np.searchsorted(query_index, np.arange(len(center_points) + 1))
         
-        # Find intersecting farms
-        intersecting_farms = self.gdf[self.gdf.intersects(buffer_geo.iloc[0])]
+            return [self.gdf.iloc[farm_index[bounds[i]:bounds[i + 1]]] for i in range(len(center_points))]
+        
+    def nearest_farms(self, center_point, k=5):
+        """k nearest farms to a point, with distance_km measured like find_farms_within_radius"""
+        if self.gdf is None:
+            return None
+        projected, tree = self.projected_index()
+        # Null and empty boundaries are not in the tree, so they can never be found
+        indexed = ~(shapely.is_missing(projected) | shapely.is_empty(projected))
+        k = min(k, int(indexed.sum()))
+        if k == 0:
+            return self.gdf.iloc[[]].assign(distance_km=[])
+            
+        with metrics().stage('boundary.nearest_query', items=1):
+            center = gpd.GeoSeries([center_point], crs="EPSG:4326").to_crs(DISTANCE_CRS).iloc[0]
+            min_x, min_y, max_x, max_y = shapely.total_bounds(projected[indexed])
+            covering_radius = max(center.x - min_x, center.y - min_y, max_x - center.x, max_y - center.y)
         
-        return intersecting_farms
+            # Grow the search box until it holds k farms that are no farther than its half-width,
+            # or it covers every farm
+            nearest = int(tree.query_nearest(center, all_matches=False)[0])
+            radius = max(float(shapely.distance(center, projected[nearest])), 1.0)
+            while True:
+                candidates = tree.query(shapely.box(*center.buffer(radius).bounds))
+                distances = shapely.distance(center, projected[candidates])
+                if len(candidates) >= k and np.sort(distances)[k - 1] <= radius:
+                    break
+                if radius >= covering_radius:
+                    break
+                radius *= 2
+            
+            best = np.lexsort((candidates, distances))[:k]
+            result = self.gdf.iloc[candidates[best]].copy()
+            result['distance_km'] = distances[best] / 1000
+            return result
+        
+    def find_overlaps(self, min_overlap_ha=0.0):
+        """Pairs of farms whose boundaries overlap (e.g. double-claimed land)"""
+        if self.gdf is None:
+            return None
+        self.ensure_index()
+        
+        with metrics().stage('boundary.overlaps', items=len(self.gdf)):
+            geometries = self.gdf.geometry.values
+            left, right = self.tree.query(geometries, predicate='intersects')
+            pairs = left < right
+            left, right = left[pairs], right[pairs]
+        
+            intersections = gpd.GeoSeries(shapely.intersection(geometries[left], geometries[right]),
+                                          crs=self.gdf.crs)
+            overlap_ha = equal_area_hectares(intersections.to_crs("EPSG:4326").values)
+        
+            ids = self.gdf['farm_id'].to_numpy() if 'farm_id' in self.gdf.columns else np.arange(len(self.gdf))
+            overlaps = pd.DataFrame({
+                'farm_id_a': ids[left],
+                'farm_id_b': ids[right],
+                'overlap_ha': overlap_ha
+            })
+            return overlaps[overlaps['overlap_ha'] > min_overlap_ha].reset_index(drop=True)
         
     def save_to_geojson(self, output_path):
         """Save boundaries to GeoJSON file"""
@@ -90,4 +222,15 @@ class FarmBoundaryProcessor:
                 f.write(geojson)
                 
             return True
-        return False
\ No newline at end of file
+        return False
+        
+    def export_web_tiles(self, output_dir, min_zoom=6, max_zoom=14, workers=1, columns=None):
+        """Export a zoom pyramid of simplified, quantized GeoJSON tiles ({z}/{x}/{y}.geojson).
+        
+        Re-running into the same directory only rebuilds tiles whose farms changed.
+        """
+        if self.gdf is None:
+            return None
+        exporter = WebTileExporter(output_dir, min_zoom=min_zoom, max_zoom=max_zoom, workers=workers)
+        with metrics().stage('boundary.web_tiles', items=len(self.gdf)):
+            return exporter.export(self.gdf, columns=columns)
@@ -0,0 +1,243 @@
+import shapely
+import numpy as np
+import pandas as pd
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+TILE_PIXELS = 256
+MANIFEST_FILE = 'manifest.json'
+TILE_FORMAT_VERSION = 1
+
+# Simplification tolerance and coordinate grid, in screen pixels at each zoom
+SIMPLIFY_PIXELS = 0.5
+QUANTIZE_PIXELS = 0.25
+
+# Clip buffer around each tile, as a fraction of the tile size
+TILE_BUFFER = 1 / 64
+
+# (feature, tile) pairs per worker task
+PAIRS_PER_TASK = 20000
+
+def pixel_degrees(zoom):
+    """Width of one screen pixel in degrees of longitude"""
+    return 360.0 / (TILE_PIXELS * 2 ** zoom)
+
+def coordinate_digits(zoom):
+    """Decimal places that keep coordinates within QUANTIZE_PIXELS at this zoom"""
+    return int(np.ceil(-np.log10(pixel_degrees(zoom) * QUANTIZE_PIXELS)))
+
+def lonlat_to_tile(lon, lat, zoom):
+    """XYZ (slippy map) tile column and row containing each lon/lat"""
+    n = 2 ** zoom
+    lat = np.radians(np.clip(lat, -85.0511, 85.0511))
+    x = np.floor((np.asarray(lon) + 180.0) / 360.0 * n)
+    y = np.floor((1.0 - np.arcsinh(np.tan(lat)) / np.pi) / 2.0 * n)
+    return np.clip(x, 0, n - 1).astype(np.int64), np.clip(y, 0, n - 1).astype(np.int64)
+
+def tile_bounds(zoom, x, y):
+    """(west, south, east, north) of tiles in degrees"""
+    n = 2 ** zoom
+    west = np.asarray(x) / n * 360.0 - 180.0
+    east = (np.asarray(x) + 1) / n * 360.0 - 180.0
+    north = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * np.asarray(y) / n))))
+    south = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (np.asarray(y) + 1) / n))))
+    return west, south, east, north
+
+def tile_pairs(bounds, zoom):
+    """(feature index, tile key) for every tile each feature's bounding box covers.
+
+    Tile keys are x * 2**zoom + y, so tile sets can be compared with np.isin.
+    """
+    x0, y0 = lonlat_to_tile(bounds[:, 0], bounds[:, 3], zoom)
+    x1, y1 = lonlat_to_tile(bounds[:, 2], bounds[:, 1], zoom)
+    width, height = x1 - x0 + 1, y1 - y0 + 1
+    counts = width * height
+    features = np.repeat(np.arange(len(bounds)), counts)
+    offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    x = x0[features] + offset // height[features]
+    y = y0[features] + offset % height[features]
+    return features, x * 2 ** zoom + y
+
+def feature_bounds(geometries, zoom):
+    """Features too small to see at this zoom are drawn as points; returns their geometry and bounds"""
+    bounds = shapely.bounds(geometries)
+    tiny = np.maximum(bounds[:, 2] - bounds[:, 0], bounds[:, 3] - bounds[:, 1]) < pixel_degrees(zoom)
+    if tiny.any():
+        geometries = geometries.copy()
+        geometries[tiny] = shapely.point_on_surface(geometries[tiny])
+        bounds[tiny] = shapely.bounds(geometries[tiny])
+    return geometries, bounds
+
+def build_tiles(output_dir, zoom, tile_keys, feature_index, wkb, properties, removed_keys=()):
+    """Write the tiles of one zoom level for a batch of (tile, feature) pairs (runs in worker processes).
+
+    Geometries are simplified, clipped to the buffered tile, snapped to the
+    zoom's coordinate grid and written as compact GeoJSON. Tiles left
+    without features, and removed_keys, are deleted.
+    """
+    geometries = shapely.from_wkb(wkb)
+    geometries = shapely.simplify(geometries, pixel_degrees(zoom) * SIMPLIFY_PIXELS, preserve_topology=True)
+    properties = np.asarray(properties, dtype=object)
+    digits = coordinate_digits(zoom)
+    n = 2 ** zoom
+
+    # Pairs arrive sorted by tile, so each tile's features are one contiguous run
+    written = 0
+    for key in np.unique(np.concatenate([tile_keys, np.asarray(removed_keys, dtype=np.int64)])):
+        path = os.path.join(output_dir, str(zoom), str(key // n), f"{key % n}.geojson")
+        selected = feature_index[np.searchsorted(tile_keys, key, 'left'):np.searchsorted(tile_keys, key, 'right')]
+
+        west, south, east, north = tile_bounds(zoom, key // n, key % n)
+        buffer_x, buffer_y = (east - west) * TILE_BUFFER, (north - south) * TILE_BUFFER
+        clipped = shapely.clip_by_rect(geometries[selected], west - buffer_x, south - buffer_y,
+                                       east + buffer_x, north + buffer_y)
+        clipped = shapely.transform(clipped, lambda coordinates: np.round(coordinates, digits))
+        keep = ~shapely.is_empty(clipped) & ((shapely.get_type_id(clipped) == 0) | (shapely.area(clipped) > 0))
+
+        if not keep.any():
+            if os.path.exists(path):
+                os.remove(path)
+            continue
+        features = ','.join(f'{{"type":"Feature","geometry":{geometry},"properties":{feature_properties}}}'
+                            for geometry, feature_properties in
+                            zip(shapely.to_geojson(clipped[keep]), properties[selected[keep]]))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(f'{{"type":"FeatureCollection","features":[{features}]}}')
+        written += 1
+    return written
+
+class WebTileExporter:
+    """Zoom pyramid of simplified, quantized GeoJSON tiles for web maps.
+
+    Tiles follow the XYZ scheme ({z}/{x}/{y}.geojson) so a map only fetches
+    what is visible. Each zoom is simplified and snapped to a grid of a
+    fraction of a screen pixel, and features smaller than a pixel become
+    points. A manifest of per-farm content hashes and bounds lets later
+    exports rebuild only the tiles touched by added, changed or removed farms.
+    """
+
+    def __init__(self, output_dir, min_zoom=6, max_zoom=14, workers=1):
+        self.output_dir = output_dir
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.workers = workers
+
+    def settings(self):
+        return {
+            'version': TILE_FORMAT_VERSION,
+            'min_zoom': self.min_zoom,
+            'max_zoom': self.max_zoom,
+            'simplify_pixels': SIMPLIFY_PIXELS,
+            'quantize_pixels': QUANTIZE_PIXELS,
+            'tile_buffer': TILE_BUFFER
+        }
+
+    def load_manifest(self):
+        """Previous export's farms ({id: [hash, minx, miny, maxx, maxy]}) if its settings match"""
+        path = os.path.join(self.output_dir, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+        if manifest.get('settings') != self.settings():
+            return None
+        return manifest['farms']
+
+    def save_manifest(self, farms, bounds):
+        path = os.path.join(self.output_dir, MANIFEST_FILE)
+        manifest = {
+            'settings': self.settings(),
+            'tiles': '{z}/{x}/{y}.geojson',
+            'bounds': [float(v) for v in bounds],
+            'farms': farms
+        }
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(manifest, f)
+        os.replace(f"{path}.tmp", path)
+
+    def clear(self):
+        """Remove tiles and manifest of a previous export"""
+        if not os.path.isdir(self.output_dir):
+            return
+        for name in os.listdir(self.output_dir):
+            path = os.path.join(self.output_dir, name)
+            if name.isdigit() and os.path.isdir(path):
+                shutil.rmtree(path)
+        if os.path.exists(os.path.join(self.output_dir, MANIFEST_FILE)):
+            os.remove(os.path.join(self.output_dir, MANIFEST_FILE))
+
+    def export(self, gdf, id_column='farm_id', columns=None):
+        """Export boundaries, rebuilding only tiles affected since the last export.
+
+        columns selects the properties written with each feature (default:
+        all non-geometry columns). Returns the number of tiles written.
+        """
+        if gdf.crs is not None and not gdf.crs.equals('EPSG:4326'):
+            gdf = gdf.to_crs('EPSG:4326')
+        gdf = gdf[~(gdf.geometry.isna() | gdf.geometry.is_empty)]
+        ids = gdf[id_column].astype(str) if id_column in gdf.columns else pd.Series(gdf.index.astype(str))
+        if ids.duplicated().any():
+            raise ValueError(f"{id_column} must be unique to export web tiles")
+
+        columns = columns or [column for column in gdf.columns if column != gdf.geometry.name]
+        properties = [json.dumps(record, separators=(',', ':')) for record in
+                      json.loads(pd.DataFrame(gdf[columns]).to_json(orient='records', date_format='iso'))]
+        geometries = gdf.geometry.values
+        wkb = shapely.to_wkb(geometries)
+        hashes = [hashlib.blake2b(w + p.encode(), digest_size=16).hexdigest() for w, p in zip(wkb, properties)]
+        bounds = shapely.bounds(geometries)
+
+        previous = self.load_manifest()
+        if previous is None:
+            self.clear()
+            dirty_bounds = None
+        else:
+            current = dict(zip(ids, hashes))
+            changed = [i for i, (farm_id, h) in enumerate(zip(ids, hashes))
+                       if previous.get(farm_id, [None])[0] != h]
+            stale = [entry[1:] for farm_id, entry in previous.items()
+                     if current.get(farm_id) != entry[0]]
+            dirty_bounds = np.array(stale + bounds[changed].tolist()).reshape(-1, 4)
+
+        tasks = []
+        for zoom in range(self.min_zoom, self.max_zoom + 1):
+            zoom_geometries, zoom_bounds = feature_bounds(geometries, zoom)
+            features, keys = tile_pairs(zoom_bounds, zoom)
+            removed = np.zeros(0, dtype=np.int64)
+            if dirty_bounds is not None:
+                dirty = np.unique(tile_pairs(dirty_bounds, zoom)[1])
+                keep = np.isin(keys, dirty)
+                features, keys = features[keep], keys[keep]
+                removed = np.setdiff1d(dirty, keys)
+
+            order = np.argsort(keys, kind='stable')
+            features, keys = features[order], keys[order]
+
+            # Cut into tasks of about PAIRS_PER_TASK pairs, on tile boundaries
+            tile_starts = np.flatnonzero(np.diff(keys, prepend=-1))
+            targets = np.arange(0, len(keys), PAIRS_PER_TASK)
+            cuts = np.unique(np.r_[tile_starts[np.searchsorted(tile_starts, targets, 'right') - 1], len(keys)])
+            for task, (start, end) in enumerate(zip(cuts[:-1], cuts[1:])):
+                used, local = np.unique(features[start:end], return_inverse=True)
+                tasks.append((zoom, keys[start:end], local, shapely.to_wkb(zoom_geometries[used]),
+                              [properties[i] for i in used], removed if task == 0 else ()))
+            if len(keys) == 0 and len(removed):
+                tasks.append((zoom, keys, np.zeros(0, dtype=np.intp), [], [], removed))
+
+        written = 0
+        if self.workers <= 1:
+            for task in tasks:
+                written += build_tiles(self.output_dir, *task)
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = [pool.submit(build_tiles, self.output_dir, *task) for task in tasks]
+                for future in futures:
+                    written += future.result()
+
+        farms = {farm_id: [h, *b] for farm_id, h, b in zip(ids, hashes, bounds.tolist())}
+        self.save_manifest(farms, gdf.total_bounds if len(gdf) else [0.0, 0.0, 0.0, 0.0])
+        return written
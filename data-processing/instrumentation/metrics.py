@@ -0,0 +1,254 @@
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak RSS is then left out of the summary
+    resource = None
+
+SUMMARY_VERSION = 1
+
+# Trace events kept for --trace; later events are counted as dropped
+TRACE_MAX_EVENTS = 200000
+
+class Stage:
+    """Times one call of a stage. items and bytes may be set inside the block."""
+
+    __slots__ = ('metrics', 'name', 'items', 'bytes', 'start')
+
+    def __init__(self, metrics: 'RunMetrics', name: str, items: int = 0, nbytes: int = 0):
+        self.metrics = metrics
+        self.name = name
+        self.items = items
+        self.bytes = nbytes
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.add_stage(self.name, time.perf_counter() - self.start, self.items, self.bytes, self.start)
+        return False
+
+class NullStage:
+    """Stage of NullMetrics: accepts items and bytes and records nothing"""
+
+    items = 0
+    bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+class NullMetrics:
+    """Stand-in used while no run is being measured, so instrumented code needs no checks"""
+
+    enabled = False
+
+    def stage(self, name: str, items: int = 0, nbytes: int = 0) -> NullStage:
+        return NullStage()
+
+    def add_stage(self, name: str, seconds: float, items: int = 0, nbytes: int = 0, start=None):
+        pass
+
+    def count(self, name: str, value: int = 1):
+        pass
+
+    def count_many(self, values: Dict[str, int]):
+        pass
+
+    def drain(self) -> Optional[Dict]:
+        return None
+
+    def merge(self, drained: Optional[Dict]):
+        pass
+
+class RunMetrics:
+    """Per-stage timers, counters and peak memory of one pipeline run.
+
+    A stage accumulates calls, seconds and the items (rows, pixels or
+    queries) and bytes it handled. Stages are timed per call or per chunk,
+    never per row inside vectorized code; each call costs a couple of
+    microseconds, which only shows on the farm-by-farm CarbonModel path.
+    Stages may nest (a report stage includes the validation it runs), so
+    their seconds are inclusive.
+    """
+
+    enabled = True
+
+    def __init__(self, command: Optional[str] = None, trace: bool = False, trace_memory: bool = False):
+        self.command = command
+        self.started_at = datetime.now()
+        self.start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        self.stages = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.events = [] if trace else None
+        self.dropped_events = 0
+        self.trace_memory = trace_memory
+        self.traced_peak = None
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stage(self, name: str, items: int = 0, nbytes: int = 0) -> Stage:
+        return Stage(self, name, items, nbytes)
+
+    def add_stage(self, name: str, seconds: float, items: int = 0, nbytes: int = 0, start=None):
+        with self.lock:
+            totals = self.stages.get(name)
+            if totals is None:
+                totals = self.stages[name] = [0, 0.0, 0, 0]
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] += items
+            totals[3] += nbytes
+            if self.events is not None:
+                if len(self.events) < TRACE_MAX_EVENTS:
+                    self.events.append((name, start if start is not None else time.perf_counter() - seconds,
+                                        seconds, threading.get_ident(), items))
+                else:
+                    self.dropped_events += 1
+
+    def count(self, name: str, value: int = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def count_many(self, values: Dict[str, int]):
+        with self.lock:
+            for name, value in values.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def drain(self) -> Dict:
+        """Stages and counters since the last drain, reset (sent back from worker processes)"""
+        with self.lock:
+            drained = {'stages': self.stages, 'counters': self.counters}
+            self.stages, self.counters = {}, {}
+        return drained
+
+    def merge(self, drained: Optional[Dict]):
+        """Add stages and counters drained from another process"""
+        if not drained:
+            return
+        with self.lock:
+            for name, (calls, seconds, items, nbytes) in drained['stages'].items():
+                totals = self.stages.setdefault(name, [0, 0.0, 0, 0])
+                totals[0] += calls
+                totals[1] += seconds
+                totals[2] += items
+                totals[3] += nbytes
+            for name, value in drained['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def memory(self) -> Dict:
+        """Peak resident memory of this process and of finished worker processes, in bytes"""
+        memory = {}
+        if resource is not None:
+            # ru_maxrss is in kilobytes on Linux and bytes on macOS
+            scale = 1 if sys.platform == 'darwin' else 1024
+            memory['peak_rss_bytes'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+            memory['children_peak_rss_bytes'] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+        if self.traced_peak is not None:
+            memory['traced_peak_bytes'] = self.traced_peak
+        elif self.trace_memory and tracemalloc.is_tracing():
+            memory['traced_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        return memory
+
+    def summary(self) -> Dict:
+        wall_seconds = time.perf_counter() - self.start
+        stages = {}
+        for name, (calls, seconds, items, nbytes) in sorted(self.stages.items(), key=lambda s: -s[1][1]):
+            stage = {'calls': calls, 'seconds': round(seconds, 6),
+                     'share_of_wall': round(seconds / wall_seconds, 4) if wall_seconds else None}
+            if items:
+                stage['items'] = items
+                stage['items_per_second'] = round(items / seconds, 1) if seconds else None
+            if nbytes:
+                stage['bytes'] = nbytes
+                stage['bytes_per_second'] = round(nbytes / seconds, 1) if seconds else None
+            stages[name] = stage
+        return {
+            'version': SUMMARY_VERSION,
+            'command': self.command,
+            'started_at': self.started_at.isoformat(),
+            'wall_seconds': round(wall_seconds, 6),
+            'cpu_seconds': round(time.process_time() - self.cpu_start, 6),
+            'stages': stages,
+            'counters': dict(sorted(self.counters.items())),
+            'memory': self.memory()
+        }
+
+    def write_summary(self, path: str) -> str:
+        """Write the JSON run summary"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+        return path
+
+    def write_trace(self, path: str) -> str:
+        """Write stage calls as Chrome trace events (open in chrome://tracing or Perfetto)"""
+        pid = os.getpid()
+        events = [{'name': name, 'ph': 'X', 'ts': round((start - self.start) * 1e6, 3),
+                   'dur': round(seconds * 1e6, 3), 'pid': pid, 'tid': thread, 'args': {'items': items}}
+                  for name, start, seconds, thread, items in self.events or []]
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'otherData': {'dropped_events': self.dropped_events}}, f)
+        return path
+
+    def close(self):
+        """Stop tracemalloc, keeping its peak for the summary"""
+        if self.trace_memory and tracemalloc.is_tracing():
+            self.traced_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+NULL_METRICS = NullMetrics()
+
+_current = NULL_METRICS
+
+def metrics():
+    """The run being measured, or a no-op NullMetrics outside one"""
+    return _current
+
+def start_run(command: Optional[str] = None, trace: bool = False, trace_memory: bool = False) -> RunMetrics:
+    """Start measuring a run in this process (replacing any run inherited from a parent process)"""
+    global _current
+    _current = RunMetrics(command, trace=trace, trace_memory=trace_memory)
+    return _current
+
+def finish_run() -> Optional[RunMetrics]:
+    """Stop measuring and return the finished run"""
+    global _current
+    run, _current = _current, NULL_METRICS
+    if not run.enabled:
+        return None
+    run.close()
+    return run
+
+def timed_iter(iterable: Iterable, name: str, items: Callable = len) -> Iterator:
+    """Yield from iterable, timing each step (e.g. reading the next chunk) as a call of stage name"""
+    iterator = iter(iterable)
+    while True:
+        run = metrics()
+        start = time.perf_counter()
+        try:
+            value = next(iterator)
+        except StopIteration:
+            return
+        run.add_stage(name, time.perf_counter() - start, items(value) if items else 0, 0, start)
+        yield value
+
+def file_size(path: str) -> int:
+    """Size of a file, or of all files under a directory (Parquet datasets), for bytes-read counters"""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+    return os.path.getsize(path) if os.path.exists(path) else 0
@@ -0,0 +1,29 @@
+import cProfile
+import io
+import os
+import pstats
+from typing import Callable
+
+# Functions listed when a profile is printed
+PROFILE_TOP_FUNCTIONS = 20
+
+def profile_call(run: Callable[[], object], output_path: str, top: int = PROFILE_TOP_FUNCTIONS):
+    """Run under cProfile, dump the stats to output_path and print the top functions by cumulative time.
+
+    The dump is a standard pstats file (python -m pstats, snakeviz). The
+    profiler adds noticeable overhead to pure-Python code, so use it to
+    investigate a slow run rather than for every run.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return run()
+    finally:
+        profiler.disable()
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        profiler.dump_stats(output_path)
+
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(top)
+        print(report.getvalue())
+        print(f"Profile: {output_path}")
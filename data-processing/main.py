@@ -7,10 +7,28 @@ Handles carbon calculations and basic data processing
 import argparse
 import json
 import os
-import pandas as pd
-import numpy as np
 from datetime import datetime
-from carbon_calculation.carbon_model import CarbonModel
+
+from instrumentation.metrics import file_size, finish_run, metrics, start_run, timed_iter
+from instrumentation.profiling import profile_call
+
+# Heavy imports (pandas, numpy, the model packages) happen inside each command
+# so the CLI, and `carbon --worker`, start without loading them.
+
+def as_of_date(value):
+    """argparse type for --as-of dates (YYYY-MM-DD)"""
+    return datetime.strptime(value, '%Y-%m-%d')
+
+def open_result_cache(args):
+    """Result cache for this run; only meaningful when the as-of date is pinned"""
+    from carbon_calculation.result_cache import ResultCache
+    
+    if not args.cache_dir:
+        return None
+    if args.as_of is None:
+        print("Result cache requires --as-of; calculating without cache")
+        return None
+    return ResultCache(args.cache_dir)
 
 def calculate_carbon_credits(args):
     """Calculate carbon credits for a farm"""
@@ -27,9 +45,17 @@ def calculate_carbon_credits(args):
         print(f"Error: Invalid JSON in farm data file {args.farm_data}")
         return None
     
+    if args.worker:
+        return calculate_with_worker(args, farm_data)
+    
+    import pandas as pd
+    from carbon_calculation.carbon_model import CarbonModel
+    from carbon_calculation.columnar import ReportDataset, report_record
+    from carbon_calculation.uncertainty import UncertaintyEngine, load_distributions
+    
     # Initialize appropriate model
     model_type = farm_data.get('crop_type', 'agroforestry').lower()
-    model = CarbonModel(model_type=model_type)
+    model = CarbonModel(model_type=model_type, as_of=args.as_of)
     
     # Validate farm data
     validation_errors = model.validate_farm_data(farm_data)
@@ -39,61 +65,160 @@ def calculate_carbon_credits(args):
             print(f"  - {error}")
         return None
     
-    # Calculate credits
-    results = model.calculate_credits(farm_data)
+    # Calculate credits, reusing a cached result for identical inputs
+    cache = open_result_cache(args)
+    results = None
+    if cache:
+        cache_key = cache.farm_key(farm_data, model.parameters, model.as_of)
+        results = cache.get_json(cache_key)
+    if results is None:
+        results = model.calculate_credits(farm_data)
+        if cache:
+            cache.put_json(cache_key, results)
+    
+    # Monte Carlo confidence intervals on request
+    uncertainty = None
+    if args.uncertainty_draws:
+        engine = UncertaintyEngine(
+            distributions=load_distributions(args.uncertainty_config),
+            draws=args.uncertainty_draws,
+            seed=args.seed,
+            as_of=model.as_of
+        )
+        with metrics().stage('carbon.uncertainty', items=args.uncertainty_draws):
+            uncertainty = engine.farm_uncertainty(farm_data)
     
     # Generate verification report
-    report = model.generate_verification_report(farm_data, results)
+    report = model.generate_verification_report(farm_data, results, uncertainty=uncertainty)
+    
+    # Save results, as a JSON file or a row of the partitioned report dataset
+    if args.report_dataset:
+        ReportDataset(args.report_dataset).write(pd.DataFrame([report_record(report)]))
+        output_path = args.report_dataset
+    else:
+        os.makedirs(args.output_dir, exist_ok=True)
+        output_path = os.path.join(args.output_dir, f'carbon_report_{args.farm_id}.json')
+        
+        with metrics().stage('report.write', items=1), open(output_path, 'w') as f:
+            json.dump(report, f, indent=2)
+    
+    print(f"Carbon calculation complete: {output_path}")
+    print(f"Total credits: {results.get('total_credits', 0):.2f}")
+    
+    return output_path
+
+def calculate_with_worker(args, farm_data):
+    """Send the farm to a running calculation worker instead of loading the models here"""
+    from carbon_calculation.worker_client import WorkerClient
+    
+    if args.uncertainty_draws or args.report_dataset or args.cache_dir:
+        print("Error: --worker does not support --uncertainty-draws, --report-dataset or --cache-dir")
+        return None
+    
+    as_of = args.as_of.strftime('%Y-%m-%d') if args.as_of else None
+    try:
+        with WorkerClient(args.worker) as client:
+            response = client.calculate(farm_data, as_of=as_of)
+    except OSError as e:
+        print(f"Error: Could not reach calculation worker at {args.worker}: {e}")
+        return None
+    
+    if response['status'] == 'invalid':
+        print("Validation errors found:")
+        for error in response['validation_errors']:
+            print(f"  - {error}")
+        return None
+    if response['status'] != 'ok':
+        print(f"Error calculating carbon credits: {response.get('error')}")
+        return None
     
-    # Save results
+    report = response['report']
     os.makedirs(args.output_dir, exist_ok=True)
     output_path = os.path.join(args.output_dir, f'carbon_report_{args.farm_id}.json')
-    
     with open(output_path, 'w') as f:
         json.dump(report, f, indent=2)
     
     print(f"Carbon calculation complete: {output_path}")
-    print(f"Total credits: {results.get('total_credits', 0):.2f}")
+    print(f"Total credits: {report['calculation_results'].get('total_credits', 0):.2f}")
     
     return output_path
 
+def run_worker(args):
+    """Serve carbon calculations from a long-lived process on a local socket"""
+    from carbon_calculation.worker import CalculationWorker
+    
+    worker = CalculationWorker(
+        args.address or args.socket,
+        as_of=args.as_of,
+        max_batch=args.max_batch,
+        max_wait=args.max_wait_ms / 1000.0
+    )
+    print(f"Calculation worker listening on {args.address or args.socket}")
+    try:
+        worker.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"Calculation worker stopped after {worker.stats['jobs']} jobs in {worker.stats['batches']} batches")
+    return worker.stats
+
+def batch_results_path(args):
+    return os.path.join(args.output_dir, f'batch_results.{args.format}')
+
 def process_batch_farms(args):
-    """Process multiple farms from a CSV file"""
+    """Process multiple farms from a CSV or Parquet file"""
     print(f"Processing batch farms from {args.input_file}")
     
+    if args.state_db:
+        output_path = process_batch_farms_incremental(args)
+    elif args.workers > 1 or args.chunk_size:
+        output_path = process_batch_farms_sharded(args)
+    else:
+        output_path = process_batch_farms_in_memory(args)
+    
+    if output_path and args.report_dataset:
+        write_verification_reports(args)
+    return output_path
+
+def process_batch_farms_in_memory(args):
+    """Validate and calculate the whole file column-wise in one pass"""
+    from carbon_calculation.batch_engine import BatchCarbonModel
+    from carbon_calculation.columnar import read_farms, typed_results, write_parquet
+    
     try:
-        # Read CSV file
-        df = pd.read_csv(args.input_file)
+        # Read CSV or Parquet file
+        with metrics().stage('batch.read', nbytes=file_size(args.input_file)) as stage:
+            df = read_farms(args.input_file)
+            stage.items = len(df)
         print(f"Loaded {len(df)} farms")
         
-        # Process each farm
-        results = []
-        for _, row in df.iterrows():
-            farm_data = row.to_dict()
-            model_type = farm_data.get('crop_type', 'agroforestry').lower()
-            
-            model = CarbonModel(model_type=model_type)
-            validation_errors = model.validate_farm_data(farm_data)
-            
-            if validation_errors:
-                print(f"Skipping farm {farm_data.get('farm_id', 'unknown')} due to validation errors")
-                continue
-            
-            calculation = model.calculate_credits(farm_data)
-            results.append({
-                'farm_id': farm_data.get('farm_id', 'unknown'),
-                'crop_type': farm_data.get('crop_type'),
-                'area_ha': farm_data.get('area_ha'),
-                'calculated_credits': calculation.get('total_credits', 0),
-                'calculation_date': datetime.now().isoformat()
-            })
+        # Validate and calculate all farms column-wise, unless this exact batch is cached
+        engine = BatchCarbonModel(as_of=args.as_of)
+        cache = open_result_cache(args)
+        results_df = None
+        if cache:
+            cache_key = cache.frame_key(df, engine.parameters, engine.as_of)
+            results_df = cache.get_frame(cache_key)
+        if results_df is None:
+            results_df, _ = engine.process_frame(df)
+            if cache:
+                cache.put_frame(cache_key, results_df)
+        else:
+            print("Reusing cached results for unchanged input")
+        
+        skipped = len(df) - len(results_df)
+        if skipped:
+            print(f"Skipping {skipped} farms due to validation errors")
         
         # Save batch results
         os.makedirs(args.output_dir, exist_ok=True)
-        output_path = os.path.join(args.output_dir, 'batch_results.csv')
+        output_path = batch_results_path(args)
         
-        results_df = pd.DataFrame(results)
-        results_df.to_csv(output_path, index=False)
+        with metrics().stage('batch.write', items=len(results_df)) as stage:
+            if args.format == 'parquet':
+                write_parquet(typed_results(results_df), output_path)
+            else:
+                results_df.to_csv(output_path, index=False)
+            stage.bytes = file_size(output_path)
         
         print(f"Batch processing complete: {output_path}")
         print(f"Total credits across all farms: {results_df['calculated_credits'].sum():.2f}")
@@ -104,33 +229,528 @@ def process_batch_farms(args):
         print(f"Error processing batch file: {e}")
         return None
 
+def write_verification_reports(args):
+    """Write a verification report for every farm into the partitioned report dataset"""
+    from carbon_calculation.batch_engine import BatchCarbonModel
+    from carbon_calculation.columnar import ReportDataset, iter_farm_chunks
+    
+    try:
+        engine = BatchCarbonModel(as_of=args.as_of)
+        current_date = engine.current_date()
+        chunks = timed_iter(iter_farm_chunks(args.input_file, args.chunk_size or 50000), 'report.read_farms')
+        written = ReportDataset(args.report_dataset).replace(
+            (engine.report_frame(chunk, current_date) for chunk in chunks),
+            current_date.strftime('%Y-%m-%d'))
+        print(f"Wrote {written} verification reports to {args.report_dataset}")
+        return args.report_dataset
+        
+    except Exception as e:
+        print(f"Error writing verification reports: {e}")
+        return None
+
+def process_batch_farms_sharded(args):
+    """Stream the CSV in chunks across a process pool with a resumable checkpoint"""
+    from carbon_calculation.batch_runner import ShardedBatchRunner
+    from carbon_calculation.columnar import csv_to_parquet
+    
+    try:
+        os.makedirs(args.output_dir, exist_ok=True)
+        output_path = os.path.join(args.output_dir, 'batch_results.csv')
+        
+        runner = ShardedBatchRunner(
+            args.input_file,
+            output_path,
+            workers=args.workers,
+            chunk_size=args.chunk_size or 50000,
+            as_of=args.as_of,
+            cache=open_result_cache(args)
+        )
+        summary = runner.run()
+        
+        # The resumable run appends CSV; convert once it has finished
+        if args.format == 'parquet':
+            csv_path, output_path = output_path, batch_results_path(args)
+            with metrics().stage('batch.convert', nbytes=file_size(csv_path)) as stage:
+                stage.items = csv_to_parquet(csv_path, output_path)
+            os.remove(csv_path)
+        
+        print(f"Loaded {summary['farms_loaded']} farms in {summary['completed_chunks']} chunks")
+        if summary['farms_skipped']:
+            print(f"Skipping {summary['farms_skipped']} farms due to validation errors")
+        print(f"Batch processing complete: {output_path}")
+        print(f"Total credits across all farms: {summary['total_credits']:.2f}")
+        
+        return output_path
+        
+    except Exception as e:
+        print(f"Error processing batch file: {e}")
+        return None
+
+def process_batch_farms_incremental(args):
+    """Recalculate only farms that were added, changed or deleted since the last run"""
+    from carbon_calculation.columnar import read_farms
+    from carbon_calculation.state_store import FarmStateStore
+    
+    if args.as_of is None:
+        print("Error: incremental mode requires --as-of, the reporting-period end date, so stored results stay comparable")
+        return None
+    
+    try:
+        store = FarmStateStore(args.state_db, as_of=args.as_of)
+        stored_as_of = store.stored_as_of()
+        if store.reset_if_stale():
+            if stored_as_of not in (None, args.as_of.strftime('%Y-%m-%d')):
+                print(f"State store holds results as of {stored_as_of}; "
+                      f"recalculating all farms as of {args.as_of:%Y-%m-%d}")
+            else:
+                print("State store is empty or was built with other parameters; recalculating all farms")
+        
+        with metrics().stage('batch.read', nbytes=file_size(args.input_file)) as stage:
+            df = read_farms(args.input_file)
+            stage.items = len(df)
+        with metrics().stage('state.apply', items=len(df)):
+            if args.delta:
+                print(f"Loaded {len(df)} change log entries")
+                changes = store.apply_delta(df)
+            else:
+                print(f"Loaded {len(df)} farms")
+                changes = store.apply_snapshot(df)
+        
+        os.makedirs(args.output_dir, exist_ok=True)
+        changes_path = os.path.join(args.output_dir, 'batch_changes.csv')
+        changes.to_csv(changes_path, index=False)
+        
+        counts = changes['change'].value_counts()
+        metrics().count_many({f"farms.{change}": int(count) for change, count in counts.items()})
+        print("Changes: " + ", ".join(f"{counts.get(c, 0)} {c}" for c in ['added', 'changed', 'deleted', 'invalid']))
+        print(f"Incremental processing complete: {changes_path}")
+        
+        if args.export_results:
+            output_path = batch_results_path(args)
+            store.export_results(output_path)
+            print(f"Exported full results: {output_path}")
+        
+        totals = store.totals()
+        store.close()
+        print(f"Total credits across all farms: {totals['total_credits']:.2f} ({totals['farm_count']} farms)")
+        
+        return changes_path
+        
+    except Exception as e:
+        print(f"Error processing batch file: {e}")
+        return None
+
+def export_json_reports(args):
+    """Write JSON verification reports on demand from the partitioned report dataset"""
+    from carbon_calculation.columnar import ReportDataset
+    
+    try:
+        farm_ids = args.farm_id.split(',') if args.farm_id else None
+        reports = ReportDataset(args.report_dataset).json_reports(farm_ids, args.report_date)
+        
+        os.makedirs(args.output_dir, exist_ok=True)
+        for farm_id, report in reports.items():
+            with open(os.path.join(args.output_dir, f'carbon_report_{farm_id}.json'), 'w') as f:
+                json.dump(report, f, indent=2)
+        
+        missing = set(farm_ids or []) - set(reports)
+        if missing:
+            print(f"No reports found for: {', '.join(sorted(missing))}")
+        print(f"Wrote {len(reports)} JSON reports to {args.output_dir}")
+        return args.output_dir
+        
+    except Exception as e:
+        print(f"Error exporting reports: {e}")
+        return None
+
+def convert_farm_registry(args):
+    """Convert a farm CSV into typed Parquet (dates, categorical crop_type, practices lists)"""
+    import pandas as pd
+    from carbon_calculation.columnar import typed_farms, write_parquet_chunks
+    
+    try:
+        chunks = pd.read_csv(args.input_file, chunksize=args.chunk_size)
+        rows = write_parquet_chunks((typed_farms(chunk) for chunk in chunks), args.output)
+        print(f"Converted {rows} farms: {args.output}")
+        return args.output
+        
+    except Exception as e:
+        print(f"Error converting farm registry: {e}")
+        return None
+
+def project_farm_credits(args):
+    """Project annual or monthly credit curves for every farm in a CSV"""
+    from carbon_calculation.projection import CreditProjection, export_projection
+    
+    print(f"Projecting {args.frequency} credits for farms in {args.input_file}")
+    
+    try:
+        projection = CreditProjection(
+            frequency=args.frequency,
+            horizon_years=args.horizon_years,
+            calendar=args.calendar,
+            start=args.start,
+            as_of=args.as_of
+        )
+        
+        os.makedirs(args.output_dir, exist_ok=True)
+        output_path = os.path.join(args.output_dir, f'credit_projection_{args.frequency}.parquet')
+        
+        chunks = projection.iter_chunks(args.input_file, chunk_size=args.chunk_size)
+        farms_written = export_projection(chunks, output_path, calendar=args.calendar)
+        
+        print(f"Projected {farms_written} farms over {projection.horizon_years} years: {output_path}")
+        
+        return output_path
+        
+    except Exception as e:
+        print(f"Error projecting credits: {e}")
+        return None
+
+def estimate_uncertainty(args):
+    """Monte Carlo credit percentiles per farm and for the whole portfolio"""
+    from carbon_calculation.carbon_model import CarbonModel
+    from carbon_calculation.uncertainty import UncertaintyEngine, load_distributions
+    
+    print(f"Running {args.draws} uncertainty draws for farms in {args.input_file}")
+    
+    try:
+        engine = UncertaintyEngine(
+            distributions=load_distributions(args.uncertainty_config),
+            draws=args.draws,
+            seed=args.seed,
+            as_of=args.as_of
+        )
+        
+        os.makedirs(args.output_dir, exist_ok=True)
+        farms_path = os.path.join(args.output_dir, 'uncertainty_farms.csv')
+        portfolio = engine.run_file(args.input_file, farms_path, workers=args.workers, chunk_size=args.chunk_size)
+        
+        portfolio_path = os.path.join(args.output_dir, 'uncertainty_portfolio.json')
+        with open(portfolio_path, 'w') as f:
+            json.dump(portfolio, f, indent=2)
+        
+        # Portfolio percentiles in the same shape as a farm verification report
+        report = CarbonModel(as_of=args.as_of).generate_portfolio_report(portfolio)
+        report_path = os.path.join(args.output_dir, 'carbon_report_portfolio.json')
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        
+        print(f"Uncertainty analysis complete: {farms_path}, {portfolio_path}, {report_path}")
+        print("Portfolio credits: " + ", ".join(f"{k}={v:.2f}" for k, v in portfolio['percentiles'].items()))
+        
+        return portfolio_path
+        
+    except Exception as e:
+        print(f"Error estimating uncertainty: {e}")
+        return None
+
+def compute_zonal_ndvi(args):
+    """Per-farm NDVI statistics for all farm boundaries in one pass over a scene"""
+    from geospatial.farm_boundary import FarmBoundaryProcessor
+    from satellite.ndvi_calculator import NDVICalculator
+    from satellite.zonal_stats import zonal_ndvi_statistics
+    
+    print(f"Computing zonal NDVI for boundaries in {args.boundary_file}")
+    
+    try:
+        boundaries = FarmBoundaryProcessor(args.boundary_file)
+        if boundaries.gdf is None:
+            return None
+        
+        calculator = NDVICalculator(args.red_band, args.nir_band)
+        table = zonal_ndvi_statistics(calculator, boundaries.gdf, all_touched=args.all_touched)
+        
+        os.makedirs(args.output_dir, exist_ok=True)
+        output_path = os.path.join(args.output_dir, 'zonal_ndvi.csv')
+        table.to_csv(output_path, index=False)
+        
+        covered = int((table['pixel_count'] > 0).sum())
+        print(f"Zonal NDVI complete for {covered}/{len(table)} farms: {output_path}")
+        
+        return output_path
+        
+    except Exception as e:
+        print(f"Error computing zonal NDVI: {e}")
+        return None
+
+def render_quicklooks(args):
+    """Quicklook PNGs of an NDVI GeoTIFF, for the whole scene or per farm boundary"""
+    from satellite.quicklook import build_overviews, render_quicklook, render_farm_quicklooks
+    
+    try:
+        if args.build_overviews:
+            build_overviews(args.ndvi_geotiff)
+        
+        if args.boundary_file:
+            from geospatial.farm_boundary import FarmBoundaryProcessor
+            boundaries = FarmBoundaryProcessor(args.boundary_file)
+            if boundaries.gdf is None:
+                return None
+            paths = render_farm_quicklooks(args.ndvi_geotiff, boundaries.gdf, args.output_dir,
+                                           workers=args.workers, max_size=args.max_size)
+            print(f"Rendered {len(paths)} farm quicklooks to {args.output_dir}")
+            return args.output_dir
+        
+        output_path = os.path.join(args.output_dir, 'ndvi_quicklook.png')
+        render_quicklook(args.ndvi_geotiff, output_path, max_size=args.max_size)
+        print(f"Quicklook written: {output_path}")
+        return output_path
+        
+    except Exception as e:
+        print(f"Error rendering quicklooks: {e}")
+        return None
+
+def export_web_tiles(args):
+    """Export farm boundaries as a tiled, quantized GeoJSON pyramid for web maps"""
+    from geospatial.farm_boundary import FarmBoundaryProcessor
+    
+    try:
+        boundaries = FarmBoundaryProcessor(args.boundary_file)
+        if boundaries.gdf is None:
+            return None
+        
+        columns = args.columns.split(',') if args.columns else None
+        written = boundaries.export_web_tiles(args.output_dir, min_zoom=args.min_zoom, max_zoom=args.max_zoom,
+                                              workers=args.workers, columns=columns)
+        print(f"Web tiles complete: {written} tiles written to {args.output_dir}")
+        return args.output_dir
+        
+    except Exception as e:
+        print(f"Error exporting web tiles: {e}")
+        return None
+
+def run_ndvi_cube(args):
+    """Build a multi-date NDVI cube or run temporal queries on it"""
+    import pandas as pd
+    from satellite.ndvi_cube import NDVICube
+    
+    try:
+        if args.action == 'add':
+            scenes = pd.read_csv(args.scenes)
+            cube = NDVICube.open_or_create(args.cube_dir, scenes['red_band'].iloc[0])
+            added = cube.add_dates(scenes[['date', 'red_band', 'nir_band']].itertuples(index=False, name=None),
+                                   workers=args.workers)
+            print(f"Added {added} dates; cube now holds {len(cube.dates)} dates: {args.cube_dir}")
+            return args.cube_dir
+        
+        cube = NDVICube(args.cube_dir)
+        months = [int(m) for m in args.months.split(',')] if args.months else None
+        
+        if args.action == 'farm-series':
+            from geospatial.farm_boundary import FarmBoundaryProcessor
+            boundaries = FarmBoundaryProcessor(args.boundary_file)
+            if boundaries.gdf is None:
+                return None
+            series = cube.farm_series(boundaries.gdf)
+            series.columns = series.columns.strftime('%Y-%m-%d')
+            series.to_csv(args.output)
+        else:
+            if args.action == 'trend':
+                result = cube.trend(args.start, args.end)
+            elif args.action == 'seasonal-max':
+                result = cube.seasonal_max(args.start, args.end, months)
+            else:
+                result = cube.change(args.before.split(','), args.after.split(','), args.threshold)
+            cube.write_geotiff(result, args.output)
+        
+        print(f"NDVI cube {args.action} complete: {args.output}")
+        return args.output
+        
+    except Exception as e:
+        print(f"Error processing NDVI cube: {e}")
+        return None
+
+def run_command(args, parser):
+    """Execute the selected command"""
+    if args.command == 'carbon':
+        return calculate_carbon_credits(args)
+    elif args.command == 'worker':
+        return run_worker(args)
+    elif args.command == 'batch':
+        return process_batch_farms(args)
+    elif args.command == 'report':
+        return export_json_reports(args)
+    elif args.command == 'convert':
+        return convert_farm_registry(args)
+    elif args.command == 'projection':
+        return project_farm_credits(args)
+    elif args.command == 'uncertainty':
+        return estimate_uncertainty(args)
+    elif args.command == 'zonal':
+        return compute_zonal_ndvi(args)
+    elif args.command == 'cube':
+        return run_ndvi_cube(args)
+    elif args.command == 'quicklook':
+        return render_quicklooks(args)
+    elif args.command == 'tiles':
+        return export_web_tiles(args)
+    else:
+        parser.print_help()
+
+def write_run_metrics(args, run):
+    """Write the run summary (and trace) of a finished command"""
+    metrics_path = args.metrics_file
+    if metrics_path is None and getattr(args, 'output_dir', None):
+        metrics_path = os.path.join(args.output_dir, 'run_metrics.json')
+    if metrics_path:
+        print(f"Run metrics: {run.write_summary(metrics_path)}")
+    if args.trace:
+        print(f"Trace: {run.write_trace(args.trace)}")
+
 def main():
     parser = argparse.ArgumentParser(description='MRV Solutions Data Processing')
     subparsers = parser.add_subparsers(dest='command', help='Command to execute')
     
+    # Run metrics and profiling options shared by every command
+    metrics_options = argparse.ArgumentParser(add_help=False)
+    metrics_options.add_argument('--metrics-file',
+                                 help='Run summary JSON (defaults to run_metrics.json in the output directory)')
+    metrics_options.add_argument('--profile', help='Run under cProfile and write the stats to this file')
+    metrics_options.add_argument('--trace', help='Write per-call stage timings as a Chrome trace JSON')
+    metrics_options.add_argument('--trace-memory', action='store_true',
+                                 help='Record peak Python allocations with tracemalloc (slows pure-Python paths)')
+    
     # Carbon calculation command
-    carbon_parser = subparsers.add_parser('carbon', help='Calculate carbon credits')
+    carbon_parser = subparsers.add_parser('carbon', parents=[metrics_options], help='Calculate carbon credits')
     carbon_parser.add_argument('--farm-id', required=True, help='Farm ID')
     carbon_parser.add_argument('--farm-data', required=True, help='Path to farm data JSON')
     carbon_parser.add_argument('--output-dir', default='./output', help='Output directory')
+    carbon_parser.add_argument('--as-of', type=as_of_date, help='Calculation date (YYYY-MM-DD), defaults to now')
+    carbon_parser.add_argument('--cache-dir', help='Content-addressed result cache directory (requires --as-of)')
+    carbon_parser.add_argument('--uncertainty-draws', type=int, help='Add Monte Carlo percentiles with this many draws')
+    carbon_parser.add_argument('--uncertainty-config', help='JSON file with parameter distributions')
+    carbon_parser.add_argument('--seed', type=int, default=42, help='Random seed for uncertainty draws')
+    carbon_parser.add_argument('--report-dataset', help='Append the report to this Parquet dataset instead of writing JSON')
+    carbon_parser.add_argument('--worker', help='Calculate through a running worker (socket path or host:port)')
+    
+    # Calculation worker command
+    worker_parser = subparsers.add_parser('worker', parents=[metrics_options], help='Long-lived calculation worker on a local socket')
+    worker_address = worker_parser.add_mutually_exclusive_group()
+    worker_address.add_argument('--socket', default='/tmp/mrv-worker.sock', help='Unix socket path')
+    worker_address.add_argument('--address', help='TCP host:port instead of a Unix socket, e.g. 127.0.0.1:8765')
+    worker_parser.add_argument('--as-of', type=as_of_date, help='Default calculation date (YYYY-MM-DD), defaults to now')
+    worker_parser.add_argument('--max-batch', type=int, default=512, help='Most jobs calculated together')
+    worker_parser.add_argument('--max-wait-ms', type=float, default=5.0,
+                               help='Longest a job waits for others to join its batch')
     
     # Batch processing command
-    batch_parser = subparsers.add_parser('batch', help='Process multiple farms from CSV')
-    batch_parser.add_argument('--input-file', required=True, help='Input CSV file with farm data')
+    batch_parser = subparsers.add_parser('batch', parents=[metrics_options], help='Process multiple farms from CSV or Parquet')
+    batch_parser.add_argument('--input-file', required=True, help='Input CSV or Parquet file with farm data')
     batch_parser.add_argument('--output-dir', default='./output', help='Output directory')
+    batch_parser.add_argument('--format', choices=['csv', 'parquet'], default='csv', help='batch_results format')
+    batch_parser.add_argument('--report-dataset', help='Also write per-farm verification reports to this Parquet dataset')
+    batch_parser.add_argument('--workers', type=int, default=1, help='Worker processes for chunked processing')
+    batch_parser.add_argument('--chunk-size', type=int, help='Rows per chunk when streaming the input CSV')
+    batch_parser.add_argument('--as-of', type=as_of_date, help='Calculation date (YYYY-MM-DD), defaults to now')
+    batch_parser.add_argument('--cache-dir', help='Content-addressed result cache directory (requires --as-of)')
+    batch_parser.add_argument('--state-db',
+                              help='SQLite state store; enables incremental recalculation. Requires --as-of, the '
+                                   'reporting-period end date: keep it fixed between runs, a new date recalculates every farm')
+    batch_parser.add_argument('--delta', action='store_true',
+                              help="Treat the input as a change log (rows with operation=delete are removed)")
+    batch_parser.add_argument('--export-results', action='store_true',
+                              help='In incremental mode, also write the full batch_results.csv from the store')
+    
+    # Verification report export command
+    report_parser = subparsers.add_parser('report', parents=[metrics_options], help='Export JSON verification reports from a report dataset')
+    report_parser.add_argument('--report-dataset', required=True, help='Partitioned Parquet report dataset')
+    report_parser.add_argument('--farm-id', help='Comma-separated farm IDs (defaults to all farms)')
+    report_parser.add_argument('--report-date', help='Report date (YYYY-MM-DD), defaults to the latest per farm')
+    report_parser.add_argument('--output-dir', default='./output', help='Output directory')
+    
+    # Registry conversion command
+    convert_parser = subparsers.add_parser('convert', parents=[metrics_options], help='Convert a farm CSV to typed Parquet')
+    convert_parser.add_argument('--input-file', required=True, help='Input CSV file with farm data')
+    convert_parser.add_argument('--output', required=True, help='Output Parquet file')
+    convert_parser.add_argument('--chunk-size', type=int, default=200000, help='Rows per conversion chunk')
+    
+    # Credit projection command
+    projection_parser = subparsers.add_parser('projection', parents=[metrics_options], help='Project credit curves over the project lifespan')
+    projection_parser.add_argument('--input-file', required=True, help='Input CSV or Parquet file with farm data')
+    projection_parser.add_argument('--output-dir', default='./output', help='Output directory')
+    projection_parser.add_argument('--frequency', choices=['annual', 'monthly'], default='annual', help='Period length')
+    projection_parser.add_argument('--horizon-years', type=int, help='Years to project (defaults to the model lifespan)')
+    projection_parser.add_argument('--calendar', action='store_true',
+                                   help='Use calendar period end dates instead of project years/months')
+    projection_parser.add_argument('--start', help='First calendar period (YYYY-MM-DD) when using --calendar')
+    projection_parser.add_argument('--chunk-size', type=int, default=10000, help='Farms per projection chunk')
+    projection_parser.add_argument('--as-of', type=as_of_date, help='Date used to validate establishment dates')
+    
+    # Uncertainty analysis command
+    uncertainty_parser = subparsers.add_parser('uncertainty', parents=[metrics_options], help='Monte Carlo confidence intervals for credits')
+    uncertainty_parser.add_argument('--input-file', required=True, help='Input CSV or Parquet file with farm data')
+    uncertainty_parser.add_argument('--output-dir', default='./output', help='Output directory')
+    uncertainty_parser.add_argument('--draws', type=int, default=1000, help='Monte Carlo draws')
+    uncertainty_parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    uncertainty_parser.add_argument('--uncertainty-config', help='JSON file with parameter distributions')
+    uncertainty_parser.add_argument('--workers', type=int, default=1, help='Worker processes')
+    uncertainty_parser.add_argument('--chunk-size', type=int, default=20000, help='Farms per worker chunk')
+    uncertainty_parser.add_argument('--as-of', type=as_of_date, help='Calculation date (YYYY-MM-DD), defaults to now')
+    
+    # Zonal NDVI command
+    zonal_parser = subparsers.add_parser('zonal', parents=[metrics_options], help='Per-farm NDVI statistics from farm boundaries')
+    zonal_parser.add_argument('--red-band', required=True, help='Red band GeoTIFF')
+    zonal_parser.add_argument('--nir-band', required=True, help='NIR band GeoTIFF')
+    zonal_parser.add_argument('--boundary-file', required=True, help='Farm boundaries (GeoJSON, Shapefile, etc.)')
+    zonal_parser.add_argument('--output-dir', default='./output', help='Output directory')
+    zonal_parser.add_argument('--all-touched', action='store_true',
+                              help='Count every pixel touched by a boundary (useful for very small farms)')
+    
+    # NDVI time-series cube command
+    cube_parser = subparsers.add_parser('cube', parents=[metrics_options], help='Multi-date NDVI cube: add dates or run temporal queries')
+    cube_parser.add_argument('action', choices=['add', 'trend', 'seasonal-max', 'change', 'farm-series'])
+    cube_parser.add_argument('--cube-dir', required=True, help='Cube directory')
+    cube_parser.add_argument('--scenes', help='CSV with date, red_band and nir_band columns (for add)')
+    cube_parser.add_argument('--workers', type=int, default=1, help='Worker processes when adding dates')
+    cube_parser.add_argument('--start', help='First date to include (YYYY-MM-DD)')
+    cube_parser.add_argument('--end', help='Last date to include (YYYY-MM-DD)')
+    cube_parser.add_argument('--months', help='Comma-separated months for seasonal-max, e.g. 6,7,8,9')
+    cube_parser.add_argument('--before', help='START,END of the reference period for change')
+    cube_parser.add_argument('--after', help='START,END of the comparison period for change')
+    cube_parser.add_argument('--threshold', type=float, help='Classify change beyond this NDVI difference')
+    cube_parser.add_argument('--boundary-file', help='Farm boundaries for farm-series')
+    cube_parser.add_argument('--output', help='Output GeoTIFF (or CSV for farm-series)')
+    
+    # NDVI quicklook command
+    quicklook_parser = subparsers.add_parser('quicklook', parents=[metrics_options], help='Quicklook PNGs from an NDVI GeoTIFF')
+    quicklook_parser.add_argument('--ndvi-geotiff', required=True, help='NDVI GeoTIFF')
+    quicklook_parser.add_argument('--boundary-file', help='Render one quicklook per farm boundary')
+    quicklook_parser.add_argument('--output-dir', default='./output', help='Output directory')
+    quicklook_parser.add_argument('--max-size', type=int, default=1024, help='Longest side of each PNG in pixels')
+    quicklook_parser.add_argument('--workers', type=int, default=1, help='Worker processes for farm quicklooks')
+    quicklook_parser.add_argument('--build-overviews', action='store_true',
+                                  help='Add internal overviews to the GeoTIFF first (for files written elsewhere)')
+    
+    # Web map tiles command
+    tiles_parser = subparsers.add_parser('tiles', parents=[metrics_options], help='Tiled GeoJSON pyramid of farm boundaries for web maps')
+    tiles_parser.add_argument('--boundary-file', required=True, help='Farm boundaries (GeoJSON, Shapefile, etc.)')
+    tiles_parser.add_argument('--output-dir', default='./output/tiles', help='Tile directory (updated incrementally)')
+    tiles_parser.add_argument('--min-zoom', type=int, default=6, help='Lowest zoom level')
+    tiles_parser.add_argument('--max-zoom', type=int, default=14, help='Highest zoom level')
+    tiles_parser.add_argument('--workers', type=int, default=1, help='Worker processes')
+    tiles_parser.add_argument('--columns', help='Comma-separated properties to include (defaults to all)')
     
     args = parser.parse_args()
     
     # Create output directory if it doesn't exist
-    os.makedirs(args.output_dir, exist_ok=True)
+    if getattr(args, 'output_dir', None):
+        os.makedirs(args.output_dir, exist_ok=True)
     
-    # Execute the appropriate command
-    if args.command == 'carbon':
-        calculate_carbon_credits(args)
-    elif args.command == 'batch':
-        process_batch_farms(args)
-    else:
+    # Execute the appropriate command, measuring its stages
+    if args.command is None:
         parser.print_help()
+        return
+    
+    run = start_run(args.command, trace=bool(args.trace), trace_memory=args.trace_memory)
+    try:
+        if args.profile:
+            profile_call(lambda: run_command(args, parser), args.profile)
+        else:
+            run_command(args, parser)
+    finally:
+        finish_run()
+        write_run_metrics(args, run)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -1,83 +1,219 @@
 import rasterio
+from rasterio.windows import Window
 import numpy as np
-import matplotlib.pyplot as plt
 from datetime import datetime
 import json
 import os
+from instrumentation.metrics import metrics
+from satellite.ndvi_stats import NDVIStatsAccumulator
+from satellite.quicklook import build_overviews, colorize, write_png
+
+# Target pixels per window when a raster has no internal tiling (striped layout)
+STRIP_WINDOW_PIXELS = 1024 * 1024
+
+# Tile size of NDVI GeoTIFFs written by this module
+OUTPUT_TILE_SIZE = 256
+
+# Longest side of the decimated preview used for report maps
+PREVIEW_SIZE = 2048
+
+# Rows per statistics block when summarising an in-memory array
+STATS_ROWS_PER_BLOCK = 512
+
+# Value written for pixels without a valid NDVI, and the nodata value of NDVI GeoTIFFs
+NDVI_NODATA = np.nan
+
+def compute_ndvi_block(red, nir, nodata=None):
+    """NDVI for float32 red/NIR blocks, computed in place in the NIR buffer.
+    
+    Pixels whose bands sum to zero, or that are set in the nodata mask, are
+    NDVI_NODATA.
+    """
+    total = nir + red
+    np.subtract(nir, red, out=nir)
+    
+    # Avoid division by zero
+    valid = total != 0
+    if nodata is not None:
+        valid &= ~nodata
+    np.divide(nir, total, out=nir, where=valid)
+    nir[~valid] = NDVI_NODATA
+    return nir
+
+def band_nodata(block, nodata):
+    """Mask of a band block's nodata pixels, or None if the band has no nodata value"""
+    if nodata is None:
+        return None
+    return np.isnan(block) if np.isnan(nodata) else block == nodata
 
 class NDVICalculator:
     def __init__(self, red_band_path, nir_band_path):
         self.red_band_path = red_band_path
         self.nir_band_path = nir_band_path
         
+    def windows(self, src):
+        """Read windows following the raster's internal tiles, batching thin strips"""
+        block_height, block_width = src.block_shapes[0]
+        if block_width < src.width:
+            for _, window in src.block_windows(1):
+                yield window
+            return
+            
+        rows = max(block_height, STRIP_WINDOW_PIXELS // max(src.width, 1))
+        rows -= rows % block_height
+        for row in range(0, src.height, rows):
+            yield Window(0, row, src.width, min(rows, src.height - row))
+            
+    def iter_ndvi_blocks(self, window_filter=None):
+        """Yield (window, float32 NDVI block) pairs; peak memory is bounded by the window size.
+        
+        window_filter, if given, is called with each window and windows it
+        rejects are skipped without reading the bands.
+        """
+        with rasterio.open(self.red_band_path) as red_src, rasterio.open(self.nir_band_path) as nir_src:
+            if (red_src.width, red_src.height) != (nir_src.width, nir_src.height):
+                raise ValueError("Red and NIR bands have different dimensions")
+            # Decoded band bytes per pixel, for the read stage's bytes counter
+            pixel_bytes = np.dtype(red_src.dtypes[0]).itemsize + np.dtype(nir_src.dtypes[0]).itemsize
+                
+            for window in self.windows(red_src):
+                if window_filter is not None and not window_filter(window):
+                    continue
+                pixels = int(window.width) * int(window.height)
+                with metrics().stage('ndvi.read', items=pixels, nbytes=pixels * pixel_bytes):
+                    red = red_src.read(1, window=window, out_dtype='float32')
+                    nir = nir_src.read(1, window=window, out_dtype='float32')
+                with metrics().stage('ndvi.compute', items=pixels):
+                    masks = [mask for mask in (band_nodata(red, red_src.nodata), band_nodata(nir, nir_src.nodata))
+                             if mask is not None]
+                    block = compute_ndvi_block(red, nir, np.logical_or.reduce(masks) if masks else None)
+                yield window, block
+                
+    def output_profile(self, profile=None):
+        """Tiled float32 GeoTIFF profile for NDVI output, based on the red band by default"""
+        if profile is None:
+            with rasterio.open(self.red_band_path) as red_src:
+                profile = red_src.profile
+        profile = dict(profile)
+        profile.update(
+            driver='GTiff',
+            dtype=rasterio.float32,
+            count=1,
+            compress='lzw',
+            tiled=True,
+            blockxsize=OUTPUT_TILE_SIZE,
+            blockysize=OUTPUT_TILE_SIZE,
+            nodata=NDVI_NODATA
+        )
+        return profile
+        
     def calculate_ndvi(self):
         """Calculate NDVI from red and NIR bands"""
         try:
             with rasterio.open(self.red_band_path) as red_src:
-                red_band = red_src.read(1).astype('float64')
+                ndvi = np.empty((red_src.height, red_src.width), dtype='float32')
                 
-            with rasterio.open(self.nir_band_path) as nir_src:
-                nir_band = nir_src.read(1).astype('float64')
+            for window, block in self.iter_ndvi_blocks():
+                ndvi[window.toslices()] = block
                 
-            # Avoid division by zero
-            mask = (red_band + nir_band) == 0
-            ndvi = (nir_band - red_band) / (nir_band + red_band)
-            ndvi[mask] = 0
-            
             return ndvi
             
         except Exception as e:
             print(f"Error calculating NDVI: {e}")
             return None
             
-    def save_ndvi_geotiff(self, output_path, profile):
-        """Save NDVI as GeoTIFF"""
-        ndvi = self.calculate_ndvi()
-        if ndvi is not None:
-            profile.update(
-                dtype=rasterio.float32,
-                count=1,
-                compress='lzw'
-            )
-            
-            with rasterio.open(output_path, 'w', **profile) as dst:
-                dst.write(ndvi.astype(rasterio.float32), 1)
-                
+    def save_ndvi_geotiff(self, output_path, profile=None, overviews=True):
+        """Save NDVI as GeoTIFF, streaming window by window, with internal overviews for quicklooks"""
+        try:
+            with rasterio.open(output_path, 'w', **self.output_profile(profile)) as dst:
+                for window, block in self.iter_ndvi_blocks():
+                    with metrics().stage('ndvi.write', items=block.size, nbytes=block.nbytes):
+                        dst.write(block, 1, window=window)
+                    
+            if overviews:
+                with metrics().stage('ndvi.overviews'):
+                    build_overviews(output_path)
             return True
-        return False
+            
+        except Exception as e:
+            print(f"Error saving NDVI GeoTIFF: {e}")
+            return False
         
     def calculate_statistics(self, ndvi_array):
         """Calculate statistics for NDVI array"""
         if ndvi_array is None:
             return None
             
-        return {
-            'mean': float(np.nanmean(ndvi_array)),
-            'median': float(np.nanmedian(ndvi_array)),
-            'std': float(np.nanstd(ndvi_array)),
-            'min': float(np.nanmin(ndvi_array)),
-            'max': float(np.nanmax(ndvi_array)),
-            'date_calculated': datetime.now().isoformat()
-        }
+        stats = NDVIStatsAccumulator()
+        with metrics().stage('ndvi.statistics', items=ndvi_array.size):
+            for rows in range(0, ndvi_array.shape[0], STATS_ROWS_PER_BLOCK):
+                stats.update(ndvi_array[rows:rows + STATS_ROWS_PER_BLOCK])
+            return stats.result()
         
-    def create_ndvi_report(self, farm_id, output_dir):
-        """Create a comprehensive NDVI report"""
-        ndvi = self.calculate_ndvi()
-        if ndvi is None:
-            return None
+    def process_scene(self, geotiff_path=None, profile=None, preview_size=PREVIEW_SIZE, overviews=True):
+        """Read the bands once, producing statistics, an optional GeoTIFF and a decimated preview"""
+        stats = NDVIStatsAccumulator()
+        
+        with rasterio.open(self.red_band_path) as red_src:
+            step = max(1, -(-max(red_src.height, red_src.width) // preview_size))
+            preview = np.zeros((-(-red_src.height // step), -(-red_src.width // step)), dtype='float32')
             
-        stats = self.calculate_statistics(ndvi)
+        dst = rasterio.open(geotiff_path, 'w', **self.output_profile(profile)) if geotiff_path else None
+        try:
+            for window, block in self.iter_ndvi_blocks():
+                with metrics().stage('ndvi.statistics', items=block.size):
+                    stats.update(block)
+                if dst is not None:
+                    with metrics().stage('ndvi.write', items=block.size, nbytes=block.nbytes):
+                        dst.write(block, 1, window=window)
+                    
+                # Keep every step-th pixel of the block for the preview
+                row_start = -window.row_off % step
+                col_start = -window.col_off % step
+                sample = block[row_start::step, col_start::step]
+                row = (window.row_off + row_start) // step
+                col = (window.col_off + col_start) // step
+                preview[row:row + sample.shape[0], col:col + sample.shape[1]] = sample
+        finally:
+            if dst is not None:
+                dst.close()
+                
+        if geotiff_path and overviews:
+            with metrics().stage('ndvi.overviews'):
+                build_overviews(geotiff_path)
+        return stats.result(), preview
         
-        # Create visualization
-        plt.figure(figsize=(10, 8))
-        plt.imshow(ndvi, cmap='YlGn', vmin=-1, vmax=1)
-        plt.colorbar(label='NDVI')
-        plt.title(f'NDVI Map for Farm {farm_id}')
-        plt.axis('off')
+    def create_ndvi_report(self, farm_id, output_dir, geotiff_path=None, figure=False, dpi=300):
+        """Create a comprehensive NDVI report.
         
+        The map is a quicklook PNG coloured through a precomputed YlGn lookup
+        table. figure=True additionally renders a titled matplotlib figure
+        with a colorbar (matplotlib is only imported for this path).
+        """
+        try:
+            stats, preview = self.process_scene(geotiff_path)
+        except Exception as e:
+            print(f"Error calculating NDVI: {e}")
+            return None
+            
+        # Create visualization
         visualization_path = os.path.join(output_dir, f'ndvi_map_{farm_id}.png')
-        plt.savefig(visualization_path, bbox_inches='tight', dpi=300)
-        plt.close()
+        with metrics().stage('ndvi.report', items=preview.size):
+            write_png(colorize(preview), visualization_path)
+        
+        figure_path = None
+        if figure:
+            import matplotlib.pyplot as plt
+            
+            plt.figure(figsize=(10, 8))
+            plt.imshow(preview, cmap='YlGn', vmin=-1, vmax=1)
+            plt.colorbar(label='NDVI')
+            plt.title(f'NDVI Map for Farm {farm_id}')
+            plt.axis('off')
+            
+            figure_path = os.path.join(output_dir, f'ndvi_figure_{farm_id}.png')
+            plt.savefig(figure_path, bbox_inches='tight', dpi=dpi)
+            plt.close()
         
         # Save statistics
         report = {
@@ -86,9 +222,13 @@ class NDVICalculator:
             'visualization_path': visualization_path,
             'timestamp': datetime.now().isoformat()
         }
+        if geotiff_path:
+            report['geotiff_path'] = geotiff_path
+        if figure_path:
+            report['figure_path'] = figure_path
         
         report_path = os.path.join(output_dir, f'ndvi_report_{farm_id}.json')
         with open(report_path, 'w') as f:
             json.dump(report, f, indent=2)
             
-        return report_path
\ No newline at end of file
+        return report_path
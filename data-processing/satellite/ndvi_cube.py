@@ -0,0 +1,283 @@
+import rasterio
+from rasterio.crs import CRS
+import numpy as np
+import pandas as pd
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from affine import Affine
+
+from instrumentation.metrics import metrics
+from satellite.ndvi_calculator import NDVICalculator
+from satellite.zonal_stats import label_dtype, rasterize_boundaries
+
+CUBE_DATA_FILE = 'ndvi.dat'
+CUBE_META_FILE = 'meta.json'
+CUBE_DTYPE = np.float32
+
+# Upper bound on cube values read at once by temporal queries
+CUBE_BLOCK_VALUES = 8 * 1024 * 1024
+
+def fill_slab(data_path, index, shape, red_band_path, nir_band_path):
+    """Compute one date's NDVI straight into its slab of a cube file (runs in worker processes)"""
+    height, width = shape
+    offset = index * height * width * np.dtype(CUBE_DTYPE).itemsize
+    slab = np.memmap(data_path, dtype=CUBE_DTYPE, mode='r+',
+                     offset=offset, shape=shape)
+    calculator = NDVICalculator(red_band_path, nir_band_path)
+    for window, block in calculator.iter_ndvi_blocks():
+        slab[window.toslices()] = block
+    slab.flush()
+    del slab
+    return index
+
+class NDVICube:
+    """Disk-backed date x y x x NDVI cube for multi-date monitoring.
+
+    NDVI for each acquisition date is stored as one contiguous float32 slab of
+    a raw file that is memory-mapped on access, so new dates are appended by
+    growing the file and temporal queries read the cube in row bands instead
+    of loading it into RAM. Dates are listed in meta.json in storage order.
+    """
+
+    def __init__(self, cube_dir):
+        self.cube_dir = cube_dir
+        with open(os.path.join(cube_dir, CUBE_META_FILE), 'r') as f:
+            self.meta = json.load(f)
+        self.height = self.meta['height']
+        self.width = self.meta['width']
+        self.transform = Affine(*self.meta['transform'])
+        self.crs = self.meta['crs']
+
+    @classmethod
+    def create(cls, cube_dir, reference_band_path):
+        """Create an empty cube on the grid of a reference band"""
+        os.makedirs(cube_dir, exist_ok=True)
+        with rasterio.open(reference_band_path) as src:
+            meta = {
+                'height': src.height,
+                'width': src.width,
+                'transform': list(src.transform)[:6],
+                'crs': src.crs.to_wkt() if src.crs else None,
+                'dtype': np.dtype(CUBE_DTYPE).name,
+                'dates': []
+            }
+        open(os.path.join(cube_dir, CUBE_DATA_FILE), 'wb').close()
+        with open(os.path.join(cube_dir, CUBE_META_FILE), 'w') as f:
+            json.dump(meta, f, indent=2)
+        return cls(cube_dir)
+
+    @classmethod
+    def open_or_create(cls, cube_dir, reference_band_path):
+        if os.path.exists(os.path.join(cube_dir, CUBE_META_FILE)):
+            return cls(cube_dir)
+        return cls.create(cube_dir, reference_band_path)
+
+    @property
+    def dates(self):
+        return pd.to_datetime(self.meta['dates'])
+
+    def save_meta(self):
+        """Atomically replace meta.json"""
+        path = os.path.join(self.cube_dir, CUBE_META_FILE)
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    def data(self):
+        """Read-only memory map of the whole cube"""
+        shape = (len(self.meta['dates']), self.height, self.width)
+        if shape[0] == 0:
+            return np.zeros(shape, dtype=CUBE_DTYPE)
+        return np.memmap(os.path.join(self.cube_dir, CUBE_DATA_FILE), dtype=CUBE_DTYPE, mode='r', shape=shape)
+
+    def check_grid(self, band_path, date):
+        """Raise ValueError unless a band has the cube's size, transform and CRS"""
+        with rasterio.open(band_path) as src:
+            if (src.height, src.width) != (self.height, self.width):
+                raise ValueError(f"Scene for {date} does not match the cube grid")
+            if not src.transform.almost_equals(self.transform):
+                raise ValueError(f"Scene for {date} is not aligned with the cube grid")
+            if src.crs != (CRS.from_wkt(self.crs) if self.crs else None):
+                raise ValueError(f"Scene for {date} is not in the cube CRS")
+
+    def add_dates(self, scenes, workers=1):
+        """Add (date, red_band_path, nir_band_path) scenes, filling one slab per date in parallel.
+
+        New dates are appended after the existing slabs. Dates already in the
+        cube are recomputed in a copy of the cube file that replaces it once
+        every slab is written. The date list is only updated at the end, so an
+        interrupted run leaves the existing cube intact.
+        """
+        dates = list(self.meta['dates'])
+        jobs = []
+        for date, red_band_path, nir_band_path in scenes:
+            date = pd.Timestamp(date).strftime('%Y-%m-%d')
+            for band_path in (red_band_path, nir_band_path):
+                self.check_grid(band_path, date)
+            if date not in dates:
+                dates.append(date)
+            jobs.append((dates.index(date), red_band_path, nir_band_path))
+
+        # Existing slabs are never written in place
+        slab_bytes = self.height * self.width * np.dtype(CUBE_DTYPE).itemsize
+        cube_path = os.path.join(self.cube_dir, CUBE_DATA_FILE)
+        data_path = cube_path
+        if any(index < len(self.meta['dates']) for index, _, _ in jobs):
+            data_path = f"{cube_path}.tmp"
+            shutil.copyfile(cube_path, data_path)
+
+        # Grow the file to hold every slab before workers map their slabs
+        if os.path.getsize(data_path) < len(dates) * slab_bytes:
+            with open(data_path, 'r+b') as f:
+                f.truncate(len(dates) * slab_bytes)
+
+        shape = (self.height, self.width)
+        with metrics().stage('cube.add', items=len(jobs), nbytes=len(jobs) * slab_bytes):
+            if workers <= 1:
+                for index, red_band_path, nir_band_path in jobs:
+                    fill_slab(data_path, index, shape, red_band_path, nir_band_path)
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    futures = [pool.submit(fill_slab, data_path, index, shape, red, nir)
+                               for index, red, nir in jobs]
+                    for future in futures:
+                        future.result()
+
+        if data_path != cube_path:
+            os.replace(data_path, cube_path)
+        self.meta['dates'] = dates
+        self.save_meta()
+        return len(jobs)
+
+    def read_band(self, data, indices, start, stop):
+        """Values of the selected dates for rows start:stop, as float64"""
+        with metrics().stage('cube.read', nbytes=len(indices) * (stop - start) * self.width * data.itemsize) as stage:
+            values = np.asarray(data[indices, start:stop, :], dtype=np.float64)
+            stage.items = values.size
+        return values
+
+    def row_bands(self, n_dates):
+        """Row ranges that keep n_dates x rows x width values under CUBE_BLOCK_VALUES"""
+        rows = max(1, CUBE_BLOCK_VALUES // max(n_dates * self.width, 1))
+        for start in range(0, self.height, rows):
+            yield start, min(start + rows, self.height)
+
+    def select(self, start=None, end=None, months=None):
+        """Storage indices of dates in [start, end] and the given months, in date order"""
+        dates = self.dates
+        keep = np.ones(len(dates), dtype=bool)
+        if start is not None:
+            keep &= dates >= pd.Timestamp(start)
+        if end is not None:
+            keep &= dates <= pd.Timestamp(end)
+        if months is not None:
+            keep &= np.isin(dates.month, list(months))
+        indices = np.flatnonzero(keep)
+        return indices[np.argsort(dates[indices])]
+
+    def pixel_series(self, row, col):
+        """NDVI time series of one pixel"""
+        indices = self.select()
+        return pd.Series(self.data()[indices, row, col], index=self.dates[indices], name='ndvi')
+
+    def reduce(self, indices, reducer):
+        """Apply reducer(values[T, rows, cols]) -> [rows, cols] band by band over the selected dates"""
+        data = self.data()
+        result = np.full((self.height, self.width), np.nan, dtype=CUBE_DTYPE)
+        if len(indices) == 0:
+            return result
+        for start, stop in self.row_bands(len(indices)):
+            values = self.read_band(data, indices, start, stop)
+            with metrics().stage('cube.reduce', items=values.size):
+                result[start:stop] = reducer(values)
+        return result
+
+    def trend(self, start=None, end=None):
+        """Per-pixel least-squares NDVI slope in units per year"""
+        indices = self.select(start, end)
+        years = (self.dates[indices] - self.dates[indices].min()).days.to_numpy() / 365.25
+
+        def slope(values):
+            t = np.broadcast_to(years[:, None, None], values.shape)
+            valid = np.isfinite(values)
+            n = valid.sum(axis=0)
+            t = np.where(valid, t, 0.0)
+            y = np.where(valid, values, 0.0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                t_mean = t.sum(axis=0) / n
+                y_mean = y.sum(axis=0) / n
+                covariance = (np.where(valid, (t - t_mean) * (y - y_mean), 0.0)).sum(axis=0)
+                variance = (np.where(valid, (t - t_mean) ** 2, 0.0)).sum(axis=0)
+                return np.where(variance > 0, covariance / variance, np.nan)
+
+        return self.reduce(indices, slope)
+
+    def seasonal_max(self, start=None, end=None, months=None):
+        """Per-pixel maximum NDVI over the selected dates (e.g. a growing season's months)"""
+        indices = self.select(start, end, months)
+        return self.reduce(indices, lambda values: np.nanmax(values, axis=0))
+
+    def change(self, before, after, threshold=None):
+        """Per-pixel difference of mean NDVI between two (start, end) periods.
+
+        With a threshold, returns an int8 map instead: -1 for loss, 1 for gain
+        and 0 for change within the threshold or pixels without data in
+        either period.
+        """
+        before_mean = self.reduce(self.select(*before), lambda values: np.nanmean(values, axis=0))
+        after_mean = self.reduce(self.select(*after), lambda values: np.nanmean(values, axis=0))
+        difference = after_mean - before_mean
+        if threshold is None:
+            return difference
+        with np.errstate(invalid='ignore'):
+            changed = np.abs(difference) > threshold
+        return np.where(changed, np.sign(difference), 0).astype(np.int8)
+
+    def farm_series(self, gdf, id_column='farm_id', all_touched=False):
+        """Mean NDVI per farm and date (farms x dates DataFrame)"""
+        indices = self.select()
+        n = len(gdf) + 1
+        sums = np.zeros((len(indices), n))
+        counts = np.zeros((len(indices), n))
+        data = self.data()
+        # The label grid is disk-backed, as in zonal_ndvi_statistics
+        with tempfile.TemporaryFile() as label_file:
+            labels = np.memmap(label_file, dtype=label_dtype(len(gdf)), mode='w+', shape=(self.height, self.width))
+            rasterize_boundaries(gdf, self, out=labels, all_touched=all_touched)
+            for start, stop in self.row_bands(len(indices)):
+                band_labels = np.asarray(labels[start:stop]).ravel().astype(np.intp)
+                if not band_labels.any():
+                    continue
+                values = self.read_band(data, indices, start, stop).reshape(len(indices), -1)
+                with metrics().stage('cube.reduce', items=values.size):
+                    for t in range(len(indices)):
+                        valid = np.isfinite(values[t])
+                        sums[t] += np.bincount(band_labels[valid], weights=values[t][valid], minlength=n)
+                        counts[t] += np.bincount(band_labels[valid], minlength=n)
+            del labels
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums[:, 1:] / counts[:, 1:]
+        ids = gdf[id_column].to_numpy() if id_column in gdf.columns else np.arange(len(gdf))
+        return pd.DataFrame(means.T, index=pd.Index(ids, name=id_column), columns=self.dates[indices])
+
+    def write_geotiff(self, array, output_path):
+        """Write a query result on the cube grid"""
+        profile = {
+            'driver': 'GTiff',
+            'height': self.height,
+            'width': self.width,
+            'count': 1,
+            'dtype': array.dtype.name,
+            'transform': self.transform,
+            'crs': self.crs,
+            'compress': 'lzw',
+            'tiled': True,
+            'blockxsize': 256,
+            'blockysize': 256
+        }
+        with rasterio.open(output_path, 'w', **profile) as dst:
+            dst.write(array, 1)
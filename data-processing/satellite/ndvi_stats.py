@@ -0,0 +1,156 @@
+import numpy as np
+from datetime import datetime
+
+# Histogram resolution: percentiles are exact to within one bin (0.001 NDVI)
+HISTOGRAM_BINS = 2000
+NDVI_RANGE = (-1.0, 1.0)
+
+REPORT_PERCENTILES = [5, 25, 75, 95]
+
+# Coarser per-group histogram (0.01 NDVI) to keep memory at bins x groups
+ZONAL_HISTOGRAM_BINS = 200
+
+class NDVIStatsAccumulator:
+    """Single-pass NDVI statistics over raster blocks.
+
+    Mean and standard deviation are merged block by block (Chan et al.),
+    min and max are exact, and the median and other percentiles come from a
+    fixed-bin histogram over the NDVI range, so their error is at most one bin
+    width regardless of scene size.
+    """
+
+    def __init__(self, bins=HISTOGRAM_BINS, value_range=NDVI_RANGE):
+        self.bins = bins
+        self.low, self.high = value_range
+        self.histogram = np.zeros(bins, dtype=np.int64)
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def bin_index(self, values):
+        """Histogram bin of each value, clipped to the value range"""
+        scaled = (values - self.low) * (self.bins / (self.high - self.low))
+        return np.clip(scaled, 0, self.bins - 1).astype(np.intp)
+
+    def update(self, block):
+        """Add a block of NDVI values (NaN are ignored)"""
+        values = np.asarray(block).ravel()
+        finite = np.isfinite(values)
+        if not finite.all():
+            values = values[finite]
+        n = values.size
+        if n == 0:
+            return
+
+        block_mean = float(values.mean(dtype=np.float64))
+        block_m2 = float(np.square(values - block_mean, dtype=np.float64).sum())
+
+        total = self.count + n
+        delta = block_mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += block_m2 + delta * delta * self.count * n / total
+        self.count = total
+
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.histogram += np.bincount(self.bin_index(values), minlength=self.bins)
+
+    def percentile(self, q):
+        """Approximate q-th percentile, interpolated linearly within its histogram bin"""
+        if self.count == 0:
+            return float('nan')
+        target = q / 100.0 * self.count
+        cumulative = np.cumsum(self.histogram)
+        i = int(np.searchsorted(cumulative, target, side='left'))
+        i = min(i, self.bins - 1)
+        below = cumulative[i - 1] if i > 0 else 0
+        fraction = (target - below) / self.histogram[i] if self.histogram[i] else 0.0
+        width = (self.high - self.low) / self.bins
+        value = self.low + (i + fraction) * width
+        return float(min(max(value, self.min), self.max))
+
+    def result(self, percentiles=REPORT_PERCENTILES):
+        """Statistics in the NDVICalculator.calculate_statistics format"""
+        if self.count == 0:
+            return None
+        return {
+            'mean': self.mean,
+            'median': self.percentile(50),
+            'std': float(np.sqrt(self.m2 / self.count)),
+            'min': self.min,
+            'max': self.max,
+            'count': self.count,
+            'percentiles': {f"p{q:g}": self.percentile(q) for q in percentiles},
+            'date_calculated': datetime.now().isoformat()
+        }
+
+class GroupedNDVIStatsAccumulator:
+    """Single-pass NDVI statistics for many zones at once.
+
+    Blocks come with an integer label per pixel (0 = no zone). Counts, sums,
+    sums of squares, min and max are accumulated per label with bincount and
+    ufunc.at; medians come from a per-label fixed-bin histogram.
+    """
+
+    def __init__(self, n_groups, bins=ZONAL_HISTOGRAM_BINS, value_range=NDVI_RANGE):
+        self.n_groups = n_groups
+        self.bins = bins
+        self.low, self.high = value_range
+        size = n_groups + 1
+        self.count = np.zeros(size, dtype=np.int64)
+        self.sum = np.zeros(size, dtype=np.float64)
+        self.sum_sq = np.zeros(size, dtype=np.float64)
+        self.min = np.full(size, np.inf)
+        self.max = np.full(size, -np.inf)
+        self.histogram = np.zeros((size, bins), dtype=np.uint32)
+
+    def update(self, block, labels):
+        """Add a block of NDVI values with the zone label of each pixel"""
+        values = np.asarray(block).ravel()
+        labels = np.asarray(labels).ravel()
+        keep = (labels > 0) & np.isfinite(values)
+        if not keep.any():
+            return
+        values = values[keep].astype(np.float64)
+        labels = labels[keep].astype(np.intp)
+
+        size = self.n_groups + 1
+        self.count += np.bincount(labels, minlength=size)
+        self.sum += np.bincount(labels, weights=values, minlength=size)
+        self.sum_sq += np.bincount(labels, weights=values * values, minlength=size)
+        np.minimum.at(self.min, labels, values)
+        np.maximum.at(self.max, labels, values)
+
+        scaled = (values - self.low) * (self.bins / (self.high - self.low))
+        bin_index = np.clip(scaled, 0, self.bins - 1).astype(np.intp)
+        np.add.at(self.histogram.reshape(-1), labels * self.bins + bin_index, 1)
+
+    def medians(self):
+        """Approximate median per label, interpolated within its histogram bin"""
+        cumulative = np.cumsum(self.histogram, axis=1, dtype=np.int64)
+        target = self.count / 2.0
+        index = np.minimum((cumulative < target[:, None]).sum(axis=1), self.bins - 1)
+        rows = np.arange(len(index))
+        below = np.where(index > 0, cumulative[rows, np.maximum(index - 1, 0)], 0)
+        in_bin = self.histogram[rows, index]
+        fraction = np.divide(target - below, in_bin, out=np.zeros(len(index)), where=in_bin > 0)
+        width = (self.high - self.low) / self.bins
+        medians = np.clip(self.low + (index + fraction) * width, self.min, self.max)
+        return np.where(self.count > 0, medians, np.nan)
+
+    def result(self):
+        """Per-label statistics arrays for labels 1..n_groups"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = self.sum / self.count
+            variance = np.maximum(self.sum_sq / self.count - mean * mean, 0.0)
+        empty = self.count == 0
+        return {
+            'pixel_count': self.count[1:],
+            'ndvi_mean': np.where(empty, np.nan, mean)[1:],
+            'ndvi_median': self.medians()[1:],
+            'ndvi_std': np.where(empty, np.nan, np.sqrt(variance))[1:],
+            'ndvi_min': np.where(empty, np.nan, self.min)[1:],
+            'ndvi_max': np.where(empty, np.nan, self.max)[1:]
+        }
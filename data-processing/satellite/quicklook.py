@@ -0,0 +1,135 @@
+import rasterio
+from rasterio import features
+from rasterio.enums import Resampling
+from rasterio.errors import NotGeoreferencedWarning, WindowError
+from rasterio.windows import Window, from_bounds
+import numpy as np
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+# ColorBrewer YlGn (9 classes), light to dark
+YLGN_ANCHORS = ['#ffffe5', '#f7fcb9', '#d9f0a3', '#addd8e', '#78c679',
+                '#41ab5d', '#238443', '#006837', '#004529']
+
+NDVI_RANGE = (-1.0, 1.0)
+
+# Longest side of quicklook PNGs
+QUICKLOOK_SIZE = 1024
+FARM_QUICKLOOK_SIZE = 512
+
+# Farms rendered per worker task
+FARMS_PER_TASK = 200
+
+def colormap_lut(anchors=YLGN_ANCHORS, size=256):
+    """RGB lookup table (size x 3, uint8) interpolated linearly between hex anchor colours"""
+    rgb = np.array([[int(color[i:i + 2], 16) for i in (1, 3, 5)] for color in anchors], dtype=float)
+    positions = np.linspace(0, 1, len(anchors))
+    steps = np.linspace(0, 1, size)
+    return np.stack([np.interp(steps, positions, rgb[:, c]) for c in range(3)], axis=1).round().astype(np.uint8)
+
+NDVI_LUT = colormap_lut()
+
+def colorize(ndvi, value_range=NDVI_RANGE, lut=NDVI_LUT, mask=None):
+    """RGBA image (4 x rows x cols, uint8) of an NDVI array; NaN and masked pixels are transparent"""
+    low, high = value_range
+    scaled = (np.nan_to_num(ndvi, nan=low) - low) * ((len(lut) - 1) / (high - low))
+    index = np.clip(scaled, 0, len(lut) - 1).astype(np.intp)
+    rgba = np.empty((4,) + ndvi.shape, dtype=np.uint8)
+    rgba[:3] = np.moveaxis(lut[index], -1, 0)
+    transparent = ~np.isfinite(ndvi) if mask is None else (~np.isfinite(ndvi) | mask)
+    rgba[3] = np.where(transparent, 0, 255)
+    return rgba
+
+def write_png(rgba, output_path):
+    """Write an RGBA array through GDAL's PNG driver"""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', NotGeoreferencedWarning)
+        with rasterio.open(output_path, 'w', driver='PNG', width=rgba.shape[2], height=rgba.shape[1],
+                           count=4, dtype='uint8') as dst:
+            dst.write(rgba)
+    return output_path
+
+def overview_factors(height, width, min_size=256):
+    """Power-of-two decimation factors until the smaller side drops below min_size"""
+    factors = []
+    factor = 2
+    while min(height, width) // factor >= min_size:
+        factors.append(factor)
+        factor *= 2
+    return factors
+
+def build_overviews(geotiff_path, factors=None, resampling=Resampling.average):
+    """Write internal overviews into a GeoTIFF so decimated reads skip the full-resolution data"""
+    with rasterio.open(geotiff_path, 'r+') as dst:
+        factors = factors or overview_factors(dst.height, dst.width)
+        if factors:
+            dst.build_overviews(factors, resampling)
+            dst.update_tags(ns='rio_overview', resampling=resampling.name)
+    return factors
+
+def decimated_shape(height, width, max_size):
+    scale = max(height, width) / max_size
+    if scale <= 1:
+        return height, width
+    return max(1, round(height / scale)), max(1, round(width / scale))
+
+def read_decimated(src, max_size, window=None):
+    """Read band 1 scaled to at most max_size pixels on its longest side (served from overviews if present)"""
+    window = window or Window(0, 0, src.width, src.height)
+    shape = decimated_shape(int(window.height), int(window.width), max_size)
+    return src.read(1, window=window, out_shape=shape, resampling=Resampling.average,
+                    out_dtype='float32', boundless=False)
+
+def render_quicklook(geotiff_path, output_path, max_size=QUICKLOOK_SIZE):
+    """PNG quicklook of a whole NDVI GeoTIFF"""
+    with rasterio.open(geotiff_path) as src:
+        return write_png(colorize(read_decimated(src, max_size)), output_path)
+
+def render_farm_batch(geotiff_path, farms, output_dir, max_size=FARM_QUICKLOOK_SIZE):
+    """Render (farm_id, geometry) quicklooks cropped to each farm and masked outside it (runs in worker processes)"""
+    paths = {}
+    with rasterio.open(geotiff_path) as src:
+        full = Window(0, 0, src.width, src.height)
+        for farm_id, geometry in farms:
+            window = from_bounds(*geometry.bounds, transform=src.transform)
+            try:
+                window = window.round_offsets().round_lengths().intersection(full)
+            except WindowError:
+                window = None
+            if window is None or window.width < 1 or window.height < 1:
+                print(f"Skipping farm {farm_id}: boundary does not overlap the raster")
+                continue
+            ndvi = read_decimated(src, max_size, window)
+            # Scale the window transform to the decimated grid to mask outside the boundary
+            transform = src.window_transform(window) * rasterio.Affine.scale(
+                window.width / ndvi.shape[1], window.height / ndvi.shape[0])
+            outside = features.geometry_mask([geometry], out_shape=ndvi.shape, transform=transform,
+                                             all_touched=True)
+            paths[farm_id] = write_png(colorize(ndvi, mask=outside),
+                                       os.path.join(output_dir, f'ndvi_quicklook_{farm_id}.png'))
+    return paths
+
+def render_farm_quicklooks(geotiff_path, gdf, output_dir, id_column='farm_id', workers=1,
+                           max_size=FARM_QUICKLOOK_SIZE):
+    """Quicklook PNG per farm boundary, rendered across a process pool; returns {farm_id: path}"""
+    with rasterio.open(geotiff_path) as src:
+        crs = src.crs
+    boundaries = gdf.to_crs(crs) if gdf.crs is not None and crs is not None else gdf
+    ids = boundaries[id_column].astype(str) if id_column in boundaries.columns else boundaries.index.astype(str)
+    farms = [(farm_id, geometry) for farm_id, geometry in zip(ids, boundaries.geometry)
+             if geometry is not None and not geometry.is_empty]
+    batches = [farms[i:i + FARMS_PER_TASK] for i in range(0, len(farms), FARMS_PER_TASK)]
+
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {}
+    if workers <= 1:
+        for batch in batches:
+            paths.update(render_farm_batch(geotiff_path, batch, output_dir, max_size))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(render_farm_batch, geotiff_path, batch, output_dir, max_size)
+                       for batch in batches]
+            for future in futures:
+                paths.update(future.result())
+    return paths
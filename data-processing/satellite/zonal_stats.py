@@ -0,0 +1,54 @@
+import rasterio
+from rasterio import features
+import numpy as np
+import pandas as pd
+import tempfile
+
+from instrumentation.metrics import metrics
+from satellite.ndvi_stats import GroupedNDVIStatsAccumulator
+
+def label_dtype(n_farms):
+    """Smallest unsigned dtype that holds labels 0..n_farms"""
+    return 'uint16' if n_farms < np.iinfo(np.uint16).max else 'uint32'
+
+def rasterize_boundaries(gdf, src, out=None, all_touched=False):
+    """Burn farm polygons into a label grid aligned with src (label i + 1 for row i, 0 elsewhere)"""
+    boundaries = gdf.to_crs(src.crs) if gdf.crs is not None and src.crs is not None else gdf
+    shapes = ((geometry, i + 1) for i, geometry in enumerate(boundaries.geometry)
+              if geometry is not None and not geometry.is_empty)
+    if out is None:
+        out = np.zeros((src.height, src.width), dtype=label_dtype(len(gdf)))
+    return features.rasterize(
+        shapes,
+        out=out,
+        transform=src.transform,
+        fill=0,
+        all_touched=all_touched,
+        dtype=out.dtype
+    )
+
+def zonal_ndvi_statistics(calculator, gdf, id_column='farm_id', all_touched=False):
+    """NDVI statistics for every farm boundary in one windowed pass over the scene.
+
+    The boundaries are rasterized once into a disk-backed label grid; NDVI is
+    then computed only for windows that contain farm pixels and grouped by
+    label. Where farms overlap, the later boundary owns the shared pixels.
+    Returns a DataFrame keyed by id_column.
+    """
+    with rasterio.open(calculator.red_band_path) as src, tempfile.TemporaryFile() as label_file:
+        labels = np.memmap(label_file, dtype=label_dtype(len(gdf)), mode='w+', shape=(src.height, src.width))
+        with metrics().stage('zonal.rasterize', items=len(gdf)):
+            rasterize_boundaries(gdf, src, out=labels, all_touched=all_touched)
+
+        stats = GroupedNDVIStatsAccumulator(len(gdf))
+        has_farms = lambda window: bool(labels[window.toslices()].any())
+        for window, block in calculator.iter_ndvi_blocks(window_filter=has_farms):
+            with metrics().stage('zonal.aggregate', items=block.size):
+                stats.update(block, labels[window.toslices()])
+        del labels
+
+    ids = gdf[id_column].to_numpy() if id_column in gdf.columns else np.arange(len(gdf))
+    table = pd.DataFrame({id_column: ids})
+    for name, values in stats.result().items():
+        table[name] = values
+    return table
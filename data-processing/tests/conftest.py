@@ -0,0 +1,24 @@
+import os
+import sys
+
+# Modules import each other as top-level packages (carbon_calculation, satellite,
+# geospatial), so tests run with the data-processing directory on the path.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from benchmarks.synthetic import synthetic_farms
+
+# Calculation date pinned for every test, so results do not depend on today
+AS_OF = '2025-01-01'
+
+@pytest.fixture
+def farms():
+    """A small synthetic registry with rice, agroforestry and invalid rows"""
+    return synthetic_farms(2000, seed=1, invalid_share=0.05)
+
+@pytest.fixture
+def registry_csv(tmp_path, farms):
+    path = tmp_path / 'farms.csv'
+    farms.to_csv(path, index=False)
+    return str(path)
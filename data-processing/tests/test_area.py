@@ -0,0 +1,41 @@
+import geopandas as gpd
+import numpy as np
+import pytest
+import shapely
+from pyproj import Geod
+
+from geospatial.area import AreaCache, equal_area_hectares
+
+def random_farms(count, size, seed=0):
+    rng = np.random.default_rng(seed)
+    lons, lats = rng.uniform(-180, 179, count), rng.uniform(-85, 85, count)
+    return [shapely.Polygon([(x, y), (x + size, y + size * 0.2), (x + size * 0.8, y + size), (x + size * 0.1, y + size * 0.7)])
+            for x, y in zip(lons, lats)]
+
+@pytest.mark.parametrize('size', [0.001, 0.01, 0.1])
+def test_matches_geodesic_area(size):
+    polygons = random_farms(200, size)
+    geod = Geod(ellps='WGS84')
+    geodesic = np.array([abs(geod.geometry_area_perimeter(polygon)[0]) / 10000 for polygon in polygons])
+    np.testing.assert_allclose(equal_area_hectares(polygons), geodesic, rtol=1e-6)
+
+def test_missing_and_empty_geometries_have_zero_area():
+    areas = equal_area_hectares([None, shapely.Polygon(), *random_farms(1, 0.01)])
+    assert areas[0] == 0 and areas[1] == 0 and areas[2] > 0
+
+def test_cache_agrees_on_missing_and_empty_geometries():
+    geometries = gpd.GeoSeries([None, shapely.Polygon(), *random_farms(1, 0.01)], crs='EPSG:4326')
+    np.testing.assert_array_equal(AreaCache().hectares(geometries), equal_area_hectares(geometries.values))
+
+def test_cache_measures_each_geometry_once():
+    geometries = gpd.GeoSeries(random_farms(10, 0.01) + [None], crs='EPSG:4326')
+    cache = AreaCache()
+    first = cache.hectares(geometries)
+    second = cache.hectares(geometries)
+    assert (cache.misses, cache.hits) == (10, 10)
+    assert first.equals(second)
+    assert first.iloc[-1] == 0
+
+    projected = cache.hectares(geometries.iloc[:3].to_crs('EPSG:32633'))
+    np.testing.assert_allclose(projected, first.iloc[:3], rtol=1e-6)
+    assert cache.misses == 13
@@ -0,0 +1,69 @@
+import pandas as pd
+import pytest
+
+from carbon_calculation.batch_engine import REPORT_RESULT_FIELDS, BatchCarbonModel
+from carbon_calculation.carbon_model import CarbonModel
+from conftest import AS_OF
+
+def farm_records(df):
+    """Rows as the JSON farm records CarbonModel takes, without blank fields"""
+    return [{key: value for key, value in row.items() if not (isinstance(value, float) and pd.isna(value))}
+            for row in df.to_dict('records')]
+
+def expected_results(farm):
+    model = CarbonModel(model_type=farm['crop_type'].lower(), as_of=AS_OF)
+    errors = model.validation_errors(farm)
+    return errors, None if errors else model.calculate_credits(farm)
+
+def assert_matches_carbon_model(df):
+    engine = BatchCarbonModel(as_of=AS_OF)
+    errors = engine.validate_frame(df)
+    calculation = engine.calculate_frame(df)
+
+    for i, farm in enumerate(farm_records(df)):
+        expected_errors, expected = expected_results(farm)
+        assert errors.iloc[i] == expected_errors, farm
+        if expected is None:
+            continue
+        row = calculation.iloc[i]
+        assert row['model_type'] == expected['model_type']
+        for field in REPORT_RESULT_FIELDS[expected['model_type']]:
+            assert row[field] == pytest.approx(expected[field], rel=1e-12), (farm, field)
+
+def test_registry_matches_carbon_model(farms):
+    assert_matches_carbon_model(farms)
+
+def test_edge_cases_match_carbon_model():
+    assert_matches_carbon_model(pd.DataFrame([
+        {'farm_id': 'A', 'crop_type': 'Agroforestry', 'area_ha': 1.5, 'establishment_date': '2024-12-31'},
+        {'farm_id': 'B', 'crop_type': 'rice', 'area_ha': 2.0, 'establishment_date': '2015-01-01',
+         'practices': 'AWD, compost|unknown'},
+        {'farm_id': 'C', 'crop_type': 'RICE', 'area_ha': 0.5, 'establishment_date': '2019-06-30'},
+        {'farm_id': 'D', 'crop_type': 'rice', 'area_ha': -1.0, 'establishment_date': '2030-01-01'},
+        {'farm_id': 'E', 'crop_type': 'agroforestry', 'area_ha': 3.0, 'establishment_date': '2020/01/01'},
+    ]))
+
+def test_batch_results_total_matches_per_farm_loop(farms):
+    results, errors = BatchCarbonModel(as_of=AS_OF).process_frame(farms)
+
+    expected = {}
+    for farm in farm_records(farms):
+        farm_errors, calculation = expected_results(farm)
+        if not farm_errors:
+            expected[farm['farm_id']] = calculation['total_credits']
+
+    assert list(results['farm_id']) == list(expected)
+    assert results['calculated_credits'].tolist() == pytest.approx(list(expected.values()), rel=1e-12)
+    assert (errors.map(len) > 0).sum() == len(farms) - len(expected)
+
+def test_report_frame_matches_verification_reports(farms):
+    sample = farms.iloc[:300]
+    reports = BatchCarbonModel(as_of=AS_OF).report_frame(sample)
+
+    for farm, (_, report) in zip(farm_records(sample), reports.iterrows()):
+        model = CarbonModel(model_type=farm['crop_type'].lower(), as_of=AS_OF)
+        errors = model.validation_errors(farm)
+        expected = model.generate_verification_report(farm, {} if errors else model.calculate_credits(farm))
+        assert report['farm_id'] == expected['farm_id']
+        assert report['verification_status'] == expected['verification_status']
+        assert list(report['validation_errors']) == expected['validation_errors']
@@ -0,0 +1,74 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from carbon_calculation.batch_runner import ShardedBatchRunner
+from conftest import AS_OF
+
+CHUNK_SIZE = 300
+
+class Interrupted(Exception):
+    pass
+
+def interrupt_after(monkeypatch, chunks):
+    """Make the runner stop, as if killed, once the given number of chunks is written"""
+    append_results = ShardedBatchRunner.append_results
+
+    def append_then_stop(self, checkpoint, *args):
+        append_results(self, checkpoint, *args)
+        if checkpoint['completed_chunks'] == chunks:
+            raise Interrupted()
+
+    monkeypatch.setattr(ShardedBatchRunner, 'append_results', append_then_stop)
+
+def run(registry_csv, output_path, workers=1):
+    return ShardedBatchRunner(registry_csv, str(output_path), workers=workers,
+                              chunk_size=CHUNK_SIZE, as_of=AS_OF).run()
+
+@pytest.fixture
+def uninterrupted(tmp_path, registry_csv):
+    output_path = tmp_path / 'full.csv'
+    return run(registry_csv, output_path), pd.read_csv(output_path)
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_resume_matches_uninterrupted_run(monkeypatch, tmp_path, registry_csv, uninterrupted, workers):
+    expected_summary, expected = uninterrupted
+    output_path = tmp_path / 'resumed.csv'
+
+    with monkeypatch.context() as patch:
+        interrupt_after(patch, 3)
+        with pytest.raises(Interrupted):
+            run(registry_csv, output_path, workers)
+    with open(f"{output_path}.checkpoint.json") as f:
+        assert json.load(f)['completed_chunks'] == 3
+
+    # A chunk that was half written when the run died
+    with open(output_path, 'a') as f:
+        f.write('farm_99999999,rice,1.0,')
+
+    summary = run(registry_csv, output_path, workers)
+
+    pd.testing.assert_frame_equal(pd.read_csv(output_path), expected)
+    assert summary['completed_chunks'] == expected_summary['completed_chunks']
+    assert summary['farms_loaded'] == expected_summary['farms_loaded']
+    assert summary['farms_skipped'] == expected_summary['farms_skipped']
+    assert summary['total_credits'] == pytest.approx(expected_summary['total_credits'])
+    assert not os.path.exists(f"{output_path}.checkpoint.json")
+
+def test_checkpoint_for_other_input_is_ignored(monkeypatch, tmp_path, registry_csv, farms, uninterrupted):
+    output_path = tmp_path / 'resumed.csv'
+    with monkeypatch.context() as patch:
+        interrupt_after(patch, 2)
+        with pytest.raises(Interrupted):
+            run(registry_csv, output_path)
+
+    # The registry changes between the interrupted run and the next one
+    farms.iloc[::-1].to_csv(registry_csv, index=False)
+    os.utime(registry_csv, (0, 0))
+    run(registry_csv, output_path)
+
+    results = pd.read_csv(output_path)
+    _, expected = uninterrupted
+    assert list(results['farm_id']) == list(expected['farm_id'][::-1])
@@ -0,0 +1,36 @@
+import pytest
+
+from benchmarks.harness import compare_results
+from benchmarks.run_benchmarks import parse_size, run_case
+from benchmarks.suites import BENCHMARKS
+from benchmarks.synthetic import synthetic_boundaries, synthetic_farms
+
+# Smallest useful size of each suite, so every benchmark runs in a fraction of a second
+SMOKE_SIZES = {'carbon': 500, 'ndvi': 256, 'spatial': 100}
+
+@pytest.mark.parametrize('benchmark', BENCHMARKS, ids=lambda benchmark: benchmark.name)
+def test_benchmark_runs(tmp_path, benchmark):
+    settings = {'data_dir': str(tmp_path), 'seed': 0, 'repeat': 1, 'warmup': 0, 'memory': False, 'workers': 1}
+    result = run_case(benchmark.name, SMOKE_SIZES[benchmark.suite], settings)
+
+    assert result['benchmark'] == benchmark.name
+    assert result['seconds_min'] > 0
+    assert result['throughput_per_second'] > 0
+
+def test_synthetic_data_is_reproducible():
+    assert synthetic_farms(1000, seed=5).equals(synthetic_farms(1000, seed=5))
+    assert not synthetic_farms(1000, seed=5).equals(synthetic_farms(1000, seed=6))
+    assert synthetic_boundaries(50, seed=5).geometry.equals(synthetic_boundaries(50, seed=5).geometry)
+    assert synthetic_boundaries(200).is_valid.all()
+
+def test_compare_flags_regressions():
+    def results(*seconds):
+        return {'results': [{'benchmark': f"b{i}", 'size': 10, 'seconds_min': s} for i, s in enumerate(seconds)]}
+
+    rows = compare_results(results(1.0, 1.0, 1.0), results(1.05, 1.2, 0.5), threshold=0.10)
+    assert [row['regression'] for row in rows] == [False, True, False]
+    assert rows[1]['time_ratio'] == pytest.approx(1.2)
+
+@pytest.mark.parametrize('value, size', [('10k', 10000), ('1.5M', 1500000), ('256', 256)])
+def test_parse_size(value, size):
+    assert parse_size(value) == size
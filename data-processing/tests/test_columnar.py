@@ -0,0 +1,98 @@
+import pandas as pd
+import pytest
+
+from carbon_calculation.batch_engine import BatchCarbonModel
+from carbon_calculation.carbon_model import CarbonModel
+from carbon_calculation.columnar import (ReportDataset, csv_to_parquet, iter_farm_chunks, read_farms, report_record,
+                                         typed_farms, typed_results, write_parquet)
+from carbon_calculation.state_store import row_hashes
+from conftest import AS_OF
+
+def assert_same_report(actual, expected):
+    actual, expected = dict(actual), dict(expected)
+    assert actual.pop('calculation_results') == pytest.approx(expected.pop('calculation_results'))
+    assert actual == expected
+
+@pytest.fixture
+def registry_parquet(tmp_path, farms):
+    path = str(tmp_path / 'farms.parquet')
+    write_parquet(typed_farms(farms), path)
+    return path
+
+def test_parquet_registry_gives_csv_results(registry_csv, registry_parquet):
+    engine = BatchCarbonModel(as_of=AS_OF)
+    from_csv, csv_errors = engine.process_frame(read_farms(registry_csv))
+    from_parquet, parquet_errors = engine.process_frame(read_farms(registry_parquet))
+
+    pd.testing.assert_frame_equal(from_parquet.astype({'farm_id': object, 'crop_type': object}),
+                                  from_csv.astype({'farm_id': object, 'crop_type': object}))
+    assert parquet_errors.tolist() == csv_errors.tolist()
+
+def test_parquet_chunks_match_csv_chunks(registry_csv, registry_parquet):
+    csv_chunks = list(iter_farm_chunks(registry_csv, 300, skip_rows=250))
+    parquet_chunks = list(iter_farm_chunks(registry_parquet, 300, skip_rows=250))
+    assert [len(chunk) for chunk in parquet_chunks] == [len(chunk) for chunk in csv_chunks]
+    assert [chunk['farm_id'].iloc[0] for chunk in parquet_chunks] == [chunk['farm_id'].iloc[0] for chunk in csv_chunks]
+
+def test_csv_and_parquet_hash_alike(registry_csv, registry_parquet):
+    assert row_hashes(read_farms(registry_parquet)).equals(row_hashes(read_farms(registry_csv)))
+
+def test_batch_results_round_trip(tmp_path, farms):
+    results, _ = BatchCarbonModel(as_of=AS_OF).process_frame(farms)
+    csv_path, parquet_path = str(tmp_path / 'results.csv'), str(tmp_path / 'results.parquet')
+    results.to_csv(csv_path, index=False)
+
+    assert csv_to_parquet(csv_path, parquet_path, chunk_size=300) == len(results)
+    pd.testing.assert_frame_equal(pd.read_parquet(parquet_path), typed_results(pd.read_csv(csv_path)),
+                                  check_dtype=False, check_categorical=False)
+
+def test_report_dataset_round_trip(tmp_path, farms):
+    dataset = ReportDataset(str(tmp_path / 'reports'))
+    engine = BatchCarbonModel(as_of=AS_OF)
+    dataset.write(engine.report_frame(farms))
+
+    reports = dataset.json_reports(farm_ids=list(farms['farm_id'].iloc[:50]))
+    for farm in farms.iloc[:50].to_dict('records'):
+        model = CarbonModel(farm['crop_type'], as_of=AS_OF)
+        errors = model.validation_errors(farm)
+        expected = model.generate_verification_report(farm, {} if errors else model.calculate_credits(farm))
+        assert_same_report(reports[farm['farm_id']], expected)
+
+def test_replace_keeps_reports_when_a_write_fails(tmp_path, farms):
+    dataset = ReportDataset(str(tmp_path / 'reports'))
+    engine = BatchCarbonModel(as_of=AS_OF)
+    report_date = engine.current_date().strftime('%Y-%m-%d')
+    assert dataset.replace([engine.report_frame(farms)], report_date) == len(farms)
+
+    def failing_frames():
+        yield engine.report_frame(farms.iloc[:10])
+        raise RuntimeError("input went away")
+
+    with pytest.raises(RuntimeError):
+        dataset.replace(failing_frames(), report_date)
+    assert len(dataset.read(report_date=report_date)) == len(farms)
+
+    assert dataset.replace([engine.report_frame(farms.iloc[:10])], report_date) == 10
+    assert len(dataset.read(report_date=report_date)) == 10
+    assert sorted(p.name for p in (tmp_path / 'reports').iterdir()) == [f"report_date={report_date}"]
+
+def test_single_report_record_round_trip(tmp_path, farms):
+    farm = farms[farms['area_ha'] > 0].iloc[0].to_dict()
+    model = CarbonModel(farm['crop_type'], as_of=AS_OF)
+    report = model.generate_verification_report(farm, model.calculate_credits(farm))
+
+    dataset = ReportDataset(str(tmp_path / 'reports'))
+    dataset.write(pd.DataFrame([report_record(report)]))
+    assert_same_report(dataset.json_reports()[farm['farm_id']], report)
+
+def test_latest_write_of_a_report_wins(tmp_path, farms):
+    farm = farms[(farms['crop_type'] == 'agroforestry') & (farms['area_ha'] > 0)].iloc[0].to_dict()
+    model = CarbonModel('agroforestry', as_of=AS_OF)
+    dataset = ReportDataset(str(tmp_path / 'reports'))
+    for area in range(1, 9):
+        edited = dict(farm, area_ha=float(area))
+        report = model.generate_verification_report(edited, model.calculate_credits(edited))
+        dataset.write(pd.DataFrame([report_record(report)]))
+
+    assert len(dataset.read(farm_ids=[farm['farm_id']])) == 8
+    assert_same_report(dataset.json_reports()[farm['farm_id']], report)
@@ -0,0 +1,50 @@
+import geopandas as gpd
+import numpy as np
+import pytest
+from shapely.geometry import Point, Polygon, box
+
+from benchmarks.synthetic import synthetic_boundaries
+from geospatial.farm_boundary import DISTANCE_CRS, FarmBoundaryProcessor
+
+def processor_for(gdf):
+    processor = FarmBoundaryProcessor()
+    processor.gdf = gdf
+    processor.build_index()
+    return processor
+
+def brute_force_nearest(gdf, center, k):
+    projected = gdf.geometry.to_crs(DISTANCE_CRS)
+    center = gpd.GeoSeries([center], crs='EPSG:4326').to_crs(DISTANCE_CRS).iloc[0]
+    distances = projected.distance(center).dropna()
+    return list(gdf.loc[distances.sort_values(kind='stable').index[:k], 'farm_id'])
+
+@pytest.fixture
+def boundaries():
+    return synthetic_boundaries(300, seed=2)
+
+@pytest.mark.parametrize('k', [1, 5, 50])
+def test_nearest_farms_match_brute_force(boundaries, k):
+    center = Point(77.0, 11.0)
+    nearest = processor_for(boundaries).nearest_farms(center, k=k)
+    assert list(nearest['farm_id']) == brute_force_nearest(boundaries, center, k)
+    assert nearest['distance_km'].is_monotonic_increasing
+
+def test_nearest_farms_skip_null_and_empty_geometries():
+    gdf = gpd.GeoDataFrame({'farm_id': ['a', 'null', 'empty', 'b']}, geometry=[
+        box(76.00, 10.00, 76.01, 10.01), None, Polygon(), box(76.05, 10.05, 76.06, 10.06)
+    ], crs='EPSG:4326')
+
+    nearest = processor_for(gdf).nearest_farms(Point(76.0, 10.0), k=3)
+
+    assert list(nearest['farm_id']) == ['a', 'b']
+    assert np.isfinite(nearest['distance_km']).all()
+
+def test_nearest_farms_with_k_above_farm_count(boundaries):
+    farms = boundaries.iloc[:4]
+    center = Point(70.0, 5.0)
+    nearest = processor_for(farms).nearest_farms(center, k=10)
+    assert list(nearest['farm_id']) == brute_force_nearest(farms, center, 4)
+
+def test_nearest_farms_with_only_null_geometries():
+    gdf = gpd.GeoDataFrame({'farm_id': ['null']}, geometry=[None], crs='EPSG:4326')
+    assert processor_for(gdf).nearest_farms(Point(76.0, 10.0), k=3).empty
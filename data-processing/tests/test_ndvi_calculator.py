@@ -0,0 +1,62 @@
+import math
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from satellite.ndvi_calculator import NDVICalculator
+
+def write_band(path, values, nodata=None):
+    profile = {'driver': 'GTiff', 'width': values.shape[1], 'height': values.shape[0], 'count': 1,
+               'dtype': values.dtype.name, 'crs': 'EPSG:4326', 'nodata': nodata,
+               'transform': from_origin(76.0, 10.0, 0.001, 0.001)}
+    with rasterio.open(path, 'w', **profile) as dst:
+        dst.write(values, 1)
+    return str(path)
+
+def make_bands(tmp_path, size=300):
+    rng = np.random.default_rng(0)
+    red = rng.integers(100, 3000, (size, size)).astype(np.uint16)
+    nir = rng.integers(100, 5000, (size, size)).astype(np.uint16)
+    red[:10] = 0  # outside the scene footprint in both bands
+    nir[:10] = 0
+    red[50, :] = 0  # red nodata only
+    with np.errstate(invalid='ignore'):
+        expected = (nir.astype(float) - red) / (nir.astype(float) + red)
+    masked = np.zeros(red.shape, dtype=bool)
+    masked[:10] = True
+    masked[50, :] = True
+    return (write_band(tmp_path / 'red.tif', red, nodata=0), write_band(tmp_path / 'nir.tif', nir, nodata=0),
+            expected, masked)
+
+def test_geotiff_marks_masked_pixels_as_nodata(tmp_path):
+    red_path, nir_path, expected, masked = make_bands(tmp_path)
+    output_path = str(tmp_path / 'ndvi.tif')
+    assert NDVICalculator(red_path, nir_path).save_ndvi_geotiff(output_path)
+
+    with rasterio.open(output_path) as src:
+        assert math.isnan(src.nodata)
+        ndvi = src.read(1)
+        valid = src.read_masks(1) > 0
+
+    np.testing.assert_array_equal(valid, ~masked)
+    assert np.isnan(ndvi[masked]).all()
+    np.testing.assert_allclose(ndvi[~masked], expected[~masked], rtol=1e-6)
+
+def test_statistics_exclude_masked_pixels(tmp_path):
+    red_path, nir_path, expected, masked = make_bands(tmp_path)
+    stats, preview = NDVICalculator(red_path, nir_path).process_scene()
+
+    assert stats['count'] == (~masked).sum()
+    assert math.isclose(stats['mean'], expected[~masked].mean(), rel_tol=1e-6)
+    assert np.isnan(preview[:10]).all()
+
+def test_zero_sum_pixels_are_masked_without_band_nodata(tmp_path):
+    red = np.full((20, 20), 200, dtype=np.uint16)
+    nir = np.full((20, 20), 600, dtype=np.uint16)
+    red[5, 5] = nir[5, 5] = 0
+    ndvi = NDVICalculator(write_band(tmp_path / 'red.tif', red), write_band(tmp_path / 'nir.tif', nir)).calculate_ndvi()
+
+    assert np.isnan(ndvi[5, 5])
+    assert np.isfinite(ndvi).sum() == red.size - 1
+    np.testing.assert_allclose(ndvi[0, 0], 0.5)
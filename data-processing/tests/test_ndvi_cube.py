@@ -0,0 +1,95 @@
+import os
+
+import geopandas as gpd
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+from shapely.geometry import box
+
+from satellite import ndvi_cube
+from satellite.ndvi_cube import NDVICube, fill_slab
+
+SIZE = 32
+TRANSFORM = from_origin(76.0, 10.032, 0.001, 0.001)
+
+def write_scene(directory, name, red_value, nir_value, transform=TRANSFORM, crs='EPSG:4326'):
+    """Constant red and NIR bands, so every pixel's NDVI is known"""
+    paths = []
+    for band, value in (('red', red_value), ('nir', nir_value)):
+        path = str(directory / f"{name}_{band}.tif")
+        profile = {'driver': 'GTiff', 'width': SIZE, 'height': SIZE, 'count': 1, 'dtype': 'uint16',
+                   'crs': crs, 'transform': transform}
+        with rasterio.open(path, 'w', **profile) as dst:
+            dst.write(np.full((SIZE, SIZE), value, dtype=np.uint16), 1)
+        paths.append(path)
+    return tuple(paths)
+
+@pytest.fixture
+def cube(tmp_path):
+    red, _ = write_scene(tmp_path, 'reference', 1000, 3000)
+    return NDVICube.create(str(tmp_path / 'cube'), red)
+
+def test_add_dates_and_seasonal_max(tmp_path, cube):
+    scenes = [('2024-06-01', *write_scene(tmp_path, 'june', 1000, 3000)),
+              ('2024-07-01', *write_scene(tmp_path, 'july', 1000, 1000))]
+    assert cube.add_dates(scenes) == 2
+
+    result = NDVICube(cube.cube_dir).seasonal_max()
+    assert np.allclose(result, 0.5)
+
+@pytest.mark.parametrize('scene_options', [
+    {'transform': from_origin(76.5, 10.032, 0.001, 0.001)},
+    {'transform': from_origin(76.0, 10.032, 0.002, 0.002)},
+    {'crs': 'EPSG:32643'},
+], ids=['shifted', 'resolution', 'crs'])
+def test_scene_on_another_grid_is_rejected(tmp_path, cube, scene_options):
+    scene = ('2024-06-01', *write_scene(tmp_path, 'other', 1000, 3000, **scene_options))
+    with pytest.raises(ValueError):
+        cube.add_dates([scene])
+    assert NDVICube(cube.cube_dir).meta['dates'] == []
+
+def test_recomputed_date_replaces_its_slab(tmp_path, cube):
+    cube.add_dates([('2024-06-01', *write_scene(tmp_path, 'first', 1000, 3000)),
+                    ('2024-07-01', *write_scene(tmp_path, 'july', 1000, 1000))])
+    assert cube.add_dates([('2024-06-01', *write_scene(tmp_path, 'second', 1000, 1000))]) == 1
+
+    reopened = NDVICube(cube.cube_dir)
+    assert list(reopened.meta['dates']) == ['2024-06-01', '2024-07-01']
+    assert np.allclose(reopened.pixel_series(0, 0), 0.0)
+    assert not any(name.endswith('.tmp') for name in os.listdir(cube.cube_dir))
+
+def test_interrupted_recompute_keeps_existing_cube(monkeypatch, tmp_path, cube):
+    cube.add_dates([('2024-06-01', *write_scene(tmp_path, 'first', 1000, 3000))])
+
+    def fill_then_fail(data_path, *args):
+        fill_slab(data_path, *args)
+        raise KeyboardInterrupt()
+
+    monkeypatch.setattr(ndvi_cube, 'fill_slab', fill_then_fail)
+    with pytest.raises(KeyboardInterrupt):
+        cube.add_dates([('2024-06-01', *write_scene(tmp_path, 'second', 1000, 1000))])
+
+    assert np.allclose(NDVICube(cube.cube_dir).pixel_series(0, 0), 0.5)
+
+# Casting NaN to int8 is undefined, so the map must never see one
+@pytest.mark.filterwarnings('error:invalid value encountered in cast')
+def test_change_without_data_is_no_change(tmp_path, cube):
+    cube.add_dates([('2024-06-01', *write_scene(tmp_path, 'empty', 0, 0)),
+                    ('2024-07-01', *write_scene(tmp_path, 'july', 1000, 3000))])
+
+    with pytest.warns(RuntimeWarning, match='Mean of empty slice'):
+        result = cube.change(('2024-06-01', '2024-06-30'), ('2024-07-01', '2024-07-31'), threshold=0.1)
+    assert result.dtype == np.int8
+    assert (result == 0).all()
+
+def test_farm_series(tmp_path, cube):
+    cube.add_dates([('2024-06-01', *write_scene(tmp_path, 'june', 1000, 3000)),
+                    ('2024-07-01', *write_scene(tmp_path, 'july', 1000, 1000))])
+    gdf = gpd.GeoDataFrame({'farm_id': ['inside', 'outside']}, geometry=[
+        box(76.005, 10.005, 76.015, 10.015), box(77.0, 11.0, 77.01, 11.01)], crs='EPSG:4326')
+
+    series = cube.farm_series(gdf)
+
+    assert np.allclose(series.loc['inside'], [0.5, 0.0])
+    assert series.loc['outside'].isna().all()
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from satellite.ndvi_stats import HISTOGRAM_BINS, NDVI_RANGE, GroupedNDVIStatsAccumulator, NDVIStatsAccumulator
+
+BIN_WIDTH = (NDVI_RANGE[1] - NDVI_RANGE[0]) / HISTOGRAM_BINS
+
+@pytest.fixture
+def ndvi():
+    rng = np.random.default_rng(0)
+    values = np.clip(rng.normal(0.4, 0.25, (1000, 700)), -1, 1).astype(np.float32)
+    values[rng.random(values.shape) < 0.05] = np.nan
+    return values
+
+def test_blockwise_statistics_match_whole_array(ndvi):
+    stats = NDVIStatsAccumulator()
+    for rows in range(0, ndvi.shape[0], 97):
+        stats.update(ndvi[rows:rows + 97])
+    result = stats.result()
+
+    values = ndvi[np.isfinite(ndvi)].astype(np.float64)
+    assert result['count'] == values.size
+    assert result['mean'] == pytest.approx(values.mean(), rel=1e-9)
+    assert result['std'] == pytest.approx(values.std(), rel=1e-9)
+    assert (result['min'], result['max']) == (values.min(), values.max())
+    assert result['median'] == pytest.approx(np.median(values), abs=BIN_WIDTH)
+    for name, value in result['percentiles'].items():
+        assert value == pytest.approx(np.percentile(values, float(name[1:])), abs=BIN_WIDTH)
+
+def test_all_nan_blocks_have_no_statistics():
+    stats = NDVIStatsAccumulator()
+    stats.update(np.full((10, 10), np.nan, dtype=np.float32))
+    assert stats.result() is None
+
+def test_grouped_statistics_match_per_group(ndvi):
+    labels = np.random.default_rng(1).integers(0, 6, ndvi.shape)
+    stats = GroupedNDVIStatsAccumulator(5)
+    for rows in range(0, ndvi.shape[0], 128):
+        stats.update(ndvi[rows:rows + 128], labels[rows:rows + 128])
+    result = stats.result()
+
+    for group in range(1, 6):
+        values = ndvi[(labels == group) & np.isfinite(ndvi)].astype(np.float64)
+        i = group - 1
+        assert result['pixel_count'][i] == values.size
+        assert result['ndvi_mean'][i] == pytest.approx(values.mean(), rel=1e-9)
+        assert result['ndvi_std'][i] == pytest.approx(values.std(), rel=1e-6)
+        assert result['ndvi_median'][i] == pytest.approx(np.median(values), abs=0.01)
@@ -0,0 +1,68 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from carbon_calculation.carbon_model import CarbonModel
+from carbon_calculation.projection import CreditProjection, export_projection, period_credits
+from conftest import AS_OF
+
+def test_cumulative_credits_match_carbon_model(farms):
+    projection = CreditProjection(as_of=AS_OF)
+    projected, ages, cumulative = projection.project(farms)
+    assert np.allclose(period_credits(cumulative).sum(axis=1), cumulative[:, -1])
+
+    # Four years of 365.25 days are a whole number of days, so CarbonModel sees the same project age
+    year = 4
+    assert ages[year - 1] == year
+    records = farms.set_index('farm_id').loc[projected['farm_id']].reset_index().to_dict('records')
+    for farm, credits in zip(records[:200], cumulative[:200, year - 1]):
+        as_of = pd.Timestamp(farm['establishment_date']) + timedelta(days=year * 365.25)
+        expected = CarbonModel(farm['crop_type'], as_of=as_of.to_pydatetime()).calculate_credits(farm)
+        assert credits == pytest.approx(expected['total_credits'])
+
+def test_export_totals_match_projection(tmp_path, registry_csv, farms):
+    projection = CreditProjection(as_of=AS_OF)
+    _, _, cumulative = projection.project(farms)
+
+    output_path = str(tmp_path / 'projection.parquet')
+    assert export_projection(projection.iter_chunks(registry_csv, chunk_size=300), output_path) == len(cumulative)
+    table = pd.read_parquet(output_path)
+    assert table['period_credits'].sum() == pytest.approx(cumulative[:, -1].sum())
+    assert table.groupby('farm_id', observed=True)['period'].count().eq(projection.horizon_years).all()
+
+def test_duplicate_farm_ids_are_exported(tmp_path, farms):
+    registry = pd.concat([farms.iloc[:10], farms.iloc[:10]], ignore_index=True)
+    registry_path = tmp_path / 'duplicates.csv'
+    registry.to_csv(registry_path, index=False)
+
+    output_path = str(tmp_path / 'projection.parquet')
+    projection = CreditProjection(as_of=AS_OF)
+    farms_written = export_projection(projection.iter_chunks(str(registry_path)), output_path)
+    assert farms_written == 2 * len(projection.project(farms.iloc[:10])[0])
+
+def test_calendar_chunks_share_one_grid(tmp_path, farms):
+    # Sorted by date, every chunk spans a different range of establishment dates
+    registry_csv = str(tmp_path / 'sorted.csv')
+    farms.sort_values('establishment_date').to_csv(registry_csv, index=False)
+    projection = CreditProjection(calendar=True, as_of=AS_OF)
+    chunked_path, whole_path = str(tmp_path / 'chunked.parquet'), str(tmp_path / 'whole.parquet')
+    axes = [axis for _, axis, _ in projection.iter_chunks(registry_csv, chunk_size=300)]
+    assert all(np.array_equal(axis, axes[0]) for axis in axes)
+
+    export_projection(projection.iter_chunks(registry_csv, chunk_size=300), chunked_path, calendar=True)
+    export_projection(projection.iter_chunks(registry_csv, chunk_size=100000), whole_path, calendar=True)
+    pd.testing.assert_frame_equal(pd.read_parquet(chunked_path), pd.read_parquet(whole_path),
+                                  check_categorical=False)
+
+def test_blank_tree_count_means_no_trees(farms):
+    agroforestry = farms.index[farms['crop_type'] == 'agroforestry'][:20]
+    blank, zero = farms.copy(), farms.copy()
+    blank.loc[agroforestry, 'tree_count'] = np.nan
+    zero.loc[agroforestry, 'tree_count'] = 0
+
+    projection = CreditProjection(as_of=AS_OF)
+    _, _, cumulative = projection.project(blank)
+    assert np.isfinite(cumulative).all()
+    np.testing.assert_array_equal(cumulative, projection.project(zero)[2])
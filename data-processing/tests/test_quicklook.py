@@ -0,0 +1,32 @@
+import os
+
+import geopandas as gpd
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from shapely.geometry import box
+
+from satellite.quicklook import render_farm_quicklooks
+
+def write_ndvi(path, size=64):
+    """A small NDVI GeoTIFF over (76.0, 10.0) with 0.001 degree pixels"""
+    ndvi = np.linspace(-1, 1, size * size, dtype=np.float32).reshape(size, size)
+    profile = {'driver': 'GTiff', 'width': size, 'height': size, 'count': 1, 'dtype': 'float32',
+               'crs': 'EPSG:4326', 'transform': from_origin(76.0, 10.064, 0.001, 0.001)}
+    with rasterio.open(path, 'w', **profile) as dst:
+        dst.write(ndvi, 1)
+    return path
+
+def test_farms_outside_the_raster_are_skipped(tmp_path, capsys):
+    geotiff_path = write_ndvi(str(tmp_path / 'ndvi.tif'))
+    gdf = gpd.GeoDataFrame({'farm_id': ['inside', 'outside', 'edge']}, geometry=[
+        box(76.010, 10.010, 76.020, 10.020),
+        box(80.0, 12.0, 80.01, 12.01),
+        box(76.060, 10.060, 76.080, 10.080),
+    ], crs='EPSG:4326')
+
+    paths = render_farm_quicklooks(geotiff_path, gdf, str(tmp_path / 'quicklooks'))
+
+    assert sorted(paths) == ['edge', 'inside']
+    assert all(os.path.exists(path) for path in paths.values())
+    assert 'Skipping farm outside' in capsys.readouterr().out
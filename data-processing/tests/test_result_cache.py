@@ -0,0 +1,62 @@
+import os
+
+import pandas as pd
+import pytest
+
+from benchmarks.suites import batch_args
+from carbon_calculation.batch_engine import BatchCarbonModel
+from carbon_calculation.result_cache import ResultCache
+from conftest import AS_OF
+from main import process_batch_farms
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / 'cache'))
+
+def cache_files(cache):
+    return sorted(name for _, _, names in os.walk(cache.cache_dir) for name in names)
+
+def run_batch(tmp_path, registry_csv, cache_dir, name, **overrides):
+    args = batch_args(registry_csv, str(tmp_path / name), as_of=AS_OF, cache_dir=cache_dir, **overrides)
+    return pd.read_csv(process_batch_farms(args))
+
+@pytest.mark.parametrize('overrides', [{}, {'chunk_size': 300}], ids=['in-memory', 'sharded'])
+def test_cache_hit_reproduces_results(tmp_path, registry_csv, cache, overrides):
+    first = run_batch(tmp_path, registry_csv, cache.cache_dir, 'first', **overrides)
+    entries = cache_files(cache)
+    assert entries and all(name.endswith('.parquet') for name in entries)
+
+    second = run_batch(tmp_path, registry_csv, cache.cache_dir, 'second', **overrides)
+    pd.testing.assert_frame_equal(first, second)
+    assert cache_files(cache) == entries
+
+def test_frame_key_invalidation(cache, farms):
+    parameters = BatchCarbonModel().parameters
+    key = cache.frame_key(farms, parameters, AS_OF)
+
+    edited = farms.copy()
+    edited.loc[0, 'area_ha'] += 1
+    assert cache.frame_key(edited, parameters, AS_OF) != key
+    assert cache.frame_key(farms, parameters, '2025-06-01') != key
+
+    changed = {**parameters, 'rice': {**parameters['rice'], 'baseline_emissions': 3.3}}
+    assert cache.frame_key(farms, changed, AS_OF) != key
+
+def test_frame_key_ignores_dtypes(cache, farms):
+    parameters = BatchCarbonModel().parameters
+    retyped = farms.assign(tree_count=farms['tree_count'].astype(float))
+    assert cache.frame_key(retyped, parameters, AS_OF) == cache.frame_key(farms, parameters, AS_OF)
+
+def test_frame_round_trip(cache, farms):
+    results, _ = BatchCarbonModel(as_of=AS_OF).process_frame(farms)
+    assert cache.get_frame('0' * 64) is None
+
+    cache.put_frame('0' * 64, results)
+    pd.testing.assert_frame_equal(cache.get_frame('0' * 64), results)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_json_round_trip(cache):
+    key = cache.farm_key({'farm_id': 'F1', 'area_ha': 2.0}, {}, AS_OF)
+    assert cache.get_json(key) is None
+    cache.put_json(key, {'total_credits': 1.5})
+    assert cache.get_json(key) == {'total_credits': 1.5}
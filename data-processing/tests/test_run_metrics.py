@@ -0,0 +1,55 @@
+import json
+import sys
+
+import pytest
+
+import main
+from conftest import AS_OF
+from instrumentation.metrics import NullMetrics, metrics
+
+def run_cli(monkeypatch, *argv):
+    monkeypatch.setattr(sys, 'argv', ['main.py', *argv])
+    main.main()
+
+def load_summary(output_dir):
+    with open(output_dir / 'run_metrics.json') as f:
+        return json.load(f)
+
+@pytest.mark.parametrize('options', [[], ['--chunk-size', '500'], ['--chunk-size', '500', '--workers', '2']],
+                         ids=['in-memory', 'sharded-in-process', 'sharded-pool'])
+def test_batch_run_metrics(monkeypatch, tmp_path, registry_csv, farms, options):
+    output_dir = tmp_path / 'out'
+    run_cli(monkeypatch, 'batch', '--input-file', registry_csv, '--output-dir', str(output_dir),
+            '--as-of', AS_OF, *options)
+
+    summary = load_summary(output_dir)
+    assert summary['command'] == 'batch'
+    assert {'batch.read', 'carbon.validate', 'carbon.calculate', 'batch.write'} <= set(summary['stages'])
+    assert summary['stages']['batch.read']['items'] == len(farms)
+    assert summary['stages']['carbon.validate']['items'] == len(farms)
+
+    invalid = summary['counters']['farms.invalid']
+    assert summary['counters']['farms.processed'] == len(farms)
+    assert 0 < invalid < len(farms)
+    assert summary['stages']['batch.write']['items'] == len(farms) - invalid
+    assert sum(value for name, value in summary['counters'].items()
+               if name.startswith('validation_failures.')) >= invalid
+    assert summary['memory']['peak_rss_bytes'] > 0
+
+def test_run_is_finished_after_command(monkeypatch, tmp_path, registry_csv):
+    run_cli(monkeypatch, 'batch', '--input-file', registry_csv, '--output-dir', str(tmp_path), '--as-of', AS_OF)
+    assert isinstance(metrics(), NullMetrics)
+
+def test_metrics_file_and_trace(monkeypatch, tmp_path, registry_csv):
+    metrics_path, trace_path = tmp_path / 'metrics.json', tmp_path / 'trace.json'
+    run_cli(monkeypatch, 'batch', '--input-file', registry_csv, '--output-dir', str(tmp_path / 'out'),
+            '--as-of', AS_OF, '--chunk-size', '500', '--metrics-file', str(metrics_path),
+            '--trace', str(trace_path), '--trace-memory')
+
+    assert not (tmp_path / 'out' / 'run_metrics.json').exists()
+    summary = json.loads(metrics_path.read_text())
+    assert summary['memory']['traced_peak_bytes'] > 0
+
+    events = json.loads(trace_path.read_text())['traceEvents']
+    assert len([event for event in events if event['name'] == 'batch.read']) == 4
+    assert all(event['ph'] == 'X' and event['dur'] >= 0 for event in events)
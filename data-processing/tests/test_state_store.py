@@ -0,0 +1,102 @@
+import sys
+
+import pandas as pd
+import pytest
+
+import main
+from carbon_calculation.batch_engine import BatchCarbonModel
+from carbon_calculation.state_store import FarmStateStore, row_hashes
+from conftest import AS_OF
+
+def change_counts(changes):
+    counts = changes['change'].value_counts()
+    return {change: int(counts.get(change, 0)) for change in ['added', 'changed', 'deleted', 'invalid']}
+
+@pytest.fixture
+def store(tmp_path):
+    store = FarmStateStore(str(tmp_path / 'state.db'), as_of=AS_OF)
+    store.reset_if_stale()
+    yield store
+    store.close()
+
+def valid_total(farms):
+    results, _ = BatchCarbonModel(as_of=AS_OF).process_frame(farms)
+    return len(results), results['calculated_credits'].sum()
+
+def test_snapshot_add_change_delete(store, farms):
+    first = change_counts(store.apply_snapshot(farms))
+    assert first['added'] + first['invalid'] == len(farms)
+    assert first['changed'] == first['deleted'] == 0
+
+    assert change_counts(store.apply_snapshot(farms)) == {'added': 0, 'changed': 0, 'deleted': 0, 'invalid': 0}
+
+    edited = farms.copy()
+    row = edited.index[edited['area_ha'] > 0][0]
+    edited.loc[row, 'area_ha'] += 1.0
+    edited = edited.drop(edited.index[-3:])
+    new_farm = farms.iloc[[row]].assign(farm_id='new_farm')
+    edited = pd.concat([edited, new_farm], ignore_index=True)
+
+    counts = change_counts(store.apply_snapshot(edited))
+    assert counts == {'added': 1, 'changed': 1, 'deleted': 3, 'invalid': 0}
+
+    farm_count, total_credits = valid_total(edited)
+    assert store.totals()['farm_count'] == farm_count
+    assert store.totals()['total_credits'] == pytest.approx(total_credits)
+
+def test_delta_operations(store, farms):
+    store.apply_snapshot(farms)
+    delta = farms.iloc[:2].assign(operation=['upsert', 'delete'])
+    delta.loc[delta.index[0], 'tree_count'] += 10
+
+    counts = change_counts(store.apply_delta(delta))
+    assert counts['deleted'] == 1
+    assert counts['changed'] + counts['invalid'] == 1
+
+def test_one_blank_cell_changes_one_farm(store, farms):
+    """A blank tree_count turns the column float64; unchanged farms must keep their hashes"""
+    store.apply_snapshot(farms)
+    edited = farms.copy()
+    row = edited.index[(edited['crop_type'] == 'agroforestry') & (edited['area_ha'] > 0)][0]
+    edited['tree_count'] = edited['tree_count'].astype(object)
+    edited.loc[row, 'tree_count'] = None
+    edited['tree_count'] = edited['tree_count'].astype(float)
+
+    assert change_counts(store.apply_snapshot(edited)) == {'added': 0, 'changed': 1, 'deleted': 0, 'invalid': 0}
+
+def test_row_hashes_ignore_dtypes_and_column_order(farms):
+    reference = row_hashes(farms)
+    retyped = farms.assign(tree_count=farms['tree_count'].astype(float), area_ha=farms['area_ha'].astype(str))
+    assert row_hashes(retyped).equals(reference)
+    assert row_hashes(farms[farms.columns[::-1]]).equals(reference)
+
+def run_incremental(monkeypatch, registry_csv, output_dir, state_db, as_of):
+    monkeypatch.setattr(sys, 'argv', ['main.py', 'batch', '--input-file', registry_csv, '--output-dir', str(output_dir),
+                                      '--state-db', state_db, '--as-of', as_of])
+    main.main()
+    return change_counts(pd.read_csv(output_dir / 'batch_changes.csv'))
+
+def test_reporting_date_decides_between_incremental_and_full_runs(monkeypatch, capsys, tmp_path, registry_csv, farms):
+    state_db = str(tmp_path / 'state.db')
+    first = run_incremental(monkeypatch, registry_csv, tmp_path / 'first', state_db, AS_OF)
+    assert first['added'] + first['invalid'] == len(farms)
+
+    # Nightly runs for the same reporting period only see the farms that changed
+    edited = farms.copy()
+    edited.loc[edited.index[edited['area_ha'] > 0][0], 'area_ha'] += 1.0
+    edited.to_csv(registry_csv, index=False)
+    capsys.readouterr()
+    assert run_incremental(monkeypatch, registry_csv, tmp_path / 'nightly', state_db, AS_OF) == \
+        {'added': 0, 'changed': 1, 'deleted': 0, 'invalid': 0}
+    assert 'recalculating all farms' not in capsys.readouterr().out
+
+    # A new reporting date ages every farm, so every farm is recalculated once
+    next_period = run_incremental(monkeypatch, registry_csv, tmp_path / 'next', state_db, '2025-12-31')
+    assert next_period['added'] + next_period['invalid'] == len(farms)
+    assert f"results as of {AS_OF}; recalculating all farms as of 2025-12-31" in capsys.readouterr().out
+
+    store = FarmStateStore(state_db, as_of='2025-12-31')
+    results, _ = BatchCarbonModel(as_of='2025-12-31').process_frame(edited)
+    assert store.stored_as_of() == '2025-12-31'
+    assert store.totals()['total_credits'] == pytest.approx(results['calculated_credits'].sum())
+    store.close()
@@ -0,0 +1,75 @@
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import main
+from carbon_calculation.batch_engine import BatchCarbonModel
+from conftest import AS_OF
+
+def run_uncertainty(monkeypatch, registry_csv, output_dir, *options):
+    monkeypatch.setattr(sys, 'argv', ['main.py', 'uncertainty', '--input-file', registry_csv,
+                                      '--output-dir', str(output_dir), '--draws', '200',
+                                      '--chunk-size', '700', '--as-of', AS_OF, *options])
+    main.main()
+    with open(output_dir / 'carbon_report_portfolio.json') as f:
+        return json.load(f)
+
+def test_portfolio_percentiles_reach_report(monkeypatch, tmp_path, registry_csv, farms):
+    report = run_uncertainty(monkeypatch, registry_csv, tmp_path)
+    with open(tmp_path / 'uncertainty_portfolio.json') as f:
+        portfolio = json.load(f)
+
+    results, _ = BatchCarbonModel(as_of=AS_OF).process_frame(farms)
+    assert report['uncertainty'] == portfolio
+    assert report['farm_count'] == len(results)
+    assert report['verification_status'] == 'ready_for_verification'
+    assert report['calculation_results']['total_credits'] == pytest.approx(results['calculated_credits'].sum())
+
+    percentiles = report['uncertainty']['percentiles']
+    assert list(percentiles) == ['p5', 'p50', 'p95']
+    assert percentiles['p5'] < percentiles['p50'] < percentiles['p95']
+
+    farm_summaries = pd.read_csv(tmp_path / 'uncertainty_farms.csv')
+    assert len(farm_summaries) == len(results)
+    assert (farm_summaries['p5'] <= farm_summaries['p95']).all()
+
+def test_pooled_run_matches_in_process(monkeypatch, tmp_path, registry_csv):
+    in_process = run_uncertainty(monkeypatch, registry_csv, tmp_path / 'single')
+    pooled = run_uncertainty(monkeypatch, registry_csv, tmp_path / 'pooled', '--workers', '2')
+    assert pooled['farm_count'] == in_process['farm_count']
+    assert pooled['uncertainty']['mean'] == pytest.approx(in_process['uncertainty']['mean'])
+    assert pooled['uncertainty']['percentiles'] == pytest.approx(in_process['uncertainty']['percentiles'])
+
+def test_blank_tree_count_keeps_portfolio_finite(monkeypatch, tmp_path, farms):
+    agroforestry = farms.index[farms['crop_type'] == 'agroforestry'][:20]
+    blank, zero = farms.copy(), farms.copy()
+    blank.loc[agroforestry, 'tree_count'] = np.nan
+    zero.loc[agroforestry, 'tree_count'] = 0
+    blank.to_csv(tmp_path / 'blank.csv', index=False)
+    zero.to_csv(tmp_path / 'zero.csv', index=False)
+
+    report = run_uncertainty(monkeypatch, str(tmp_path / 'blank.csv'), tmp_path / 'blank')
+    expected = run_uncertainty(monkeypatch, str(tmp_path / 'zero.csv'), tmp_path / 'zero')
+
+    for name in ['uncertainty_portfolio.json', 'carbon_report_portfolio.json']:
+        assert 'NaN' not in (tmp_path / 'blank' / name).read_text()
+    assert report['uncertainty']['percentiles'] == expected['uncertainty']['percentiles']
+    assert report['uncertainty']['mean'] == expected['uncertainty']['mean']
+
+def test_farm_report_includes_percentiles(monkeypatch, tmp_path, farms):
+    farm = farms[farms['crop_type'] == 'rice'].iloc[0].dropna().to_dict()
+    farm_path = tmp_path / 'farm.json'
+    farm_path.write_text(json.dumps(farm, default=str))
+
+    monkeypatch.setattr(sys, 'argv', ['main.py', 'carbon', '--farm-id', 'F1', '--farm-data', str(farm_path),
+                                      '--output-dir', str(tmp_path), '--as-of', AS_OF,
+                                      '--uncertainty-draws', '200'])
+    main.main()
+    with open(tmp_path / 'carbon_report_F1.json') as f:
+        report = json.load(f)
+
+    assert report['uncertainty']['draws'] == 200
+    assert set(report['uncertainty']['percentiles']) == {'p5', 'p50', 'p95'}
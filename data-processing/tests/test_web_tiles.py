@@ -0,0 +1,77 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+import shapely
+
+from benchmarks.synthetic import synthetic_boundaries
+from geospatial.web_tiles import MANIFEST_FILE, WebTileExporter
+
+REGION = (76.0, 10.0, 76.2, 10.2)
+
+def tile_files(output_dir):
+    """Contents of every tile file, keyed by z/x/y path"""
+    tiles = {}
+    for root, _, names in os.walk(output_dir):
+        for name in names:
+            if name != MANIFEST_FILE:
+                path = os.path.join(root, name)
+                with open(path) as f:
+                    tiles[os.path.relpath(path, output_dir)] = f.read()
+    return tiles
+
+def edited(gdf):
+    """The boundary layer after farms are added, reshaped, moved, relabelled and removed"""
+    gdf = gdf.drop(index=gdf.index[:20]).copy()
+    gdf.loc[gdf.index[:10], 'geometry'] = gdf.geometry.iloc[:10].scale(1.5, 1.5)
+    gdf.loc[gdf.index[10:15], 'geometry'] = gdf.geometry.iloc[10:15].translate(0.05, -0.05)
+    gdf.loc[gdf.index[15:20], 'crop_type'] = 'rice_edited'
+    added = synthetic_boundaries(30, bounds=REGION, seed=2)
+    added['farm_id'] = [f"new_{i}" for i in range(len(added))]
+    return pd.concat([gdf, added], ignore_index=True)
+
+@pytest.fixture
+def boundaries():
+    return synthetic_boundaries(400, bounds=REGION, seed=1)
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_incremental_export_matches_full_rebuild(tmp_path, boundaries, workers):
+    incremental = WebTileExporter(str(tmp_path / 'incremental'), min_zoom=8, max_zoom=14, workers=workers)
+    full_count = incremental.export(boundaries)
+    updated = edited(boundaries)
+    written = incremental.export(updated)
+
+    rebuild_dir = str(tmp_path / 'rebuild')
+    WebTileExporter(rebuild_dir, min_zoom=8, max_zoom=14).export(updated)
+
+    assert 0 < written < full_count
+    assert tile_files(incremental.output_dir) == tile_files(rebuild_dir)
+
+    with open(os.path.join(incremental.output_dir, MANIFEST_FILE)) as f:
+        farms = json.load(f)['farms']
+    assert set(farms) == set(updated['farm_id'])
+
+def test_unchanged_export_writes_nothing(tmp_path, boundaries):
+    exporter = WebTileExporter(str(tmp_path), min_zoom=8, max_zoom=12)
+    exporter.export(boundaries)
+    tiles = tile_files(str(tmp_path))
+    assert exporter.export(boundaries) == 0
+    assert tile_files(str(tmp_path)) == tiles
+
+def test_removing_every_farm_clears_tiles(tmp_path, boundaries):
+    exporter = WebTileExporter(str(tmp_path), min_zoom=8, max_zoom=12)
+    exporter.export(boundaries)
+    exporter.export(boundaries.iloc[:0])
+    assert tile_files(str(tmp_path)) == {}
+
+def test_tiles_keep_every_farm(tmp_path, boundaries):
+    exporter = WebTileExporter(str(tmp_path), min_zoom=14, max_zoom=14)
+    exporter.export(boundaries)
+
+    ids = set()
+    for content in tile_files(str(tmp_path)).values():
+        for feature in json.loads(content)['features']:
+            ids.add(feature['properties']['farm_id'])
+            assert shapely.from_geojson(json.dumps(feature['geometry'])).is_valid
+    assert ids == set(boundaries['farm_id'])
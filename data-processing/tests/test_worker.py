@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from carbon_calculation.worker import VECTORIZE_MIN_BATCH, CalculationWorker
+
+AS_OF = '2025-01-01'
+
+FARM = {'farm_id': 'F1', 'crop_type': 'agroforestry', 'area_ha': 2.0, 'tree_count': 150,
+        'establishment_date': '2020-03-15'}
+
+EDGE_CASES = [
+    dict(FARM),
+    {key: value for key, value in FARM.items() if key != 'tree_count'},
+    {**FARM, 'tree_count': None},
+    {**FARM, 'area_ha': '2.0'},
+    {**FARM, 'area_ha': None},
+    {**FARM, 'area_ha': float('nan')},
+    {**FARM, 'area_ha': True},
+    {**FARM, 'area_ha': 0},
+    {**FARM, 'establishment_date': 20200315},
+    {**FARM, 'establishment_date': '2020-3-5'},
+    {**FARM, 'establishment_date': '15/03/2020'},
+    {**FARM, 'establishment_date': '2030-01-01'},
+    {key: value for key, value in FARM.items() if key != 'area_ha'},
+    {**FARM, 'crop_type': 'Rice', 'practices': 'AWD;compost'},
+    {**FARM, 'crop_type': 'rice', 'practices': ['AWD', 'cover_crop']},
+    {**FARM, 'crop_type': 'rice', 'practices': None},
+    {**FARM, 'crop_type': 'rice', 'practices': 7},
+    {**FARM, 'crop_type': 'wheat'},
+    {**FARM, 'crop_type': None},
+]
+
+def responses(worker, farms):
+    """Responses for farms sent as one batch, as the client receives them"""
+    replies = []
+    worker.process_batch([({'id': i, 'farm_data': farm}, replies.append) for i, farm in enumerate(farms)])
+    return sorted(replies, key=lambda reply: reply['id'])
+
+@pytest.fixture
+def worker():
+    return CalculationWorker('/tmp/unused.sock', as_of=AS_OF)
+
+@pytest.mark.parametrize('farm', EDGE_CASES, ids=lambda farm: json.dumps(farm, sort_keys=True))
+def test_batched_response_matches_single(worker, farm):
+    alone = responses(worker, [farm])[0]
+    filler = [dict(FARM, farm_id=f"F{i}") for i in range(VECTORIZE_MIN_BATCH)]
+    batched = responses(worker, [farm] + filler)[0]
+
+    assert batched == alone
+
+def test_responses_are_valid_json(worker):
+    farms = EDGE_CASES + [dict(FARM, farm_id=f"F{i}") for i in range(VECTORIZE_MIN_BATCH)]
+    for reply in responses(worker, farms):
+        json.loads(json.dumps(reply, allow_nan=False))
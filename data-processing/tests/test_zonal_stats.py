@@ -0,0 +1,49 @@
+import geopandas as gpd
+import numpy as np
+import pytest
+import rasterio
+from rasterio import features
+from shapely.geometry import box
+
+from benchmarks.synthetic import synthetic_boundaries, write_synthetic_bands
+from satellite.ndvi_calculator import NDVICalculator
+from satellite.zonal_stats import zonal_ndvi_statistics
+
+@pytest.fixture
+def scene(tmp_path):
+    red_path, nir_path, bounds = write_synthetic_bands(str(tmp_path), 600, seed=3)
+    return NDVICalculator(red_path, nir_path), bounds
+
+def test_matches_per_farm_masks(scene):
+    calculator, bounds = scene
+    gdf = synthetic_boundaries(60, bounds=bounds, seed=4)
+    # Farms that overlap share pixels with whichever comes later, so compare the rest
+    overlaps = gdf.geometry.apply(lambda geometry: gdf.geometry.intersects(geometry).sum() > 1)
+    gdf = gdf[~overlaps].reset_index(drop=True)
+
+    table = zonal_ndvi_statistics(calculator, gdf)
+
+    ndvi = calculator.calculate_ndvi()
+    with rasterio.open(calculator.red_band_path) as src:
+        transform, shape = src.transform, (src.height, src.width)
+    assert list(table['farm_id']) == list(gdf['farm_id'])
+    for geometry, (_, row) in zip(gdf.geometry, table.iterrows()):
+        inside = features.geometry_mask([geometry], shape, transform, invert=True)
+        values = ndvi[inside & np.isfinite(ndvi)].astype(np.float64)
+        assert row['pixel_count'] == values.size
+        if values.size:
+            assert row['ndvi_mean'] == pytest.approx(values.mean(), rel=1e-6)
+            assert (row['ndvi_min'], row['ndvi_max']) == pytest.approx((values.min(), values.max()))
+
+def test_farms_off_the_scene_have_no_pixels(scene):
+    calculator, (west, south, east, north) = scene
+    gdf = gpd.GeoDataFrame({'farm_id': ['on', 'off']}, geometry=[
+        box(west + 0.001, south + 0.001, west + 0.003, south + 0.003),
+        box(east + 1, north + 1, east + 1.01, north + 1.01),
+    ], crs='EPSG:4326')
+
+    table = zonal_ndvi_statistics(calculator, gdf).set_index('farm_id')
+
+    assert table.loc['on', 'pixel_count'] > 0
+    assert table.loc['off', 'pixel_count'] == 0
+    assert np.isnan(table.loc['off', 'ndvi_mean'])